@@ -0,0 +1,141 @@
+import socket
+import utime
+from fonts import TEXT, fit_text
+
+# Push channel for "refresh now" and severe weather alerts from a LAN
+# broker (tools/alert_broker.py). The station subscribes with a UDP
+# datagram and the broker pushes to the address it came from, until the
+# lease runs out. Messages are single datagrams:
+#   REFRESH            fetch the current slot now
+#   ALERT <seq> <text> show <text> in the alert banner
+#   CLEAR <seq>        remove the banner
+# A subscription is answered with the retained alert, so a station whose
+# radio was off when the alert was pushed gets it in its next window.
+ALERT_PORT = 5005
+LEASE = 3600  # Seconds the broker pushes to a subscriber, renewed at half time
+BANNER_Y = 106  # Black bar over the sparkline at the bottom of the page
+BANNER_HEIGHT = 16
+MAX_MESSAGE = 128
+
+
+class AlertBanner():
+    """Alert text in a black bar over the page.
+
+    The page bytes under the bar are kept, so clearing the alert restores
+    the page with a partial update and no re-render. A copy of the painted
+    bar tells whether the page under it was replaced since.
+    """
+    def __init__(self, epd):
+        self.text = None
+        self.j0 = BANNER_Y >> 3
+        self.j1 = (BANNER_Y + BANNER_HEIGHT - 1) >> 3
+        self.saved = bytearray((self.j1 - self.j0 + 1) * epd.height)
+        self.bar = bytearray(len(self.saved))
+
+    def _span(self, epd):
+        return self.j0 * epd.height, (self.j1 + 1) * epd.height
+
+    def _up(self, epd):
+        """The bar is in the back buffer, over the page bytes in self.saved"""
+        start, end = self._span(epd)
+        return self.text is not None and epd.buffer[start:end] == self.bar
+
+    def overlay(self, epd):
+        """Paint the bar over the page in the back buffer unless it is still there"""
+        if self.text is not None and not self._up(epd):
+            self._paint(epd)
+
+    def show(self, epd, text):
+        self.restore(epd)
+        self.text = text
+        self._paint(epd)
+
+    def clear(self, epd):
+        self.restore(epd)
+        self.text = None
+
+    def restore(self, epd):
+        """Put the page bytes back, the text stays for the next overlay()"""
+        if self._up(epd):
+            start, end = self._span(epd)
+            epd.buffer[start:end] = self.saved
+
+    def _paint(self, epd):
+        start, end = self._span(epd)
+        self.saved[:] = epd.buffer[start:end]
+        epd.fill_rect(0, BANNER_Y, epd.height, BANNER_HEIGHT, 0x00)
+        epd.text(fit_text(TEXT, self.text, epd.height - 8), 4, BANNER_Y + 4, 0xff)
+        self.bar[:] = epd.buffer[start:end]
+
+
+class AlertListener():
+    """UDP subscriber of the alert broker, polled while the radio is on"""
+    def __init__(self, broker, epd, port=ALERT_PORT, broker_port=ALERT_PORT):
+        self.broker = broker
+        self.port = port  # Local port the broker pushes to
+        self.broker_port = broker_port
+        self.banner = AlertBanner(epd)
+        self.sock = None
+        self.broker_ip = None
+        self.subscribed = None  # utime.time() of the last subscription
+        self.seq = 0  # Sequence number of the last ALERT/CLEAR applied
+        self.refresh = False  # A REFRESH arrived and was not handled yet
+        self.received = 0
+
+    def subscribe(self):
+        """(Re)open the socket and subscribe, run at the start of a radio window"""
+        # A failed attempt also waits for the next renewal
+        self.subscribed = utime.time()
+        if self.sock is not None:
+            self.sock.close()
+        addr = socket.getaddrinfo(self.broker, self.broker_port, 0, socket.SOCK_DGRAM)[0][-1]
+        self.broker_ip = addr[0]
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.bind(('0.0.0.0', self.port))
+        s.setblocking(False)
+        self.sock = s
+        s.sendto(b"SUB", addr)
+
+    def renew_due(self, now):
+        return self.subscribed is None or now - self.subscribed >= LEASE // 2
+
+    def poll(self, epd):
+        """Handle the datagrams waiting, returns True if the banner changed"""
+        changed = False
+        while self.sock is not None:
+            try:
+                data, addr = self.sock.recvfrom(MAX_MESSAGE)
+            except OSError:
+                break  # Nothing waiting (EAGAIN)
+            if addr[0] != self.broker_ip:
+                continue
+            try:
+                changed |= self.handle(epd, data)
+            except (ValueError, UnicodeError):
+                print(f"Bad alert message: {data}")
+        return changed
+
+    def handle(self, epd, data):
+        self.received += 1
+        parts = data.decode().split(" ", 2)
+        kind = parts[0]
+        if kind == "REFRESH":
+            self.refresh = True
+            return False
+        if kind not in ("ALERT", "CLEAR") or len(parts) < 2:
+            return False
+        seq = int(parts[1])
+        if seq == self.seq:
+            return False  # The retained message, already applied
+        self.seq = seq
+        if kind == "ALERT":
+            print(f"Alert: {parts[2] if len(parts) > 2 else ''}")
+            self.banner.show(epd, parts[2] if len(parts) > 2 else "")
+        else:
+            self.banner.clear(epd)
+        return True
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
@@ -0,0 +1,36 @@
+import utime
+import json
+
+BOOT_TIMELINE_FILE = "boot_timeline.json"
+
+
+class BootTimeline():
+    """Records named boot milestones in ms since power up (utime.ticks_ms)"""
+    def __init__(self):
+        self.marks = []
+        self.mark("main_start")
+
+    def mark(self, name):
+        self.marks.append((name, utime.ticks_ms()))
+
+    def elapsed(self, name):
+        for mark, ms in self.marks:
+            if mark == name:
+                return ms
+        return None
+
+    def report(self, path=BOOT_TIMELINE_FILE):
+        """Print the timeline and store it in flash"""
+        print("Boot timeline (ms since power up):")
+        prev = 0
+        for name, ms in self.marks:
+            print(f"  {ms:6d} (+{ms - prev:5d}) {name}")
+            prev = ms
+        first_frame = self.elapsed("first_frame")
+        if first_frame is not None:
+            print(f"Time to first useful frame: {first_frame} ms")
+        try:
+            with open(path, 'w') as f:
+                f.write(json.dumps({'marks': self.marks, 'first_frame_ms': first_frame}))
+        except OSError as e:
+            print(f"Error saving boot timeline: {e}")
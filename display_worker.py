@@ -0,0 +1,287 @@
+import _thread
+import framebuf
+import utime
+from render_txn import monitor, FULL, PARTIAL
+from metrics import metrics
+from tracing import tracer
+
+# Ownership while the worker runs:
+# - core 0 owns the back buffer (epd.buffer) and the client's front copy,
+#   it draws and diffs but never touches the driver, SPI or BUSY pin
+# - core 1 owns the driver, its front buffer and the staging buffer
+# - the mailbox slot belongs to whoever holds the lock, frames are copied
+#   into it by core 0 and swapped out by core 1, never shared
+# - metrics, the refresh monitor and the tracer belong to core 0, the
+#   driver counts into the worker's DriverReport and the counts cross
+#   over in the mailbox
+POLL_MS = 20  # Worker sleep while the mailbox is empty
+
+
+class DriverReport():
+    """Stands in for metrics, the refresh monitor and the tracer in the driver.
+
+    Counts what the driver does on core 1 until the worker hands them to
+    the mailbox. Spans are not recorded while the worker runs.
+    """
+    def __init__(self):
+        self.spi_bytes = 0
+        self.full_refreshes = 0
+        self.partial_refreshes = 0
+        self.kinds = []  # Refresh kinds of the current frame
+
+    def refreshed(self, kind):
+        self.kinds.append(kind)
+
+    def begin(self):
+        return 0
+
+    def end(self, phase, start):
+        pass
+
+    def clear(self):
+        self.spi_bytes = 0
+        self.full_refreshes = 0
+        self.partial_refreshes = 0
+        self.kinds = []
+
+
+class Mailbox():
+    """Lock-protected single frame slot between the cores.
+
+    A frame posted before the worker took the previous one replaces it,
+    the two updates are merged: FULL wins, partial rectangles are joined.
+    """
+    def __init__(self, size):
+        self.lock = _thread.allocate_lock()
+        self.slot = bytearray(size)
+        self.full = False  # Slot holds a frame not yet taken
+        self.busy = False  # Worker is applying a frame
+        self.kind = FULL
+        self.rect = None  # (x0, y0, x1, y1) for a windowed partial update, None for the whole frame
+        self.source = None  # Transaction name for the refresh monitor
+        self.posted = 0
+        self.merged = 0
+        # Driver counts from core 1 not yet applied on core 0
+        self.spi_bytes = 0
+        self.full_refreshes = 0
+        self.partial_refreshes = 0
+        self.refreshes = []  # (source, kind)
+
+    def post(self, frame, kind, rect=None, source=None):
+        """Copy `frame` into the slot, returns the rectangle that will be updated"""
+        self.lock.acquire()
+        try:
+            if self.full:
+                self.merged += 1
+                if kind == FULL or self.kind == FULL:
+                    kind = FULL
+                    rect = None
+                elif rect is None or self.rect is None:
+                    rect = None
+                else:
+                    rect = (min(rect[0], self.rect[0]), min(rect[1], self.rect[1]),
+                            max(rect[2], self.rect[2]), max(rect[3], self.rect[3]))
+            self.slot[:] = frame
+            self.kind = kind
+            self.rect = rect
+            self.source = source
+            self.full = True
+            self.posted += 1
+            return rect
+        finally:
+            self.lock.release()
+
+    def take(self, spare):
+        """Swap `spare` into the slot, returns (frame, kind, rect, source) or None"""
+        self.lock.acquire()
+        try:
+            if not self.full:
+                return None
+            frame = self.slot
+            self.slot = spare
+            self.full = False
+            self.busy = True
+            return frame, self.kind, self.rect, self.source
+        finally:
+            self.lock.release()
+
+    def finish(self, source, report):
+        """Add the driver's counts for the frame taken and mark it shown"""
+        self.lock.acquire()
+        try:
+            self.spi_bytes += report.spi_bytes
+            self.full_refreshes += report.full_refreshes
+            self.partial_refreshes += report.partial_refreshes
+            for kind in report.kinds:
+                self.refreshes.append((source, kind))
+            self.busy = False
+        finally:
+            self.lock.release()
+        report.clear()
+
+    def collect(self):
+        """Take the counts added since the last call,
+        returns (spi_bytes, full_refreshes, partial_refreshes, refreshes)"""
+        self.lock.acquire()
+        try:
+            counts = (self.spi_bytes, self.full_refreshes, self.partial_refreshes, self.refreshes)
+            self.spi_bytes = 0
+            self.full_refreshes = 0
+            self.partial_refreshes = 0
+            if self.refreshes:
+                self.refreshes = []
+            return counts
+        finally:
+            self.lock.release()
+
+    def idle(self):
+        return not self.full and not self.busy
+
+
+class DisplayWorker():
+    """Runs the display driver on the second core.
+
+    Uploads and BUSY waits block core 1 only, core 0 posts frames through
+    the mailbox and carries on fetching and parsing.
+    """
+    def __init__(self, epd, poll_ms=POLL_MS):
+        self.epd = epd
+        self.poll_ms = poll_ms
+        self.mailbox = Mailbox(len(epd.buffer))
+        self.staging = bytearray(len(epd.buffer))
+        self.report = DriverReport()
+        self.running = False
+        self.stopped = True
+        self.errors = 0
+
+    def start(self):
+        epd = self.epd
+        epd.metrics = epd.monitor = epd.tracer = self.report
+        self.running = True
+        self.stopped = False
+        _thread.start_new_thread(self._run, ())
+
+    def stop(self):
+        """Let the worker finish its frame and exit"""
+        self.running = False
+        while not self.stopped:
+            utime.sleep_ms(self.poll_ms)
+        epd = self.epd
+        epd.metrics = metrics
+        epd.monitor = monitor
+        epd.tracer = tracer
+
+    def _run(self):
+        try:
+            while self.running:
+                if not self.step():
+                    utime.sleep_ms(self.poll_ms)
+        finally:
+            self.stopped = True
+
+    def step(self):
+        """Apply the posted frame, False when there was none"""
+        job = self.mailbox.take(self.staging)
+        if job is None:
+            return False
+        frame, kind, rect, source = job
+        self.staging = frame  # Goes back into the slot on the next take
+        epd = self.epd
+        try:
+            if kind == FULL:
+                epd.end_partial()
+                epd.present(False, frame, wait=True)
+            elif rect is None:
+                epd.present(True, frame, wait=True)
+            else:
+                x0, y0, x1, y1 = rect
+                epd.update_region(x0, y0, x1 - x0 + 1, y1 - y0 + 1, frame, wait=True)
+        except Exception as e:
+            self.errors += 1
+            print(f"Display worker error: {e}")
+        finally:
+            self.mailbox.finish(source, self.report)
+        return True
+
+
+class DisplayClient(framebuf.FrameBuffer):
+    """Core 0 stand-in for the driver while the worker owns it.
+
+    Drawing goes to the driver's back buffer like before. `front` is core
+    0's copy of the last frame posted, used for the dirty diff, the frame
+    snapshot and /frame.pbm. present() and update_region() post to the
+    mailbox and return without waiting; wait_idle() waits until the
+    worker has shown everything posted. The driver's counts reach metrics
+    and the refresh monitor here, on core 0, whenever the client is used.
+    """
+    def __init__(self, epd, worker):
+        self.worker = worker
+        self.mailbox = worker.mailbox
+        self.width = epd.width
+        self.height = epd.height
+        self.buffer = epd.buffer
+        self.front = bytearray(epd.front)
+        self.front_locked = False
+        self.partial_session = False
+        super().__init__(self.buffer, self.height, self.width, framebuf.MONO_VLSB)
+
+    def swap(self):
+        self.front[:] = self.buffer
+
+    def sync(self):
+        """Apply the driver's counts from core 1 to metrics and the refresh monitor"""
+        spi_bytes, full_refreshes, partial_refreshes, refreshes = self.mailbox.collect()
+        metrics.spi_bytes += spi_bytes
+        metrics.full_refreshes += full_refreshes
+        metrics.partial_refreshes += partial_refreshes
+        if refreshes:
+            current = monitor.source
+            for source, kind in refreshes:
+                monitor.source = source
+                monitor.refreshed(kind)
+            monitor.source = current
+
+    def present(self, partial=False):
+        self.sync()
+        self.swap()
+        self.mailbox.post(self.buffer, PARTIAL if partial else FULL, None, monitor.source)
+
+    def update_region(self, x, y, w, h):
+        x0 = max(0, x)
+        x1 = min(self.height, x + w) - 1
+        y0 = max(0, y) & ~7
+        y1 = (min(self.width, y + h) - 1) | 7
+        self.sync()
+        if x1 < x0 or y1 < y0:
+            return
+        rect = self.mailbox.post(self.buffer, PARTIAL, (x0, y0, x1, y1), monitor.source)
+        if rect is None:
+            self.swap()  # Merged into a whole frame update
+            return
+        x0, y0, x1, y1 = rect
+        for j in range(y0 >> 3, (y1 >> 3) + 1):
+            start = j * self.height
+            self.front[start + x0:start + x1 + 1] = self.buffer[start + x0:start + x1 + 1]
+
+    def begin_partial(self):
+        self.partial_session = True  # The worker starts the controller session itself
+
+    def end_partial(self):
+        self.partial_session = False
+
+    def is_busy(self):
+        self.sync()
+        return not self.mailbox.idle()
+
+    def wait_idle(self):
+        while not self.mailbox.idle():
+            utime.sleep_ms(self.worker.poll_ms)
+        self.sync()
+
+
+def start_worker(epd):
+    """Hand the driver to a worker on core 1, returns the client to draw on"""
+    worker = DisplayWorker(epd)
+    client = DisplayClient(epd, worker)
+    worker.start()
+    return client
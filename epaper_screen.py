@@ -27,9 +27,13 @@
 # THE SOFTWARE.
 #
 
-from machine import Pin, SPI, ADC
+from machine import Pin, SPI
 import framebuf
 import utime
+from tracing import tracer, SPI as SPI_PHASE, BUSY
+from metrics import metrics
+import frame_codec
+from render_txn import monitor, FULL, PARTIAL
 
 EPD_WIDTH       = 122
 EPD_HEIGHT      = 250
@@ -46,11 +50,8 @@ class TempMixIn(framebuf.FrameBuffer):
     '''          
     def read_temperature(self):
         """Read temperature from the Pico W's internal temperature sensor"""
-        sensor = ADC(4)
-        raw = sensor.read_u16()
-        voltage = raw * (3.3 / 65535)
-        temperature = 27 - (voltage - 0.706) / 0.001721
-        return temperature
+        from sensors import pico_temperature
+        return pico_temperature()
     
 
 class EPD_2in13_V4_Portrait(TempMixIn):
@@ -373,6 +374,11 @@ class EPD_2in13_V4_Landscape(TempMixIn):
         self.reset_pin = Pin(RST_PIN, Pin.OUT)  
         self.busy_pin = Pin(BUSY_PIN, Pin.IN, Pin.PULL_UP)
         self.cs_pin = Pin(CS_PIN, Pin.OUT)
+        # Where the driver counts and traces, the display worker swaps in its
+        # own so core 1 never writes the shared objects
+        self.metrics = metrics
+        self.monitor = monitor
+        self.tracer = tracer
         if EPD_WIDTH % 8 == 0:
             self.width = EPD_WIDTH
         else:
@@ -382,7 +388,14 @@ class EPD_2in13_V4_Landscape(TempMixIn):
         self.spi.init(baudrate=4000_000)
         self.dc_pin = Pin(DC_PIN, Pin.OUT)
 
+        # Drawing always targets the back buffer (self.buffer), the panel is
+        # fed from the front buffer which only changes on swap()
         self.buffer = bytearray(self.height * self.width // 8)
+        self.front = bytearray(len(self.buffer))
+        self.front_locked = False  # Front buffer is being uploaded
+        self.refreshing = False  # Panel refresh started without waiting for BUSY
+        self.partial_session = False  # Controller configured for partial updates
+        self.band_buf = bytearray(self.height)  # One 8 pixel band, for streamed snapshots
         super().__init__(self.buffer, self.height, self.width, framebuf.MONO_VLSB)
         self.init()
 
@@ -399,6 +412,7 @@ class EPD_2in13_V4_Landscape(TempMixIn):
         self.spi.write(bytearray(data))
 
     def reset(self):
+        self.wait_idle()
         self.digital_write(self.reset_pin, 1)
         self.delay_ms(20)
         self.digital_write(self.reset_pin, 0)
@@ -407,6 +421,8 @@ class EPD_2in13_V4_Landscape(TempMixIn):
         self.delay_ms(20)   
 
     def send_command(self, command):
+        if self.refreshing:
+            self.wait_idle()  # The controller ignores commands while refreshing
         self.digital_write(self.dc_pin, 0)
         self.digital_write(self.cs_pin, 0)
         self.spi_writebyte([command])
@@ -424,28 +440,160 @@ class EPD_2in13_V4_Landscape(TempMixIn):
         self.spi.write(bytearray(buf))
         self.digital_write(self.cs_pin, 1)
 
+    def _upload(self, image, x0=0, x1=None, j0=0, j1=None):
+        # Landscape buffer rows (8 pixel bands) are contiguous and map to panel
+        # RAM columns in reverse order, so each band is one SPI write
+        if x1 is None:
+            x1 = self.height - 1
+        if j1 is None:
+            j1 = self.width // 8 - 1
+        t = self.tracer.begin()
+        front = image is self.front
+        if front:
+            self.front_locked = True
+        try:
+            mv = memoryview(image)
+            self.digital_write(self.dc_pin, 1)
+            self.digital_write(self.cs_pin, 0)
+            for j in range(j1, j0 - 1, -1):
+                start = j * self.height
+                self.spi.write(mv[start + x0:start + x1 + 1])
+            self.digital_write(self.cs_pin, 1)
+        finally:
+            if front:
+                self.front_locked = False
+        self.metrics.spi_bytes += (x1 - x0 + 1) * (j1 - j0 + 1)
+        self.tracer.end(SPI_PHASE, t)
+
+    def _upload_snapshot(self, data):
+        # Run-length bands are stored in panel order, each decoded band goes
+        # straight to SPI, the frame is never inflated into a buffer
+        t = self.tracer.begin()
+        self.digital_write(self.dc_pin, 1)
+        self.digital_write(self.cs_pin, 0)
+        n = frame_codec.stream(data, self.spi.write, self.band_buf)
+        self.digital_write(self.cs_pin, 1)
+        self.metrics.spi_bytes += n
+        self.tracer.end(SPI_PHASE, t)
+
+    def _write_window(self, ram, image, x0, x1, j0, j1):
+        """Write landscape columns x0..x1 of bands j0..j1 into RAM 0x24 or 0x26"""
+        k0 = self.width // 8 - 1 - j1  # Panel RAM X byte of the lowest band
+        k1 = self.width // 8 - 1 - j0
+        self.SetWindows(k0 * 8, x0, k1 * 8, x1)
+        self.SetCursor(k0, x0)
+        self.send_command(ram)
+        self._upload(image, x0, x1, j0, j1)
+
+    def swap(self, source=None):
+        """Publish the back buffer (or `source`) as the next frame.
+
+        The back buffer is copied into the front buffer, drawing can then
+        continue on the back buffer while the front one is uploaded.
+        """
+        if self.front_locked:
+            raise RuntimeError("front buffer is being uploaded")
+        self.front[:] = self.buffer if source is None else source
+
+    def present(self, partial=False, source=None, wait=False):
+        """Swap and show the frame, returns once the upload is done.
+
+        The panel refresh runs on its own, the next command to the
+        controller waits for it, so the next frame can be drawn meanwhile.
+        """
+        self.wait_idle()
+        if partial and self.partial_session:
+            # Previous image RAM gets what the panel shows now
+            self._write_window(0x26, self.front, 0, self.height - 1, 0, self.width // 8 - 1)
+        self.swap(source)
+        if partial:
+            self.displayPartial(self.front, wait=wait)
+        else:
+            self.display(self.front, wait=wait)
+
+    def begin_partial(self):
+        """Configure the controller once for a series of partial updates.
+
+        Between updates the controller stays configured, the partial update
+        sequence (0x22 = 0xff) switches the analog circuits and oscillator
+        off again when the refresh is done.
+        """
+        self.wait_idle()
+        self._partial_setup()
+        self.partial_session = True
+
+    def end_partial(self):
+        self.partial_session = False
+
+    def update_region(self, x, y, w, h, source=None, wait=False):
+        """Partial update of a back buffer rectangle, only its RAM bytes are sent.
+
+        Inside a begin_partial() session no reset or register setup is
+        done. The rectangle is copied into the front buffer and both the
+        current (0x24) and previous image (0x26) RAMs are written for it,
+        so the previous image stays in sync with the panel. `source`
+        replaces the back buffer as the frame the rectangle is taken from.
+        """
+        if source is None:
+            source = self.buffer
+        if not self.partial_session:
+            self.begin_partial()
+        self.wait_idle()
+        if self.front_locked:
+            raise RuntimeError("front buffer is being uploaded")
+        x0 = max(0, x)
+        x1 = min(self.height, x + w) - 1
+        j0 = max(0, y) >> 3
+        j1 = (min(self.width, y + h) - 1) >> 3
+        if x1 < x0 or j1 < j0:
+            return
+        self._write_window(0x26, self.front, x0, x1, j0, j1)
+        for j in range(j0, j1 + 1):
+            start = j * self.height
+            self.front[start + x0:start + x1 + 1] = source[start + x0:start + x1 + 1]
+        self._write_window(0x24, self.front, x0, x1, j0, j1)
+        # Full frame writes expect the whole RAM window
+        self.SetWindows(0, 0, self.width-1, self.height-1)
+        self.SetCursor(0, 0)
+        self.TurnOnDisplayPart(wait)
+
+    def is_busy(self):
+        return self.refreshing and self.digital_read(self.busy_pin) == 1
+
+    def wait_idle(self):
+        """Wait for a refresh started by present() to finish"""
+        if self.refreshing:
+            self.refreshing = False
+            self.ReadBusy()
+
     def ReadBusy(self):
         print('busy')
+        t = self.tracer.begin()
         self.delay_ms(10)
         while(self.digital_read(self.busy_pin) == 1):      # 0: idle, 1: busy
             self.delay_ms(10)    
+        self.tracer.end(BUSY, t)
         print('busy release')
 
     '''
     function : Turn On Display
     parameter:
     '''
-    def TurnOnDisplay(self):
+    def TurnOnDisplay(self, wait=True):
+        self.metrics.full_refreshes += 1
+        self.monitor.refreshed(FULL)
         self.send_command(0x22) # Display Update Control
         self.send_data(0xf7)
         self.send_command(0x20) # Activate Display Update Sequence
-        self.ReadBusy()
+        self._refresh_started(wait)
 
     '''
     function : Turn On Display Fast
     parameter:
     '''
     def TurnOnDisplay_Fast(self):
+        self.metrics.full_refreshes += 1
+        self.monitor.refreshed(FULL)
         self.send_command(0x22) # Display Update Control
         self.send_data(0xC7)    # fast:0x0c, quality:0x0f, 0xcf
         self.send_command(0x20) # Activate Display Update Sequence
@@ -455,11 +603,19 @@ class EPD_2in13_V4_Landscape(TempMixIn):
     function : Turn On Display Part
     parameter:
     '''
-    def TurnOnDisplayPart(self):
+    def TurnOnDisplayPart(self, wait=True):
+        self.metrics.partial_refreshes += 1
+        self.monitor.refreshed(PARTIAL)
         self.send_command(0x22) # Display Update Control
         self.send_data(0xff)    # fast:0x0c, quality:0x0f, 0xcf
         self.send_command(0x20) # Activate Display Update Sequence
-        self.ReadBusy()
+        self._refresh_started(wait)
+
+    def _refresh_started(self, wait):
+        if wait:
+            self.ReadBusy()
+        else:
+            self.refreshing = True
     
     '''
     function : Setting the display window
@@ -582,18 +738,14 @@ class EPD_2in13_V4_Landscape(TempMixIn):
     parameter:
         image : Image data
     '''
-    def display(self, image):
+    def display(self, image, wait=True):
         self.send_command(0x24)
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
-        self.TurnOnDisplay()
+        self._upload(image)
+        self.TurnOnDisplay(wait)
     
     def display_fast(self, image):
         self.send_command(0x24)
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
+        self._upload(image)
         self.TurnOnDisplay_Fast()
     
     '''
@@ -603,23 +755,27 @@ class EPD_2in13_V4_Landscape(TempMixIn):
     '''
     def Display_Base(self, image):
         self.send_command(0x24)
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
+        self._upload(image)
                 
         self.send_command(0x26)
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
+        self._upload(image)
                 
         self.TurnOnDisplay()
-        
+
     '''
-    function : Sends the image buffer in RAM to e-Paper and partial refresh
+    function : Load a snapshot into both RAMs without refreshing,
+               used when the panel already shows the image (e.g. after a reboot)
     parameter:
-        image : Image data
-    '''    
-    def displayPartial(self, image):
+        data : frame_codec data, decoded while it is sent
+    '''
+    def Load_Snapshot(self, data):
+        self.send_command(0x24)
+        self._upload_snapshot(data)
+
+        self.send_command(0x26)
+        self._upload_snapshot(data)
+
+    def _partial_setup(self):
         self.reset()
 
         self.send_command(0x3C) # BorderWavefrom
@@ -633,14 +789,20 @@ class EPD_2in13_V4_Landscape(TempMixIn):
         self.send_command(0x11) # data entry mode       
         self.send_data(0x07)
 
+    '''
+    function : Sends the image buffer in RAM to e-Paper and partial refresh
+    parameter:
+        image : Image data
+    '''    
+    def displayPartial(self, image, wait=True):
+        if not self.partial_session:
+            self._partial_setup()
         self.SetWindows(0, 0, self.width-1, self.height-1)
         self.SetCursor(0, 0)
         
         self.send_command(0x24) # WRITE_RAM
-        for j in range(int(self.width / 8) - 1, -1, -1):
-            for i in range(0, self.height):
-                self.send_data(image[i + j * self.height])
-        self.TurnOnDisplayPart()
+        self._upload(image)
+        self.TurnOnDisplayPart(wait)
     
     '''
     function : Enter sleep mode
@@ -0,0 +1,49 @@
+# Generated by tools/font_convert.py from DejaVuSansMono-Bold.ttf, do not edit
+CHARS = '0123456789.-° '
+WIDTH = 14
+HEIGHT = 18
+ADVANCE = 15
+DATA = (
+    # '0'
+    b'\xf8?\xf0\x1f\xe0\x0f\xc3\x0f\xc7\x8f\xc7\x87\xc7\x87\x84\x87\x84G\x84\xc7\x87\x87\xc7\x87'
+    b'\xc7\x87\xc7\x8f\xc3\x0f\xe0\x0f\xf0\x1f\xf8?'
+    # '1'
+    b'\xf0\x7f\xc0\x7f\xc0\x7f\xec\x7f\xfc\x7f\xfc\x7f\xfc\x7f\xfc\x7f\xfc\x7f\xfc\x7f\xfc\x7f\xfc\x7f'
+    b'\xfc\x7f\xfc\x7f\xfc\x7f\xc0\x07\xc0\x07\xc0\x07'
+    # '2'
+    b'\xe0\x7f\xc0\x1f\xc0\x0f\xdf\x0f\xff\x8f\xff\x8f\xff\x8f\xff\x0f\xfe\x1f\xfe?\xfc\x7f\xf8\x7f'
+    b'\xf0\xff\xe1\xff\xc3\xff\x80\x0f\x80\x0f\x80\x0f'
+    # '3'
+    b'\xf0?\xc0\x1f\xc0\x0f\xcf\x0f\xff\x8f\xff\x8f\xff\x0f\xf8\x1f\xf8?\xf8\x1f\xff\x0f\xff\x87'
+    b'\xff\xc7\xff\x87\xdf\x07\x80\x0f\x80\x1f\xe0?'
+    # '4'
+    b'\xff\x1f\xfe\x1f\xfc\x1f\xfc\x1f\xf8\x1f\xf1\x1f\xf1\x1f\xe3\x1f\xe7\x1f\xc7\x1f\x8f\x1f\x80\x07'
+    b'\x80\x07\x80\x07\xff\x1f\xff\x1f\xff\x1f\xff\x1f'
+    # '5'
+    b'\xc0\x0f\xc0\x0f\xc0\x0f\xc7\xff\xc7\xff\xc7\xff\xc0\x7f\xc0\x1f\xc0\x0f\xcf\x0f\xff\x87\xff\x87'
+    b'\xff\x87\xff\x87\xdf\x0f\xc0\x0f\xc0\x1f\xe0\x7f'
+    # '6'
+    b'\xfc\x1f\xf0\x0f\xe0\x0f\xe1\xef\xc3\xff\xc7\xff\xc4?\xc0\x0f\xc0\x0f\xc3\x87\xc3\xc7\xc7\xc7'
+    b'\xc7\xc7\xc7\xc7\xc3\x87\xe0\x0f\xf0\x0f\xf8?'
+    # '7'
+    b'\xc0\x07\xc0\x07\xc0\x07\xff\x8f\xff\x0f\xff\x1f\xff\x1f\xfe\x1f\xfe?\xfc?\xfc?\xfc\x7f'
+    b'\xf8\x7f\xf8\xff\xf8\xff\xf0\xff\xf1\xff\xe1\xff'
+    # '8'
+    b'\xf8?\xe0\x1f\xc0\x0f\xc3\x8f\xc7\x8f\xc7\x8f\xc3\x8f\xe0\x1f\xf0?\xe0\x0f\xc3\x8f\xc7\xc7'
+    b'\xc7\xc7\xc7\xc7\xc3\x87\xc0\x0f\xe0\x0f\xf0?'
+    # '9'
+    b'\xf0\x7f\xe0\x1f\xc0\x0f\xc3\x0f\x87\x8f\x87\x87\x87\x87\x87\x87\xc3\x07\xc0\x07\xe0\x07\xf0\xc7'
+    b'\xff\x87\xff\x8f\xdf\x0f\xc0\x1f\xc0?\xf0\x7f'
+    # '.'
+    b'\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff'
+    b'\xff\xff\xff\xff\xf8\x7f\xf8\x7f\xf8\x7f\xf8\x7f'
+    # '-'
+    b'\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xf0\x1f\xf0\x1f'
+    b'\xf0\x1f\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff'
+    # '°'
+    b'\xf8\x7f\xf0?\xf3\x1f\xe7\x9f\xe7\x9f\xf3\x1f\xf0?\xf8\x7f\xff\xff\xff\xff\xff\xff\xff\xff'
+    b'\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff'
+    # ' '
+    b'\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff'
+    b'\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff'
+)
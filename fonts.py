@@ -0,0 +1,101 @@
+import framebuf
+
+GLYPH_CACHE_SIZE = 16  # Glyph framebuffers kept per font
+
+
+class Font():
+    """Monospace 1-bit glyph atlas generated by tools/font_convert.py"""
+    def __init__(self, atlas):
+        self.chars = atlas.CHARS
+        self.width = atlas.WIDTH
+        self.height = atlas.HEIGHT
+        self.advance = atlas.ADVANCE
+        self.data = atlas.DATA
+        self.glyph_size = (self.width + 7) // 8 * self.height
+        # Latin-1 code -> glyph index + 1, for drawing byte buffers
+        self.index = bytearray(256)
+        for i, c in enumerate(self.chars):
+            if ord(c) < 256:
+                self.index[ord(c)] = i + 1
+        self.cache = {}
+        self.cache_order = []
+
+    def measure(self, text):
+        """Width in pixels, O(1) since all glyphs share the same advance"""
+        return len(text) * self.advance
+
+    def glyph(self, index):
+        fb = self.cache.get(index)
+        if fb is None:
+            # FrameBuffer needs a writable buffer, copy the glyph out of the atlas
+            start = index * self.glyph_size
+            buf = bytearray(self.data[start:start + self.glyph_size])
+            fb = framebuf.FrameBuffer(buf, self.width, self.height, framebuf.MONO_HLSB)
+            if len(self.cache_order) >= GLYPH_CACHE_SIZE:
+                del self.cache[self.cache_order.pop(0)]
+            self.cache[index] = fb
+            self.cache_order.append(index)
+        return fb
+
+    def draw(self, fb, text, x, y):
+        """Blit text in black, background bits (1) are transparent"""
+        for c in text:
+            index = self.chars.find(c)
+            if index >= 0:
+                fb.blit(self.glyph(index), x, y, 1)
+            x += self.advance
+        return x
+
+    def draw_right(self, fb, text, right, y):
+        """Draw text so that it ends at x=right"""
+        return self.draw(fb, text, right - self.measure(text), y)
+
+    def draw_buf(self, fb, buf, n, x, y):
+        """Draw the first n bytes of a Latin-1 buffer, without allocating once the glyphs are cached"""
+        for i in range(n):
+            index = self.index[buf[i]]
+            if index:
+                fb.blit(self.glyph(index - 1), x, y, 1)
+            x += self.advance
+        return x
+
+    def draw_buf_right(self, fb, buf, n, right, y):
+        return self.draw_buf(fb, buf, n, right - n * self.advance, y)
+
+
+class BuiltinFont():
+    """The FrameBuffer 8x8 font behind the same interface as Font"""
+    width = 8
+    height = 8
+    advance = 8
+
+    def measure(self, text):
+        return len(text) * 8
+
+    def draw(self, fb, text, x, y):
+        fb.text(text, x, y, 0x00)
+        return x + len(text) * 8
+
+    def draw_right(self, fb, text, right, y):
+        return self.draw(fb, text, right - self.measure(text), y)
+
+
+def fit_text(font, text, max_width, ellipsis="."):
+    """Truncate text so it fits max_width pixels without rendering it"""
+    if font.measure(text) <= max_width:
+        return text
+    chars = max(0, max_width // font.advance - len(ellipsis))
+    return text[:chars] + ellipsis
+
+
+_large = None
+TEXT = BuiltinFont()
+
+
+def large_font():
+    """Large digit font, loaded on first use"""
+    global _large
+    if _large is None:
+        import font_large
+        _large = Font(font_large)
+    return _large
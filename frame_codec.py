@@ -0,0 +1,165 @@
+import struct
+
+# Run-length snapshot format for the 1-bit landscape framebuffer.
+#
+# The header is MAGIC, the band count and the bytes per band ("<HH"). The
+# bands (8 pixel rows, contiguous in the framebuffer) are stored last band
+# first, the order the panel RAM is written in, so a snapshot streams
+# straight into the SPI upload. Codes:
+#   0x00-0x7F  literal, the next (c + 1) bytes are copied
+#   0x80-0xBF  repeat, the next byte is repeated (c & 0x3F) + 3 times
+#   0xC0-0xFF  white, ((c & 0x3F) << 8 | next byte) + 1 bytes of 0xFF
+# Mostly white pages are long 0xFF runs which cost two bytes each.
+MAGIC = b"EPR1"
+HEADER = "<HH"
+HEADER_SIZE = len(MAGIC) + struct.calcsize(HEADER)
+WHITE = 0xFF
+MAX_LITERAL = 128
+MIN_REPEAT = 3  # Shorter runs of other bytes stay literals
+MAX_REPEAT = 0x3F + MIN_REPEAT
+MAX_WHITE = 0x4000
+
+
+def encode(buf, band):
+    """Compress a landscape framebuffer with `band` bytes per 8 pixel band"""
+    bands = len(buf) // band
+    out = bytearray(MAGIC)
+    out.extend(struct.pack(HEADER, bands, band))
+    literal = bytearray()
+
+    def flush_literal():
+        for i in range(0, len(literal), MAX_LITERAL):
+            chunk = literal[i:i + MAX_LITERAL]
+            out.append(len(chunk) - 1)
+            out.extend(chunk)
+        literal[:] = b""
+
+    def flush_run(value, n):
+        if value == WHITE and n >= 2:
+            flush_literal()
+            while n:
+                m = min(n, MAX_WHITE)
+                out.append(0xC0 | (m - 1) >> 8)
+                out.append((m - 1) & 0xFF)
+                n -= m
+        elif n >= MIN_REPEAT:
+            flush_literal()
+            while n >= MIN_REPEAT:
+                m = min(n, MAX_REPEAT)
+                out.append(0x80 | (m - MIN_REPEAT))
+                out.append(value)
+                n -= m
+            literal.extend(bytes((value,)) * n)
+        else:
+            literal.extend(bytes((value,)) * n)
+
+    value = None
+    n = 0
+    for j in range(bands - 1, -1, -1):
+        for i in range(j * band, (j + 1) * band):
+            b = buf[i]
+            if b == value:
+                n += 1
+                continue
+            if n:
+                flush_run(value, n)
+            value = b
+            n = 1
+    if n:
+        flush_run(value, n)
+    flush_literal()
+    return out
+
+
+def header(data):
+    """(bands, bytes per band), None if `data` is not a snapshot"""
+    if len(data) < HEADER_SIZE or data[:len(MAGIC)] != MAGIC:
+        return None
+    return struct.unpack_from(HEADER, data, len(MAGIC))
+
+
+def stream(data, write, chunk=None):
+    """Decode a snapshot in panel order, calling write() with full chunks.
+
+    `chunk` is the working buffer, by default one band. Only that buffer
+    is used, the frame is never inflated as a whole. Returns the number
+    of bytes written.
+    """
+    bands, band = header(data)
+    if chunk is None:
+        chunk = bytearray(band)
+    size = len(chunk)
+    white = memoryview(bytes((WHITE,)) * size)
+    src = memoryview(data)
+    end = len(data)
+    p = HEADER_SIZE
+    k = 0
+    total = 0
+    while p < end:
+        c = data[p]
+        if c < 0x80:
+            n = c + 1
+            p += 1
+        elif c < 0xC0:
+            n = (c & 0x3F) + MIN_REPEAT
+            value = data[p + 1]
+            p += 2
+        else:
+            n = ((c & 0x3F) << 8 | data[p + 1]) + 1
+            p += 2
+        while n:
+            m = size - k
+            if m > n:
+                m = n
+            if c < 0x80:
+                chunk[k:k + m] = src[p:p + m]
+                p += m
+            elif c < 0xC0:
+                for i in range(k, k + m):
+                    chunk[i] = value
+            else:
+                chunk[k:k + m] = white[:m]
+            k += m
+            n -= m
+            if k == size:
+                write(chunk)
+                total += size
+                k = 0
+    if k:
+        write(memoryview(chunk)[:k])
+        total += k
+    return total
+
+
+def decode_into(data, buf):
+    """Decode a snapshot into a framebuffer, False if it does not fit"""
+    layout = header(data)
+    if layout is None or layout[0] * layout[1] != len(buf):
+        return False
+    bands, band = layout
+    mv = memoryview(buf)
+    j = [bands]
+
+    def place(chunk):
+        # Each full chunk is one band, the last band comes first
+        j[0] -= 1
+        mv[j[0] * band:(j[0] + 1) * band] = chunk
+
+    return stream(data, place) == len(buf)
+
+
+def benchmark(data, buf, repeat=10):
+    """Average decode times in us: (into a framebuffer, streamed to a no-op writer)"""
+    import utime
+
+    def discard(chunk):
+        pass
+
+    start = utime.ticks_us()
+    for _ in range(repeat):
+        decode_into(data, buf)
+    into = utime.ticks_diff(utime.ticks_us(), start) // repeat
+    start = utime.ticks_us()
+    for _ in range(repeat):
+        stream(data, discard)
+    return into, utime.ticks_diff(utime.ticks_us(), start) // repeat
@@ -0,0 +1,77 @@
+import struct
+
+# Frame deltas sent by the companion in thin client mode. A delta turns
+# the frame with id `base` into the frame with id `frame`, base 0 is an
+# all white frame. Ids are the CRC-32 of the framebuffer, never 0.
+#   header  MAGIC, base, frame, range count ("<II H")
+#   ranges  byte offset and length in the landscape framebuffer ("<HH"),
+#           followed by the new bytes
+MAGIC = b"EPD1"
+HEADER = "<4sIIH"
+HEADER_SIZE = struct.calcsize(HEADER)
+RANGE = "<HH"
+RANGE_SIZE = struct.calcsize(RANGE)
+MERGE_GAP = RANGE_SIZE  # Unchanged bytes cheaper to resend than a new range header
+READ_CHUNK = 256
+
+
+def encode(old, new, base, frame):
+    """Delta from `old` (the frame with id `base`) to `new` (host side)"""
+    ranges = []
+    n = len(new)
+    i = 0
+    while i < n:
+        if old[i] == new[i]:
+            i += 1
+            continue
+        start = last = i
+        while i < n and i - last <= MERGE_GAP:
+            if old[i] != new[i]:
+                last = i
+            i += 1
+        ranges.append((start, last + 1))
+    out = bytearray(struct.pack(HEADER, MAGIC, base, frame, len(ranges)))
+    for start, end in ranges:
+        out += struct.pack(RANGE, start, end - start)
+        out += new[start:end]
+    return bytes(out)
+
+
+def _read(stream, n):
+    # Body reads stop at a chunk boundary, loop until n bytes arrived
+    data = b""
+    while len(data) < n:
+        more = stream.read(n - len(data))
+        if not more:
+            raise OSError("truncated frame delta")
+        data += more
+    return data
+
+
+def apply(stream, fb, buf, base):
+    """Apply a delta read from `stream` to framebuffer `fb` over `buf`.
+
+    `base` is the id of the frame in the buffer, returns the new frame id.
+    The ranges are read straight into the framebuffer. On an error the
+    buffer is left half updated, the caller restores it.
+    """
+    magic, delta_base, frame, count = struct.unpack(HEADER, _read(stream, HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError("not a frame delta")
+    if delta_base == 0:
+        fb.fill(0xff)
+    elif delta_base != base:
+        raise ValueError("delta for another frame")
+    mv = memoryview(buf)
+    for _ in range(count):
+        offset, length = struct.unpack(RANGE, _read(stream, RANGE_SIZE))
+        end = offset + length
+        if end > len(buf):
+            raise ValueError("delta range outside the frame")
+        while offset < end:
+            data = stream.read(min(end - offset, READ_CHUNK))
+            if not data:
+                raise OSError("truncated frame delta")
+            mv[offset:offset + len(data)] = data
+            offset += len(data)
+    return frame
@@ -0,0 +1,31 @@
+import frame_codec
+
+# Snapshot of the last rendered frame, restored at boot so the panel
+# and the controller RAM match without a refresh. The file holds
+# frame_codec run-length data: 1.8-2.3x smaller than the raw 4000 bytes
+# for a weather page, 4.5x without a forecast, 6-12x for status screens.
+LAST_FRAME_FILE = "last_frame.bin"
+
+
+def save_frame(buffer, band, path=LAST_FRAME_FILE):
+    """Compress the framebuffer (`band` bytes per 8 pixel band) to flash"""
+    try:
+        data = frame_codec.encode(buffer, band)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return True
+    except OSError as e:
+        print(f"Error saving frame snapshot: {e}")
+        return False
+
+
+def read_frame(path=LAST_FRAME_FILE):
+    """The snapshot's run-length data, None if there is none"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    # A raw snapshot of an older version is ignored, the boot shows the splash once
+    return data if frame_codec.header(data) is not None else None
+
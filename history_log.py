@@ -0,0 +1,182 @@
+import struct
+from array import array
+
+# Record: time (RTC seconds, local), outdoor temperature (1/100 degree),
+# humidity (%), pad, weather condition id, indoor temperature (1/100 degree)
+RECORD_FMT = "<IhBxHh"
+RECORD_SIZE = 12
+NO_VALUE = -32768  # Temperature not available
+
+HISTORY_FILE = "history_%d.bin"
+SEGMENTS = 4  # Segment files used in rotation
+SEGMENT_RECORDS = 256  # Records per segment, the oldest segment is dropped when all are full
+WRITE_BATCH = 6  # Records buffered in RAM before one flash append
+INDEX_HOURS = 7 * 24  # Hourly buckets kept in RAM
+
+OUTDOOR = 0
+INDOOR = 1
+
+
+class HistoryLog():
+    """Fixed-size observation records appended to rotating segment files.
+
+    Records are buffered and written in batches to limit flash writes. An
+    index of hourly min/max/sum/count buckets for the last 7 days is kept
+    in RAM, built from the files once at start-up and then updated on
+    append, so range queries never read the flash.
+    """
+    def __init__(self, path=HISTORY_FILE, segments=SEGMENTS, segment_records=SEGMENT_RECORDS,
+                 batch=WRITE_BATCH, hours=INDEX_HOURS):
+        self.path = path
+        self.segments = segments
+        self.segment_records = segment_records
+        self.batch = batch
+        self.hours = hours
+        self.pending = bytearray(RECORD_SIZE * batch)
+        self.pending_count = 0
+        self.segment = 0  # Segment being appended to
+        self.segment_count = 0  # Records in it, including pending ones
+        self.last_time = 0  # Time of the newest record, the log only moves forward
+        # Bucket i holds hour self.hour[i], per series (outdoor, indoor)
+        self.hour = array('I', bytes(4 * hours))
+        self.lo = [array('h', bytes(2 * hours)) for _ in range(2)]
+        self.hi = [array('h', bytes(2 * hours)) for _ in range(2)]
+        self.sum = [array('i', bytes(4 * hours)) for _ in range(2)]
+        self.n = [array('H', bytes(2 * hours)) for _ in range(2)]
+
+    def _file(self, segment):
+        return self.path % segment
+
+    def _size(self, segment):
+        try:
+            import os
+            return os.stat(self._file(segment))[6] // RECORD_SIZE
+        except OSError:
+            return 0
+
+    def load(self):
+        """Rebuild the index from the segment files, oldest first"""
+        newest = None
+        newest_time = -1
+        for segment in range(self.segments):
+            if self._size(segment):
+                with open(self._file(segment), 'rb') as f:
+                    f.seek(-RECORD_SIZE, 2)
+                    t = struct.unpack(RECORD_FMT, f.read(RECORD_SIZE))[0]
+                if t > newest_time:
+                    newest, newest_time = segment, t
+        if newest is None:
+            return
+        record = bytearray(RECORD_SIZE)
+        for step in range(1, self.segments + 1):
+            segment = (newest + step) % self.segments
+            try:
+                with open(self._file(segment), 'rb') as f:
+                    while f.readinto(record) == RECORD_SIZE:
+                        self._index(record)
+            except OSError:
+                pass
+        self.segment = newest
+        self.segment_count = self._size(newest)
+        if self.segment_count >= self.segment_records:
+            self._next_segment()
+
+    def _index(self, record):
+        t, outdoor, _, _, indoor = struct.unpack(RECORD_FMT, record)
+        if t > self.last_time:
+            self.last_time = t
+        hour = t // 3600
+        i = hour % self.hours
+        if self.hour[i] != hour:
+            if self.hour[i] > hour:
+                return  # Older than the index window
+            self.hour[i] = hour
+            for s in range(2):
+                self.n[s][i] = 0
+                self.sum[s][i] = 0
+        for s, value in ((OUTDOOR, outdoor), (INDOOR, indoor)):
+            if value == NO_VALUE:
+                continue
+            if self.n[s][i] == 0:
+                self.lo[s][i] = value
+                self.hi[s][i] = value
+            elif value < self.lo[s][i]:
+                self.lo[s][i] = value
+            elif value > self.hi[s][i]:
+                self.hi[s][i] = value
+            self.sum[s][i] += value
+            self.n[s][i] += 1
+
+    def append(self, t, outdoor, humidity, condition, indoor):
+        """Add an observation, temperatures in hundredths of a degree or NO_VALUE.
+
+        Returns False, without logging, when t is not newer than the last record.
+        """
+        if t <= self.last_time:
+            return False
+        offset = self.pending_count * RECORD_SIZE
+        struct.pack_into(RECORD_FMT, self.pending, offset, t, outdoor, humidity, condition, indoor)
+        self._index(memoryview(self.pending)[offset:offset + RECORD_SIZE])
+        self.pending_count += 1
+        self.segment_count += 1
+        if self.pending_count >= self.batch or self.segment_count >= self.segment_records:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write the buffered records, moving to the next segment when the current one is full"""
+        if not self.pending_count:
+            return
+        try:
+            with open(self._file(self.segment), 'ab') as f:
+                f.write(memoryview(self.pending)[:self.pending_count * RECORD_SIZE])
+        except OSError as e:
+            print(f"History write failed: {e}")
+        self.pending_count = 0
+        if self.segment_count >= self.segment_records:
+            self._next_segment()
+
+    def _next_segment(self):
+        self.segment = (self.segment + 1) % self.segments
+        self.segment_count = 0
+        try:
+            open(self._file(self.segment), 'wb').close()  # Drop the oldest segment
+        except OSError:
+            pass
+
+    def stats(self, series, since, now):
+        """(min, max, mean) of OUTDOOR or INDOOR from `since` to `now`, None without data.
+
+        Buckets are whole hours, `since` is rounded down to the hour.
+        """
+        first = since // 3600
+        last = now // 3600
+        if last - first >= self.hours:
+            first = last - self.hours + 1
+        lo = hi = None
+        total = 0
+        count = 0
+        n = self.n[series]
+        for hour in range(first, last + 1):
+            i = hour % self.hours
+            if self.hour[i] != hour or not n[i]:
+                continue
+            if lo is None or self.lo[series][i] < lo:
+                lo = self.lo[series][i]
+            if hi is None or self.hi[series][i] > hi:
+                hi = self.hi[series][i]
+            total += self.sum[series][i]
+            count += n[i]
+        if not count:
+            return None
+        return lo, hi, total // count
+
+    def today(self, series, now):
+        """Stats since local midnight, the RTC runs on local time"""
+        return self.stats(series, now - now % 86400, now)
+
+    def last_hours(self, series, hours, now):
+        return self.stats(series, now - (hours - 1) * 3600, now)
+
+
+history = HistoryLog()
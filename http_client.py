@@ -0,0 +1,242 @@
+import socket
+import json
+from tracing import tracer, DNS, TLS, HTTP, JSON
+
+HTTP_TIMEOUT = 15
+READ_CHUNK = 256
+
+
+def _split_url(url):
+    proto, _, host, path = url.split('/', 3)
+    port = 443 if proto == 'https:' else 80
+    if ':' in host:
+        host, port = host.split(':', 1)
+        port = int(port)
+    return proto == 'https:', host, port, path
+
+
+def _connect(host, port, secure, timeout):
+    """Resolve and connect, wrapping the socket in TLS when needed"""
+    t = tracer.begin()
+    ai = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0]
+    tracer.end(DNS, t)
+
+    # Connection setup, the TCP handshake is counted with TLS
+    t = tracer.begin()
+    s = socket.socket(ai[0], ai[1], ai[2])
+    try:
+        s.settimeout(timeout)
+        s.connect(ai[-1])
+        if secure:
+            try:
+                import ssl
+            except ImportError:
+                import ussl as ssl
+            s = ssl.wrap_socket(s, server_hostname=host)
+    except Exception:
+        s.close()
+        raise
+    tracer.end(TLS, t)
+    return s
+
+
+def _read_headers(s):
+    """Read the status line and headers, returns (content_length, chunked)"""
+    status = s.readline().split(None, 2)
+    length = None
+    chunked = False
+    while True:
+        line = s.readline()
+        if not line or line == b"\r\n":
+            break
+        lower = line.lower()
+        if lower.startswith(b"content-length:"):
+            length = int(line[15:].strip())
+        elif lower.startswith(b"transfer-encoding:") and b"chunked" in lower:
+            chunked = True
+    if len(status) < 2 or status[1] != b"200":
+        raise OSError(f"HTTP status {status[1] if len(status) > 1 else status}")
+    return length, chunked
+
+
+def _open(url, timeout):
+    """Send a GET request and return the socket positioned at the start of the body"""
+    secure, host, port, path = _split_url(url)
+    s = _connect(host, port, secure, timeout)
+    try:
+        # Request until the end of the response headers (time to first byte)
+        t = tracer.begin()
+        s.write(("GET /%s HTTP/1.0\r\nHost: %s\r\nConnection: close\r\n\r\n" % (path, host)).encode())
+        _read_headers(s)
+        tracer.end(HTTP, t)
+        return s
+    except Exception:
+        s.close()
+        raise
+
+
+class Body():
+    """Response body on a keep-alive connection, reads stop at the end of the response"""
+    def __init__(self, sock, length, chunked):
+        self.sock = sock
+        self.remaining = length if not chunked else 0
+        self.chunked = chunked
+        self.eof = length == 0 and not chunked
+
+    def _next_chunk(self):
+        line = self.sock.readline()
+        if line == b"\r\n":
+            line = self.sock.readline()  # CRLF closing the previous chunk
+        size = int(line.split(b";")[0].strip(), 16)
+        if size == 0:
+            # Skip trailers up to the final empty line
+            while self.sock.readline() not in (b"\r\n", b""):
+                pass
+            self.eof = True
+        self.remaining = size
+
+    def read(self, n=READ_CHUNK):
+        if self.eof:
+            return b""
+        if self.remaining == 0 and self.chunked:
+            self._next_chunk()
+            if self.eof:
+                return b""
+        data = self.sock.read(min(n, self.remaining))
+        if not data:
+            self.eof = True
+            return b""
+        self.remaining -= len(data)
+        if self.remaining == 0 and not self.chunked:
+            self.eof = True
+        return data
+
+    def read_all(self):
+        parts = []
+        while True:
+            data = self.read(1024)
+            if not data:
+                return b"".join(parts)
+            parts.append(data)
+
+    def drain(self):
+        """Discard the rest of the body so the next pipelined response can be read"""
+        while self.read(READ_CHUNK):
+            pass
+
+
+class Connection():
+    """Keep-alive HTTP/1.1 connection to one host.
+
+    Several requests can be sent before reading the responses (pipelining),
+    the responses must then be read back in the same order.
+    """
+    def __init__(self, host, port=443, secure=True, timeout=HTTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.secure = secure
+        self.timeout = timeout
+        self.sock = None
+
+    def open(self):
+        self.sock = _connect(self.host, self.port, self.secure, self.timeout)
+
+    def send(self, path):
+        self.sock.write(("GET /%s HTTP/1.1\r\nHost: %s\r\nConnection: keep-alive\r\n\r\n" % (path, self.host)).encode())
+
+    def response(self):
+        """Read the next response headers and return its Body"""
+        t = tracer.begin()
+        length, chunked = _read_headers(self.sock)
+        tracer.end(HTTP, t)
+        if length is None and not chunked:
+            raise OSError("Response without length on keep-alive connection")
+        return Body(self.sock, length, chunked)
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+
+def get_json(url, timeout=HTTP_TIMEOUT):
+    """GET a URL and parse the JSON body, tracing the DNS, TLS, HTTP and JSON phases"""
+    s = _open(url, timeout)
+    try:
+        # Body download and parse
+        t = tracer.begin()
+        data = json.load(s)
+        tracer.end(JSON, t)
+        return data
+    finally:
+        s.close()
+
+
+def iter_json_array(stream, key):
+    """Yield the object elements of the array `key` one at a time.
+
+    Only one element is held in memory, so large lists such as the 40 entry
+    forecast never have to be parsed as a whole.
+    """
+    marker = ('"%s"' % key).encode()
+    window = b''
+    # Find the key, keeping enough of the previous chunk for a split marker
+    while True:
+        chunk = stream.read(READ_CHUNK)
+        if not chunk:
+            return
+        window = window + chunk
+        pos = window.find(marker)
+        if pos >= 0:
+            data = window[pos + len(marker):]
+            break
+        window = window[-len(marker):]
+
+    started = False  # Seen the opening '['
+    depth = 0
+    in_str = False
+    escape = False
+    elem = bytearray()
+    while True:
+        for c in data:
+            if depth == 0:
+                if not started:
+                    started = c == 0x5B  # [
+                elif c == 0x7B:  # { starts an element
+                    depth = 1
+                    elem.append(c)
+                elif c == 0x5D:  # ] ends the array
+                    return
+                continue
+            elem.append(c)
+            if in_str:
+                if escape:
+                    escape = False
+                elif c == 0x5C:  # backslash
+                    escape = True
+                elif c == 0x22:
+                    in_str = False
+            elif c == 0x22:
+                in_str = True
+            elif c == 0x7B or c == 0x5B:
+                depth += 1
+            elif c == 0x7D or c == 0x5D:
+                depth -= 1
+                if depth == 0:
+                    yield json.loads(elem)
+                    elem = bytearray()
+        data = stream.read(READ_CHUNK)
+        if not data:
+            return
+
+
+def get_json_items(url, key, timeout=HTTP_TIMEOUT):
+    """GET a URL and yield the elements of the array `key` as they are parsed"""
+    s = _open(url, timeout)
+    t = tracer.begin()
+    try:
+        for item in iter_json_array(s, key):
+            yield item
+    finally:
+        tracer.end(JSON, t)
+        s.close()
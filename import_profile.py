@@ -0,0 +1,50 @@
+import gc
+import sys
+import utime
+
+# Modules in the order main.py loads them on the normal path, followed by
+# the ones that should only be loaded on first use
+STARTUP_MODULES = ("tracing", "mem_profile", "metrics", "render_txn", "frame_codec", "epaper_screen", "http_client", "fonts", "text_buffer", "sparkline", "weather_forecast", "providers", "locations", "time_utils",
+                   "wifi_utils", "frame_store", "boot_timeline", "sensors", "history_log", "scheduler", "radio", "watchdog")
+LAZY_MODULES = ("weather_icons", "font_large", "weather_record", "thin_client", "frame_delta", "alerts", "wifi_setup", "portal_assets", "metrics_server", "display_worker", "select", "ssl")
+
+
+def profile_import(name):
+    """Import a module and return (time_us, heap_bytes), None if it was already loaded"""
+    if name in sys.modules:
+        return None
+    gc.collect()
+    alloc = gc.mem_alloc()
+    start = utime.ticks_us()
+    __import__(name)
+    elapsed = utime.ticks_diff(utime.ticks_us(), start)
+    gc.collect()
+    return elapsed, gc.mem_alloc() - alloc
+
+
+def run(modules=STARTUP_MODULES + LAZY_MODULES):
+    """Print the import time and retained heap per module.
+
+    Run it right after a soft reset (Ctrl-D) so nothing is loaded yet:
+        >>> import import_profile; import_profile.run()
+    """
+    gc.collect()
+    print(f"Heap before imports: free {gc.mem_free()} alloc {gc.mem_alloc()}")
+    total_us = 0
+    total_heap = 0
+    for name in modules:
+        try:
+            cost = profile_import(name)
+        except ImportError as e:
+            print(f"  {name:18s} not available ({e})")
+            continue
+        if cost is None:
+            print(f"  {name:18s} already loaded")
+            continue
+        elapsed, heap = cost
+        total_us += elapsed
+        total_heap += heap
+        lazy = " (lazy)" if name in LAZY_MODULES else ""
+        print(f"  {name:18s} {elapsed // 1000:5d} ms {heap:7d} B{lazy}")
+    print(f"Total: {total_us // 1000} ms, {total_heap} B")
+    print(f"Heap after imports: free {gc.mem_free()} alloc {gc.mem_alloc()}")
@@ -0,0 +1,173 @@
+import utime
+from http_client import Connection, HTTP_TIMEOUT
+from providers import router, OpenWeatherMap
+from metrics import metrics
+from mem_profile import profiler
+
+UPDATE_INTERVAL = 3600  # Every location's current weather is refreshed once per interval
+FORECAST_INTERVAL = 10800  # Forecasts are refreshed every 3 hours (to save API calls)
+
+
+class LocationRotator():
+    """Cycles the station through several Weather locations.
+
+    The update interval is split into one slot per location so fetches are
+    spread out instead of bursting, and whatever is due in a slot is sent
+    over one pipelined connection to the provider picked by the router.
+    With more than one location every location keeps a pre-rendered page,
+    switching pages is then a partial refresh from RAM with no network
+    traffic.
+    """
+    def __init__(self, locations, epd, interval=UPDATE_INTERVAL, forecast_interval=FORECAST_INTERVAL, on_update=None):
+        self.locations = locations
+        self.on_update = on_update  # Called with (location, now) after a fetch, before rendering
+        self.epd = epd
+        self.interval = interval
+        self.forecast_interval = forecast_interval
+        self.current = 0  # Location on screen
+        self.slot = 0  # Location refreshed in the current slot
+        self.hold_until = 0  # The slot's fetch was already done before a warm restart
+        if not router.stats:
+            router.add(OpenWeatherMap())
+        if len(locations) > 1:
+            for location in locations:
+                location.page = bytearray(len(epd.buffer))
+
+    @property
+    def slot_seconds(self):
+        return self.interval // len(self.locations)
+
+    def wait_seconds(self, now):
+        """Seconds until the next slot"""
+        if self.hold_until > now:
+            return self.hold_until - now
+        return self.slot_seconds
+
+    def state(self, now):
+        """Cached data and position for a warm restart, `now` is the start of the slot"""
+        return {"slot": self.slot, "next_fetch": now + self.wait_seconds(now),
+                "locations": [location.cache() for location in self.locations]}
+
+    def restore(self, state, now):
+        """Resume from state(), returns True when the slot's fetch was already done"""
+        restored = []
+        for location, cached in zip(self.locations, state["locations"]):
+            location.restore(cached)
+            if location.weather is not None:
+                restored.append(location)
+        self.slot = state["slot"] % len(self.locations)
+        if 0 < state["next_fetch"] - now <= self.slot_seconds:
+            self.hold_until = state["next_fetch"]
+        self.render(restored, now)
+        return self.hold_until > now
+
+    def due(self, now):
+        """(location, kind) requests for this slot, plus anything still missing"""
+        requests = []
+        for i, location in enumerate(self.locations):
+            in_slot = i == self.slot and now >= self.hold_until
+            if location.weather is None or in_slot:
+                requests.append((location, 'weather'))
+            if location.forecast is None or (in_slot and now - location.forecast_time >= self.forecast_interval):
+                requests.append((location, 'forecast'))
+        return requests
+
+    def fetch(self, requests):
+        """Fetch all requests, returns the updated locations.
+
+        Providers are tried in the router's order until every request is
+        answered, each gets one keep-alive connection with the requests
+        pipelined. A connection that broke off after some responses is
+        reopened once before moving on to the next provider.
+        """
+        updated = []
+        pending = list(requests)
+        now = utime.time()
+        for stats, timeout in router.plan(now, HTTP_TIMEOUT):
+            for _ in range(2):
+                if not pending or not self._pipeline(stats, timeout, pending, updated, now):
+                    break
+            if not pending:
+                break
+        return updated
+
+    def _pipeline(self, stats, timeout, pending, updated, now):
+        """Send the pending requests to one provider, returns how many responses arrived"""
+        provider = stats.provider
+        conn = Connection(provider.host, provider.port, provider.secure, timeout)
+        delivered = 0
+        opened = utime.ticks_ms()
+        requests = pending
+        if provider.combined:
+            # Weather and forecast come in one response, ask once per location
+            requests = []
+            for location, kind in pending:
+                if all(location is not sent for sent, _ in requests):
+                    requests.append((location, kind))
+        try:
+            conn.open()
+            # Send every request up front, then read the responses in order
+            for location, kind in requests:
+                conn.send(provider.path(location, kind))
+                stats.calls += 1
+            for location, kind in list(requests):
+                start = utime.ticks_ms()
+                provider.parse(location, kind, conn.response())
+                metrics.fetch_done(start, True)
+                if provider.combined:
+                    pending[:] = [request for request in pending if request[0] is not location]
+                else:
+                    pending.pop(0)
+                delivered += 1
+                if location not in updated:
+                    updated.append(location)
+        except Exception as e:
+            print(f"{provider.name}: stopped with {len(pending)} requests left: {e}")
+            metrics.fetch_done(opened, False)
+            stats.record(0, False, now)
+        finally:
+            conn.close()
+        if delivered:
+            # Connection setup is shared by the pipelined responses
+            stats.record(utime.ticks_diff(utime.ticks_ms(), opened) // delivered, True, now)
+        return delivered
+
+    def update(self, now):
+        """Fetch what is due and re-render the updated pages, returns the updated locations"""
+        return self.render(self.fetch(self.due(now)), now)
+
+    def render(self, updated, now):
+        """Re-render the pages of the updated locations and show the slot's page"""
+        for location in updated:
+            if location.weather is None:
+                continue
+            if self.on_update is not None:
+                self.on_update(location, now)
+            location.render_weather_horizontal(location.weather, location.forecast)
+            # Recorded outside the render, which itself must not allocate
+            profiler.record("rendered")
+            if location.page is not None:
+                location.page[:] = self.epd.buffer
+        self.current = self.slot
+        self.show(self.current)
+        return updated
+
+    def show(self, index):
+        """Copy a location's page into the framebuffer"""
+        location = self.locations[index]
+        if location.page is not None and location.weather is not None:
+            self.epd.buffer[:] = location.page
+
+    def rotate(self):
+        """Switch the framebuffer to the next location with data, False if there is none"""
+        n = len(self.locations)
+        for step in range(1, n):
+            index = (self.current + step) % n
+            if self.locations[index].weather is not None:
+                self.current = index
+                self.show(index)
+                return True
+        return False
+
+    def next_slot(self):
+        self.slot = (self.slot + 1) % len(self.locations)
@@ -1,74 +1,263 @@
-import network
-import urequests
 import utime
-import time
-import math
-import json
-import os
-from machine import Pin, ADC, reset, RTC, deepsleep, Timer
 from epaper_screen import EPD_2in13_V4_Landscape
 from weather_forecast import Weather
-from time_utils import sync_time
-from wifi_utils import WiFiCls, WiFiSetup
+from locations import LocationRotator
+from time_utils import TimeService
+from wifi_utils import WiFiCls
+from frame_store import read_frame, save_frame
+from frame_codec import decode_into
+from render_txn import Transaction, monitor, status_screen, FULL, PARTIAL
+from boot_timeline import BootTimeline
+from tracing import tracer, WIFI, TICK
+from mem_profile import profiler
+from metrics import metrics
+from sensors import sensor_service, pico_temperature, PicoTemperature
+from history_log import history, NO_VALUE, OUTDOOR
+from scheduler import AdaptiveScheduler
+from radio import RadioManager
+from providers import router, OpenWeatherMap, OpenMeteo, Companion
+from watchdog import watchdog, save_state, load_state, NETWORK, RENDER, IDLE, ERRORS, WIFI_FAILED, CONFIG
 
 # ====================== WEATHER API CONFIGURATION ======================
 WEATHER_API_KEY = "xxxxxxxxxxxxxx"
 LAT = "xx.xxxxxxx"
 LON = "xx.xxxxxxx"
+# Locations the station cycles through, a name of None shows the city name from the API
+LOCATIONS = [
+    {"name": None, "lat": LAT, "lon": LON},
+]
+# Weather providers, the router sends requests to the fastest healthy one
+PROVIDERS = (OpenWeatherMap(), OpenMeteo())
+COMPANION_HOST = None  # LAN address of tools/companion_server.py, e.g. "192.168.1.10"
+THIN_CLIENT = False  # Show pages rendered by the companion, the first location only
+ALERT_BROKER = None  # LAN address of tools/alert_broker.py for pushed alerts and refreshes
+PAGE_MINUTES = 5  # Switch to the next location's page every N minutes
+UPDATE_MINUTES = 10  # Thin client mode: minutes between frame requests to the LAN companion
 minutes_remaining = 60
 WIFI_FILE = "wifi.json"
+# Serve /metrics, /status and /frame.pbm on port 80. The listening socket keeps
+# the radio associated all the time: no duty cycling (radio only on for the
+# fetch window), but pushed alerts arrive at once instead of in the next window.
+METRICS_ENABLED = False
+DISPLAY_WORKER = False  # Run the display driver on the second core
+BME280_I2C = None  # (i2c bus, sda pin, scl pin) of an optional BME280, e.g. (0, 4, 5)
 
 def read_wifi_credentials():
-    if WIFI_FILE not in os.listdir():
+    import json
+    try:
+        with open(WIFI_FILE, 'r') as f:
+            raw = f.read()
+    except OSError:
         return None, None
-    with open(WIFI_FILE, 'r') as f:
-        raw = f.read()
-        data = json.loads(raw)
+    data = json.loads(raw)
     return data['ssid'], data['password']
 
 
-# Function to get temperature from Pico's internal sensor
-def read_pico_temperature():
-    sensor = ADC(4)
-    raw = sensor.read_u16()
-    voltage = raw * (3.3 / 65535)
-    temperature = 27 - (voltage - 0.706) / 0.001721
-    return temperature
+def idle(seconds, server, epd=None, alerts=None):
+    """Wait for `seconds`, serving metrics requests and pushed alerts in the meantime.
 
-# Main function
-def main():
-    # Add a delay at startup to allow all hardware to initialize
-    print("Starting weather station...")
-    utime.sleep(5)
-    
-    # Initialize the e-Paper display in landscape orientation
+    An alert banner change is shown at once with a partial update,
+    returns True when a refresh was requested.
+    """
+    if server is None and alerts is None:
+        utime.sleep(seconds)
+        return False
+    deadline = utime.ticks_add(utime.ticks_ms(), seconds * 1000)
+    while utime.ticks_diff(deadline, utime.ticks_ms()) > 0:
+        busy = server is not None and server.poll()
+        if alerts is not None:
+            if alerts.renew_due(utime.time()):
+                try:
+                    alerts.subscribe()
+                except OSError as e:
+                    print(f"Alert subscription failed: {e}")
+            if alerts.poll(epd):
+                monitor.next_cycle()
+                Transaction(epd, "alert").commit()
+            if alerts.refresh:
+                return True
+        if not busy:
+            utime.sleep_ms(100)
+    return False
+
+
+def start_sensors():
+    """Sample the internal temperature sensor, and a BME280 when configured"""
+    sensor_service.add(PicoTemperature())
+    if BME280_I2C is not None:
+        from machine import I2C, Pin
+        from sensors import BME280
+        bus, sda, scl = BME280_I2C
+        try:
+            sensor_service.add(BME280(I2C(bus, sda=Pin(sda), scl=Pin(scl), freq=400000)))
+        except OSError as e:
+            print(f"BME280 not available: {e}")
+    sensor_service.start()
+
+def record_observation(location, now):
+    """Log the outdoor and indoor temperature and attach today's outdoor range"""
+    weather = location.weather
+    indoor = sensor_service.average("temperature")
+    if indoor is None:
+        indoor = sensor_service.average("pico_temp")
+    history.append(location.weather_time, int(weather["temp"] * 100), weather["humidity"],
+                   weather["weather_id"], NO_VALUE if indoor is None else indoor)
+    today = history.today(OUTDOOR, now)
+    location.day_range = today[:2] if today else None
+
+
+def draw_eta(epd, minutes):
+    """Minutes until the next update, top right"""
+    epd.fill_rect(190, 8, 60, 8, 0xff)
+    epd.text("ETA:", 190, 8, 0x00)
+    epd.text(str(minutes), 220, 8, 0x00)
+
+
+def init_display():
+    """Initialize the e-Paper display in landscape orientation"""
     try:
-        epd = EPD_2in13_V4_Landscape()  # Now using landscape orientation
-        epd.Clear()
-        
-        # Initial message
-        epd.fill(0xff)
-        epd.text("Weather Station", 5, 10, 0x00)
-        epd.text("Initializing...", 5, 30, 0x00)
-        epd.display(epd.buffer)
-        
-        print("Display initialized")
+        return EPD_2in13_V4_Landscape()
     except Exception as e:
         print(f"Display initialization error: {e}")
-        utime.sleep(10)
+        utime.sleep(1)
         # Try one more time
-        epd = EPD_2in13_V4_Landscape()
-        epd.Clear()
-    
-    # Show connecting message
-    epd.fill(0xff)
-    epd.text("Weather Station", 5, 10, 0x00)
-    epd.text("Connecting to WiFi...", 5, 30, 0x00)
-    epd.display(epd.buffer)
-    
-    
+        return EPD_2in13_V4_Landscape()
+
+
+def thin_loop(epd, radio, server, time_service, warm):
+    """Main loop in thin client mode, never returns.
+
+    Every interval one request fetches the changes to the page the
+    companion rendered, the countdown runs like in the normal loop.
+    The alert banner is drawn here over the companion's frames.
+    """
+    from thin_client import ThinClient
+    location = LOCATIONS[0]
+    client = ThinClient(COMPANION_HOST, location["lat"], location["lon"], location["name"])
+    error_count = 0
+    if warm is not None:
+        # The restored snapshot is the acknowledged frame
+        client.ack = warm.get("frame", 0)
+        error_count = warm.get("errors", 0)
+    minutes = UPDATE_MINUTES
+    profiler.apply_gc_policy()
+    alerts = None
+    if ALERT_BROKER is not None:
+        from alerts import AlertListener
+        alerts = AlertListener(ALERT_BROKER, epd)
+    idle_alerts = alerts if radio.always_on else None
+    watchdog.start()
+    while True:
+        tracer.next_cycle()
+        try:
+            watchdog.progress(NETWORK, 240)
+            ok = False
+            radio.schedule(time_service.ensure_synced)
+            if alerts is not None and (idle_alerts is None or alerts.renew_due(utime.time())):
+                radio.schedule(alerts.subscribe)
+            try:
+                if radio.open():
+                    if alerts is not None:
+                        # Deltas apply to the acknowledged frame, which has no banner
+                        alerts.banner.restore(epd)
+                    ok = client.fetch(epd)
+                    if alerts is not None:
+                        alerts.poll(epd)
+                        alerts.refresh = False
+            finally:
+                radio.close()
+            watchdog.progress(RENDER, 60)
+            monitor.next_cycle()
+            if ok:
+                error_count = 0
+            else:
+                error_count += 1
+            # Small deltas become a partial update
+            with Transaction(epd, "frame"):
+                if alerts is not None:
+                    alerts.banner.overlay(epd)
+                draw_eta(epd, minutes)
+            if ok:
+                metrics.updated()
+                save_frame(epd.front, epd.height)
+            # A snapshot with a banner is not the companion's frame, the
+            # next boot then asks for a whole frame
+            banner = alerts is not None and alerts.banner.text is not None
+            # The count starts over after the reset below
+            save_state({"frame": 0 if banner else client.ack,
+                        "errors": 0 if error_count >= 5 else error_count})
+            if error_count >= 5:
+                print("Too many errors, resetting device...")
+                epd.wait_idle()
+                watchdog.reset(ERRORS)
+
+            epd.begin_partial()
+            refresh = False
+            for i in range(1, minutes):
+                watchdog.progress(IDLE, 150)
+                if idle(60, server, epd, idle_alerts):
+                    refresh = True
+                    break
+                monitor.next_cycle()
+                with Transaction(epd, "countdown"):
+                    draw_eta(epd, minutes - i)
+            if not refresh:
+                watchdog.progress(IDLE, 150)
+                refresh = idle(60, server, epd, idle_alerts)
+            epd.end_partial()
+            if refresh:
+                # Pushed "refresh now", the next frame is fetched at once
+                print("Refresh requested")
+                alerts.refresh = False
+        except Exception as e:
+            print(f"Error in thin client loop: {e}")
+            error_count += 1
+            watchdog.progress(IDLE, 150)
+            utime.sleep(60)
+
+
+# Main function
+def main():
+    timeline = BootTimeline()
+    print(f"Starting weather station, last reset: {watchdog.check_reset()}")
+
+    # Start WiFi association first, the radio connects in the background
+    # while the display is initialized and the last frame is restored
     ssid, password = read_wifi_credentials()
+    wifi = None
+    wifi_trace = tracer.begin()
+    if ssid is not None:
+        wifi = WiFiCls(ssid, password)
+        wifi.begin_connect()
+        timeline.mark("wifi_started")
+
+    epd = init_display()
+    timeline.mark("display_ready")
+    print("Display initialized")
+
+    # The panel still shows the last frame, only the controller RAM needs it.
+    # Without a snapshot do the single boot refresh with a splash screen.
+    snapshot = read_frame()
+    restored = snapshot is not None and decode_into(snapshot, epd.buffer)
+    if restored:
+        epd.swap()
+        epd.Load_Snapshot(snapshot)
+        timeline.mark("snapshot_restored")
+    else:
+        status_screen(epd, ("Weather Station", "Starting..."), "splash")
+        timeline.mark("splash_shown")
+
+    # Caches, counters and the slot position of the previous run. When the
+    # RTC survived and the slot's fetch was already done, the loop resumes
+    # with them and connects at the next fetch instead of waiting here.
+    warm = load_state()
+    time_service = TimeService()
+    resume = (warm is not None and ssid is not None and time_service.rtc_valid
+              and warm.get("next_fetch", 0) > utime.time())
+
     if ssid is None:
+        # Setup mode code and the portal pages are only loaded when needed
+        from wifi_setup import WiFiSetup
         wifi_config = WiFiSetup(epd, WIFI_FILE)
         ap = wifi_config.start_access_point()
         config_saved = wifi_config.setup_web_server()
@@ -79,121 +268,233 @@ def main():
         if config_saved:
             # If configuration was saved, restart the device
             print("Restarting after configuration...")
-            reset()
+            watchdog.reset(CONFIG)
+        wifi = WiFiCls(ssid, password)
     
+    if resume:
+        timeline.mark("warm_resume")
+    else:
+        # Wait for the background connection, fall back to full reconnects
+        wifi_connected = wifi.wait_connected() if ssid is not None else False
+        for attempt in range(3):
+            if wifi_connected:
+                break
+            print(f"WiFi connection attempt {attempt+1}...")
+            wifi_connected = wifi.connect()
+            if not wifi_connected:
+                utime.sleep(5)
+
+        if not wifi_connected:
+            status_screen(epd, ("WiFi Connection", "Failed!", "Check credentials", "and restart."), "wifi_failed")
+            utime.sleep(60)
+            watchdog.reset(WIFI_FAILED)
+        tracer.end(WIFI, wifi_trace)
+        timeline.mark("wifi_connected")
+
+        # Synchronize time, skipped while the RTC is still within its error bound
+        if time_service.ensure_synced():
+            timeline.mark("time_synced")
     
-    # Connect to WiFi with retries
-    wifi_connected = False
-    wifi = WiFiCls(ssid, password) 
-    for attempt in range(3):
-        print(f"WiFi connection attempt {attempt+1}...")
-        wifi_connected = wifi.connect()
-        if wifi_connected:
-            break
-        
-        epd.fill(0xff)
-        epd.text("WiFi Connection", 5, 10, 0x00)
-        epd.text(f"Attempt {attempt+1} failed", 5, 30, 0x00)
-        epd.text("Retrying...", 5, 50, 0x00)
-        epd.display(epd.buffer)
-        utime.sleep(5)
-    
-    if not wifi_connected:
-        epd.fill(0xff)
-        epd.text("WiFi Connection", 5, 10, 0x00)
-        epd.text("Failed!", 5, 30, 0x00)
-        epd.text("Check credentials", 5, 50, 0x00)
-        epd.text("and restart.", 5, 70, 0x00)
-        epd.display(epd.buffer)
-        utime.sleep(60)
-        reset()
-    
-    # Synchronize time if WiFi is connected
-    if wifi_connected:
-        epd.fill(0xff)
-        epd.text("Weather Station", 5, 10, 0x00)
-        epd.text("Synchronizing time...", 5, 30, 0x00)
-        epd.display(epd.buffer)
-        
-        time_synced = sync_time()
-        if time_synced:
-            t = utime.localtime()
-            time_str = f"{t[3]:02d}:{t[4]:02d}"
-            date_str = f"{t[2]:02d}/{t[1]:02d}/{t[0]}"
-            
-            epd.fill(0xff)
-            epd.text("Time synchronized", 5, 10, 0x00)
-            epd.text(f"Date: {date_str}", 5, 30, 0x00)
-            epd.text(f"Time: {time_str}", 5, 50, 0x00)
-            epd.display(epd.buffer)
-            utime.sleep(3)
-    
-    # Main loop - update every 15 minutes
+    # From here on core 1 owns the driver, everything below draws on the client
+    if DISPLAY_WORKER:
+        from display_worker import start_worker
+        epd = start_worker(epd)
+
+    server = None
+    if METRICS_ENABLED:
+        from metrics_server import MetricsServer
+        server = MetricsServer(epd)
+        server.start()
+    # The radio is only powered for the fetch window unless the server needs it
+    radio = RadioManager(wifi, always_on=server is not None)
+    if THIN_CLIENT and COMPANION_HOST is not None:
+        thin_loop(epd, radio, server, time_service, warm if restored else None)
+
+    # Main loop - every location is updated once per hour, in its own slot
     error_count = 0
-    last_forecast_time = 0
-    forecast_data = None
     
-    weather_cls = Weather(WEATHER_API_KEY, LAT, LON, epd)
+    weathers = [Weather(WEATHER_API_KEY, loc["lat"], loc["lon"], epd, loc["name"]) for loc in LOCATIONS]
+
+    # The history log follows the first location
+    def on_update(location, now):
+        if location is weathers[0]:
+            record_observation(location, now)
+
+    # A companion on the LAN answers faster than the APIs, which stay as fallback
+    if COMPANION_HOST is not None:
+        router.add(Companion(COMPANION_HOST))
+    for provider in PROVIDERS:
+        router.add(provider)
+    rotator = LocationRotator(weathers, epd, on_update=on_update)
+    scheduler = AdaptiveScheduler()
+    start_sensors()
+    history.load()
+    if warm is not None:
+        error_count = warm.get("errors", 0)
+        router.restore(warm.get("providers", ()))
+        if rotator.restore(warm, utime.time()):
+            print("Resuming the previous slot")
+    profiler.apply_gc_policy()
+    alerts = None
+    if ALERT_BROKER is not None:
+        from alerts import AlertListener
+        alerts = AlertListener(ALERT_BROKER, epd)
+    # Pushed alerts reach a duty cycled station in its next radio window,
+    # an always-on one polls for them while it waits
+    idle_alerts = alerts if radio.always_on else None
+    # Blocking calls without a timeout (ReadBusy, a stuck socket) now end
+    # in a watchdog reset instead of a frozen station
+    watchdog.start()
     while True:
+        tracer.next_cycle()
+        profiler.record("cycle_start")
         try:
-            # Get Pico's internal temperature
-            pico_temp = read_pico_temperature()
+            # Pico's internal temperature, averaged by the sensor service
+            pico_temp = pico_temperature()
             print(f"Pico temperature: {pico_temp:.1f}°C")
             
-            # Fetch current weather data
-            weather = weather_cls.fetch_weather()
-            
-            # Fetch forecast data every 3 hours (to save API calls)
-            current_time = utime.time()
-            if forecast_data is None or (current_time - last_forecast_time) > 10800:  # 3 hours
-                print("Fetching forecast data...")
-                forecast_data = weather_cls.fetch_forecast()
-                last_forecast_time = current_time
+            # One radio window per cycle for the NTP check and whatever is
+            # due in this slot, fetched over one connection. The pages of
+            # the updated locations are rendered with the radio off.
+            watchdog.progress(NETWORK, 240)
+            profiler.before_fetch()
+            now = utime.time()
+            requests = rotator.due(now)
+            fetched = []
+            try:
+                if requests:
+                    radio.schedule(time_service.ensure_synced)
+                    if alerts is not None and (idle_alerts is None or alerts.renew_due(now)):
+                        radio.schedule(alerts.subscribe)
+                    if radio.open():
+                        fetched = rotator.fetch(requests)
+                        if alerts is not None:
+                            # The broker answered the subscription with the retained alert
+                            alerts.poll(epd)
+                            alerts.refresh = False
+            finally:
+                radio.close()
+            profiler.record("fetch")
+            watchdog.progress(RENDER, 60)
+            updated = rotator.render(fetched, now)
+
+            # The next interval follows the weather and the API budget left today
+            scheduler.account(now)
+            rotator.interval = scheduler.next_interval(weathers, now)
+            rotator.forecast_interval = scheduler.forecast_interval(now)
             
-            if weather:
-                print(f"Weather: {weather['temp']:.1f}°C, {weather['description']}")
-                # Use the new horizontal display function
-                weather_cls.display_weather_horizontal(weather, forecast_data)
+            location = weathers[rotator.current]
+            # Nothing is due in a slot resumed after a warm restart
+            ok = location.weather is not None and (updated or not requests)
+            if ok:
                 error_count = 0
             else:
                 print("Failed to get weather data")
-                epd.fill(0xff)
-                epd.text("Weather Station", 5, 10, 0x00)
-                epd.text("Error fetching data", 5, 40, 0x00)
-                epd.text("Will retry...", 5, 60, 0x00)
-                epd.display(epd.buffer)
                 error_count += 1
+            slot_minutes = rotator.wait_seconds(now) // 60
+
+            # The page, or a status screen, and the countdown are drawn in
+            # one transaction so the cycle has a single full refresh
+            monitor.next_cycle()
+            with Transaction(epd, "cycle", FULL):
+                if error_count >= 5:
+                    epd.fill(0xff)
+                    epd.text("Too many errors", 5, 10, 0x00)
+                    epd.text("Resetting device...", 5, 30, 0x00)
+                else:
+                    if not ok:
+                        epd.fill(0xff)
+                        epd.text("Weather Station", 5, 10, 0x00)
+                        epd.text("Error fetching data", 5, 40, 0x00)
+                        epd.text("Will retry...", 5, 60, 0x00)
+                    if alerts is not None:
+                        alerts.banner.overlay(epd)
+                    draw_eta(epd, slot_minutes + 1)
+            profiler.record("display")
+
+            if ok:
+                weather = location.weather
+                print(f"Weather: {weather['temp']:.1f}°C, {weather['description']}")
+                # The snapshot is written while the panel refreshes
+                metrics.updated()
+                save_frame(epd.front, epd.height)
+                if timeline is not None:
+                    timeline.mark("first_frame")
+                    timeline.report()
+                    timeline = None
+
+            # Everything a warm restart needs besides the frame snapshot
+            state = rotator.state(now)
+            # The count starts over after the reset below
+            state["errors"] = 0 if error_count >= 5 else error_count
+            state["providers"] = router.state()
+            save_state(state)
             
             # If we have too many consecutive errors, reset the device
             if error_count >= 5:
                 print("Too many errors, resetting device...")
-                epd.fill(0xff)
-                epd.text("Too many errors", 5, 10, 0x00)
-                epd.text("Resetting device...", 5, 30, 0x00)
-                epd.display(epd.buffer)
+                history.flush()
+                epd.wait_idle()
                 utime.sleep(5)
-                reset()
+                watchdog.reset(ERRORS)
             
-            # Wait for 15 minutes before next update
-            print("Waiting 60 minutes until next update...")
-            epd.text("ETA:", 190, 8, 0x00)
-            epd.display(epd.buffer)  # Full refresh first time
-
-            epd.init()
-            for i in range(60):  # 60 * 60 seconds = 60 minutes
-                epd.fill_rect(220, 8, 40, 6, 0xff)
-                epd.text(str(60+1-i), 220, 8, 0x00)
-                epd.displayPartial(epd.buffer)
+            # Keep the last cycles' spans in flash for tools/trace_report.py
+            tracer.dump_file()
+            profiler.end_cycle()
+
+            # Wait for the next slot, rotating between the location pages
+            print(f"Waiting {slot_minutes} minutes until next update...")
+
+            # One partial session for the countdown, each tick only sends
+            # the RAM bytes under the counter
+            epd.begin_partial()
+            refresh = False
+            for i in range(1, slot_minutes):  # 60 seconds per tick
+                watchdog.progress(IDLE, 150)
+                if idle(60, server, epd, idle_alerts):
+                    refresh = True
+                    break
+                monitor.next_cycle()
+                tick = tracer.begin()
+                with Transaction(epd, "countdown") as txn:
+                    if i % PAGE_MINUTES == 0 and rotator.rotate():
+                        # Pages are pre-rendered without the ETA counter,
+                        # switching pages stays a partial refresh
+                        txn.kind = PARTIAL
+                        if alerts is not None:
+                            alerts.banner.overlay(epd)
+                    draw_eta(epd, slot_minutes + 1 - i)
+                tracer.end(TICK, tick)
          
-                utime.sleep(60)
                 # Check WiFi still connected periodically
-                if i % 15 == 0 and not wifi.connected:
+                if radio.always_on and i % 15 == 0 and not wifi.connected:
                     print("WiFi disconnected, attempting to reconnect...")
-                    wifi.connect()                            
+                    metrics.wifi_reconnects += 1
+                    t = tracer.begin()
+                    wifi.connect()
+                    tracer.end(WIFI, t)
+                    if server is not None:
+                        # The listening socket does not survive the interface restart
+                        server.stop()
+                        server.start()
+            if not refresh:
+                watchdog.progress(IDLE, 150)
+                refresh = idle(60, server, epd, idle_alerts)
+            epd.end_partial()
+            if refresh:
+                # Pushed "refresh now": fetch the slot's location again at once
+                print("Refresh requested")
+                alerts.refresh = False
+                rotator.hold_until = 0
+            else:
+                rotator.next_slot()
         except Exception as e:
             print(f"Error in main loop: {e}")
+            if isinstance(e, MemoryError):
+                profiler.record("memory_error")
             error_count += 1
             # Wait and try again
+            watchdog.progress(IDLE, 150)
             utime.sleep(60)
 
 # Run the main function
@@ -0,0 +1,94 @@
+import gc
+
+MEM_LOG_FILE = "mem_log.csv"
+MEM_LOG_MAX = 16 * 1024  # Rotated to mem_log.old when larger than this
+# Binary search for the largest allocatable block, about 18 gc.collect() calls.
+# Off by default: the collections cost more than the stages take and change
+# the fragmentation being measured. When on, only PROBE_STAGE is probed.
+PROBE_LARGEST_BLOCK = False
+PROBE_STAGE = "display"  # Once per cycle, after the page was shown
+
+# GC policy
+GC_COLLECT_BEFORE_FETCH = True  # Explicit collection before each network fetch
+GC_THRESHOLD_DIVISOR = 4  # Collect after allocating 1/N of the free heap, 0 leaves the default
+
+
+def largest_free_block(limit=256 * 1024):
+    """Largest bytearray that can currently be allocated (fragmentation probe)"""
+    lo = 0
+    hi = min(limit, gc.mem_free())
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        try:
+            probe = bytearray(mid)
+            probe = None
+            lo = mid
+        except MemoryError:
+            hi = mid - 1
+        gc.collect()
+    return lo
+
+
+class MemProfiler():
+    """Heap usage per main loop stage, with the worst value per stage across cycles"""
+    def __init__(self, log_file=MEM_LOG_FILE, probe=PROBE_LARGEST_BLOCK):
+        self.log_file = log_file
+        self.probe = probe
+        self.cycle = 0
+        # stage -> [free, alloc, block, min_free, peak_alloc, min_block]
+        self.stages = {}
+        self.order = []
+
+    def apply_gc_policy(self):
+        gc.collect()
+        if GC_THRESHOLD_DIVISOR:
+            gc.threshold(gc.mem_free() // GC_THRESHOLD_DIVISOR + gc.mem_alloc())
+
+    def before_fetch(self):
+        if GC_COLLECT_BEFORE_FETCH:
+            gc.collect()
+
+    def record(self, stage):
+        free = gc.mem_free()
+        alloc = gc.mem_alloc()
+        block = largest_free_block() if self.probe and stage == PROBE_STAGE else -1
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [free, alloc, block, free, alloc, block]
+            self.order.append(stage)
+            return
+        entry[0] = free
+        entry[1] = alloc
+        entry[2] = block
+        entry[3] = min(entry[3], free)
+        entry[4] = max(entry[4], alloc)
+        entry[5] = min(entry[5], block)
+
+    def status_lines(self):
+        lines = []
+        for stage in self.order:
+            e = self.stages[stage]
+            lines.append(f"{stage}: free {e[0]} alloc {e[1]} block {e[2]} | min free {e[3]} peak alloc {e[4]} min block {e[5]}")
+        return lines
+
+    def end_cycle(self):
+        """Print this cycle's stages and append them to the flash log"""
+        for line in self.status_lines():
+            print(f"mem {line}")
+        try:
+            import os
+            try:
+                if os.stat(self.log_file)[6] > MEM_LOG_MAX:
+                    os.rename(self.log_file, self.log_file[:-4] + ".old")
+            except OSError:
+                pass
+            with open(self.log_file, 'a') as f:
+                for stage in self.order:
+                    e = self.stages[stage]
+                    f.write(f"{self.cycle},{stage},{e[0]},{e[1]},{e[2]}\n")
+        except OSError as e:
+            print(f"Error writing memory log: {e}")
+        self.cycle += 1
+
+
+profiler = MemProfiler()
@@ -0,0 +1,46 @@
+import utime
+
+
+class Metrics():
+    """Counters and gauges exported by the metrics endpoint"""
+    def __init__(self):
+        self.fetch_count = 0
+        self.fetch_failures = 0
+        self.fetch_latency_ms = 0  # Last successful fetch
+        self.fetch_latency_sum_ms = 0
+        self.wifi_reconnects = 0
+        self.radio_on_ms = 0
+        self.radio_on_last_hour = 0  # Radio-on seconds per hour, updated about hourly
+        self.full_refreshes = 0
+        self.partial_refreshes = 0
+        self.spi_bytes = 0  # Image bytes written to the display controller RAM
+        self.last_update = None  # ticks_ms of the last successful display update
+        self._uptime_ms = 0
+        self._ticks = utime.ticks_ms()
+
+    def fetch_done(self, start, ok):
+        """Record a fetch that started at ticks_ms `start`"""
+        self.fetch_count += 1
+        if ok:
+            self.fetch_latency_ms = utime.ticks_diff(utime.ticks_ms(), start)
+            self.fetch_latency_sum_ms += self.fetch_latency_ms
+        else:
+            self.fetch_failures += 1
+
+    def updated(self):
+        self.last_update = utime.ticks_ms()
+
+    def uptime(self):
+        # Accumulated in steps so ticks_ms wrap-around does not matter
+        now = utime.ticks_ms()
+        self._uptime_ms += utime.ticks_diff(now, self._ticks)
+        self._ticks = now
+        return self._uptime_ms // 1000
+
+    def last_update_age(self):
+        if self.last_update is None:
+            return -1
+        return utime.ticks_diff(utime.ticks_ms(), self.last_update) // 1000
+
+
+metrics = Metrics()
@@ -0,0 +1,178 @@
+import gc
+import socket
+import utime
+from metrics import metrics
+from mem_profile import profiler
+from render_txn import monitor
+from sensors import sensor_service
+from providers import router
+from watchdog import watchdog
+from epaper_screen import EPD_WIDTH
+
+METRICS_PORT = 80
+REQUEST_TIMEOUT = 2  # Seconds a client gets to send its request and read the whole reply
+FRAME_BANDS = 2  # 8-row bands of the PBM sent per write
+
+
+class MetricsServer():
+    """Non-blocking HTTP endpoint serving /metrics, /status and /frame.pbm in STA mode"""
+    def __init__(self, epd, port=METRICS_PORT):
+        self.epd = epd
+        self.port = port
+        self.sock = None
+
+    def start(self):
+        try:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind(('0.0.0.0', self.port))
+            s.listen(2)
+            s.setblocking(False)
+            self.sock = s
+            print(f"Metrics server listening on port {self.port}")
+        except OSError as e:
+            print(f"Error starting metrics server: {e}")
+            self.sock = None
+
+    def stop(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def poll(self):
+        """Serve at most one pending request, returns immediately when there is none"""
+        if self.sock is None:
+            return False
+        try:
+            conn, addr = self.sock.accept()
+        except OSError:
+            return False
+        # One deadline for the whole request, a slow client must not hold
+        # up the countdown for a socket timeout per write
+        self.deadline = utime.ticks_add(utime.ticks_ms(), REQUEST_TIMEOUT * 1000)
+        try:
+            conn.settimeout(REQUEST_TIMEOUT)
+            request = conn.recv(512)
+            path = request.split(b' ', 2)[1] if request.count(b' ') >= 2 else b'/'
+            if path == b'/metrics':
+                self.send_text(conn, self.render_metrics(), 'text/plain; version=0.0.4')
+            elif path == b'/frame.pbm':
+                self.send_frame(conn)
+            elif path in (b'/', b'/status'):
+                self.send_text(conn, self.render_status(), 'text/plain')
+            else:
+                self.send(conn, b'HTTP/1.0 404 Not Found\r\n\r\n')
+        except OSError as e:
+            print(f"Metrics request error: {e}")
+        finally:
+            conn.close()
+        return True
+
+    def send(self, conn, data):
+        """sendall() within what is left of the request deadline"""
+        left = utime.ticks_diff(self.deadline, utime.ticks_ms())
+        if left <= 0:
+            raise OSError("request deadline passed")
+        conn.settimeout(left / 1000)
+        conn.sendall(data)
+
+    def send_text(self, conn, body, content_type):
+        self.send(conn, f'HTTP/1.0 200 OK\r\nContent-Type: {content_type}\r\n\r\n'.encode())
+        self.send(conn, body.encode())
+
+    def render_metrics(self):
+        m = metrics
+        free = gc.mem_free()
+        lines = [
+            "# TYPE weather_fetch_latency_ms gauge",
+            f"weather_fetch_latency_ms {m.fetch_latency_ms}",
+            "# TYPE weather_fetch_latency_ms_sum counter",
+            f"weather_fetch_latency_ms_sum {m.fetch_latency_sum_ms}",
+            "# TYPE weather_fetch_total counter",
+            f"weather_fetch_total {m.fetch_count}",
+            "# TYPE weather_fetch_failures_total counter",
+            f"weather_fetch_failures_total {m.fetch_failures}",
+            "# TYPE wifi_reconnects_total counter",
+            f"wifi_reconnects_total {m.wifi_reconnects}",
+            "# TYPE radio_on_seconds_total counter",
+            f"radio_on_seconds_total {m.radio_on_ms // 1000}",
+            "# TYPE radio_on_seconds_per_hour gauge",
+            f"radio_on_seconds_per_hour {m.radio_on_last_hour}",
+            "# TYPE epd_refresh_total counter",
+            f'epd_refresh_total{{type="full"}} {m.full_refreshes}',
+            f'epd_refresh_total{{type="partial"}} {m.partial_refreshes}',
+            "# TYPE epd_extra_refresh_total counter",
+            f"epd_extra_refresh_total {monitor.violations}",
+            "# TYPE epd_spi_bytes_total counter",
+            f"epd_spi_bytes_total {m.spi_bytes}",
+            "# TYPE heap_free_bytes gauge",
+            f"heap_free_bytes {free}",
+            "# TYPE heap_alloc_bytes gauge",
+            f"heap_alloc_bytes {gc.mem_alloc()}",
+        ]
+        if profiler.stages:
+            lines.append("# TYPE heap_stage_min_free_bytes gauge")
+            for stage in profiler.order:
+                lines.append(f'heap_stage_min_free_bytes{{stage="{stage}"}} {profiler.stages[stage][3]}')
+        if router.stats:
+            lines.append("# TYPE provider_latency_ms gauge")
+            for stats in router.stats:
+                if stats.latency_ms is not None:
+                    lines.append(f'provider_latency_ms{{provider="{stats.provider.name}"}} {stats.latency_ms}')
+            lines.append("# TYPE provider_error_rate_percent gauge")
+            for stats in router.stats:
+                lines.append(f'provider_error_rate_percent{{provider="{stats.provider.name}"}} {stats.error_rate}')
+        if sensor_service.count:
+            lines.append("# TYPE sensor_value gauge")
+            for name in sensor_service.names:
+                lines.append(f'sensor_value{{channel="{name}"}} {sensor_service.average(name)}')
+        lines += [
+            "# TYPE uptime_seconds counter",
+            f"uptime_seconds {m.uptime()}",
+            "# TYPE last_update_age_seconds gauge",
+            f"last_update_age_seconds {m.last_update_age()}",
+            "",
+        ]
+        return "\n".join(lines)
+
+    def render_status(self):
+        m = metrics
+        lines = [
+            "Weather Station",
+            f"Uptime: {m.uptime()} s",
+            f"Last reset: {watchdog.reason_text}",
+            f"Last update: {m.last_update_age()} s ago",
+            f"Fetches: {m.fetch_count} ({m.fetch_failures} failed), last {m.fetch_latency_ms} ms",
+            f"WiFi reconnects: {m.wifi_reconnects}, radio on {m.radio_on_last_hour} s/h",
+            f"Refreshes: {m.full_refreshes} full, {m.partial_refreshes} partial",
+        ]
+        for stats in router.stats:
+            lines.append(f"Provider {stats.provider.name}: {stats.latency_ms} ms, {stats.error_rate}% errors")
+        lines.append(f"Heap: free {gc.mem_free()} alloc {gc.mem_alloc()}")
+        lines += profiler.status_lines()
+        return "\n".join(lines) + "\n"
+
+    def send_frame(self, conn):
+        """Stream the landscape framebuffer as a binary PBM, a few bands per write"""
+        epd = self.epd
+        width = epd.height  # Landscape framebuffer is height x width of the panel
+        height = EPD_WIDTH  # Visible rows, the buffer is padded to a multiple of 8
+        buf = epd.front  # What the panel shows, not the frame being drawn
+        stride = (width + 7) // 8
+        rows = 8 * FRAME_BANDS
+        out = bytearray(stride * rows)
+        self.send(conn, f'HTTP/1.0 200 OK\r\nContent-Type: image/x-portable-bitmap\r\n\r\nP4\n{width} {height}\n'.encode())
+        for y0 in range(0, height, rows):
+            n = min(rows, height - y0)
+            for i in range(len(out)):
+                out[i] = 0
+            for r in range(n):
+                y = y0 + r
+                base = (y >> 3) * width
+                bit = 1 << (y & 7)
+                row = r * stride
+                for x in range(width):
+                    # MONO_VLSB 0 bits are black, PBM 1 bits are black
+                    if not buf[base + x] & bit:
+                        out[row + (x >> 3)] |= 0x80 >> (x & 7)
+            self.send(conn, memoryview(out)[:n * stride])
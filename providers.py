@@ -0,0 +1,209 @@
+import json
+import utime
+from http_client import iter_json_array
+
+LATENCY_BUDGET_MS = 5000  # Socket timeout of the first provider when another one can take over
+ERROR_LIMIT = 50  # Error rate (%) above which a provider is only used as a last resort
+PROBE_INTERVAL = 1800  # Seconds before an unhealthy provider rejoins the latency order
+EWMA_SHIFT = 2  # Moving averages weigh the newest sample 1/4
+
+# WMO weather interpretation codes to (OpenWeatherMap condition id, description),
+# the renderer, icons and scheduler work on OpenWeatherMap ids
+WMO_CODES = {
+    0: (800, "clear sky"), 1: (801, "mainly clear"), 2: (802, "partly cloudy"), 3: (804, "overcast"),
+    45: (741, "fog"), 48: (741, "rime fog"),
+    51: (300, "light drizzle"), 53: (301, "drizzle"), 55: (302, "heavy drizzle"),
+    56: (311, "freezing drizzle"), 57: (311, "freezing drizzle"),
+    61: (500, "light rain"), 63: (501, "moderate rain"), 65: (502, "heavy rain"),
+    66: (511, "freezing rain"), 67: (511, "freezing rain"),
+    71: (600, "light snow"), 73: (601, "snow"), 75: (602, "heavy snow"), 77: (600, "snow grains"),
+    80: (520, "light showers"), 81: (521, "showers"), 82: (522, "heavy showers"),
+    85: (620, "snow showers"), 86: (622, "heavy snow showers"),
+    95: (211, "thunderstorm"), 96: (202, "thunderstorm, hail"), 99: (202, "thunderstorm, hail"),
+}
+
+
+class OpenWeatherMap():
+    """The /data/2.5 current weather and 5 day / 3 hour forecast endpoints"""
+    name = "owm"
+    host = "api.openweathermap.org"
+    port = 443
+    secure = True
+    combined = False  # One response answers both kinds of request
+    keyed = True  # Requests are charged to the API key's daily budget
+
+    def path(self, location, kind):
+        return location.path(kind)
+
+    def parse(self, location, kind, body):
+        if kind == 'weather':
+            location.parse_weather(json.loads(body.read_all()))
+        else:
+            location.parse_forecast(iter_json_array(body, "list"))
+            body.drain()
+
+
+class OpenMeteo():
+    """Open-Meteo forecast API, needs no key.
+
+    Responses are normalized into the OpenWeatherMap record shape: WMO
+    codes are mapped to OpenWeatherMap ids, the daily forecast uses the
+    day's maximum and the sparkline gets 3-hourly samples for 48 hours.
+    """
+    name = "open-meteo"
+    host = "api.open-meteo.com"
+    port = 443
+    secure = True
+    combined = False
+    keyed = False
+
+    def path(self, location, kind):
+        path = f"v1/forecast?latitude={location.lat}&longitude={location.lon}&timezone=auto&wind_speed_unit=ms"
+        if kind == 'weather':
+            return path + "&current=temperature_2m,apparent_temperature,relative_humidity_2m,weather_code,wind_speed_10m"
+        return (path + "&hourly=temperature_2m,precipitation_probability&forecast_hours=48&temporal_resolution=hourly_3"
+                "&daily=weather_code,temperature_2m_max,relative_humidity_2m_mean,wind_speed_10m_max&forecast_days=6")
+
+    def parse(self, location, kind, body):
+        data = json.loads(body.read_all())
+        if kind == 'weather':
+            current = data["current"]
+            weather_id, description = WMO_CODES.get(current["weather_code"], (800, "unknown"))
+            city = location.name or (location.weather["city"] if location.weather else "Weather")
+            location.set_weather({
+                "temp": current["temperature_2m"],
+                "feels_like": current["apparent_temperature"],
+                "humidity": current["relative_humidity_2m"],
+                "description": description,
+                "weather_id": weather_id,
+                "wind_speed": current["wind_speed_10m"],
+                "city": city,
+                "country": "",
+            })
+            return
+
+        sparkline = location.sparkline
+        sparkline.reset()
+        hourly = data["hourly"]
+        for temp, pop in zip(hourly["temperature_2m"], hourly["precipitation_probability"]):
+            if temp is None:
+                break
+            sparkline.add(int(temp * 10), pop or 0)
+
+        from weather_forecast import days_dict, next_days_dict
+        daily = data["daily"]
+        t = utime.localtime()
+        today = f"{t[0]}-{t[1]:02d}-{t[2]:02d}"
+        day = days_dict[t[6]]
+        days = []
+        for i, date in enumerate(daily["time"]):
+            if date == today or len(days) >= 5:
+                continue
+            day = next_days_dict[day]
+            weather_id, description = WMO_CODES.get(daily["weather_code"][i], (800, "unknown"))
+            days.append({
+                "date": date,
+                "day": day,
+                "temp": daily["temperature_2m_max"][i],
+                "description": description,
+                "weather_id": weather_id,
+                "humidity": daily["relative_humidity_2m_mean"][i],
+                "wind_speed": daily["wind_speed_10m_max"][i],
+            })
+        location.set_forecast(days)
+
+
+class Companion():
+    """tools/companion_server.py on the LAN, over plain HTTP.
+
+    The companion fetches each location once per interval for all
+    stations and answers with a weather_record, which holds the current
+    weather, forecast and sparkline. One request per location stores all
+    of them.
+    """
+    name = "companion"
+    secure = False
+    combined = True
+    keyed = False  # The companion's upstream calls use its own key
+
+    def __init__(self, host, port=8080):
+        self.host = host
+        self.port = port
+
+    def path(self, location, kind):
+        return f"record?lat={location.lat}&lon={location.lon}"
+
+    def parse(self, location, kind, body):
+        from weather_record import apply
+        apply(location, body.read_all())
+
+
+class ProviderStats():
+    """Moving averages of one provider's latency and error rate"""
+    def __init__(self, provider):
+        self.provider = provider
+        self.latency_ms = None  # Per response, None until the first success
+        self.error_rate = 0  # Percent
+        self.last_attempt = 0  # utime.time() of the last attempt
+        self.requests = 0
+        self.failures = 0
+        self.calls = 0  # API requests sent
+
+    def record(self, ms, ok, now):
+        self.last_attempt = now
+        self.requests += 1
+        if ok:
+            if self.latency_ms is None:
+                self.latency_ms = ms
+            else:
+                self.latency_ms += (ms - self.latency_ms) >> EWMA_SHIFT
+        else:
+            self.failures += 1
+        self.error_rate += ((0 if ok else 100) - self.error_rate) >> EWMA_SHIFT
+
+    def healthy(self, now):
+        return self.error_rate < ERROR_LIMIT or now - self.last_attempt >= PROBE_INTERVAL
+
+
+class ProviderRouter():
+    """Sends requests to the fastest healthy provider.
+
+    Healthy providers are tried by moving average latency, an unmeasured
+    one counts as LATENCY_BUDGET_MS. Ones with a high error rate come last
+    until PROBE_INTERVAL has passed since their last attempt. While another provider can take over, the first one
+    only gets LATENCY_BUDGET_MS per socket operation (a sequential hedge,
+    a single-core station cannot keep two TLS requests in flight).
+    """
+    def __init__(self):
+        self.stats = []
+
+    def add(self, provider):
+        self.stats.append(ProviderStats(provider))
+        return provider
+
+    def state(self):
+        return [[s.latency_ms, s.error_rate, s.last_attempt] for s in self.stats]
+
+    def keyed_calls(self):
+        """Requests sent to providers that charge them to an API key"""
+        return sum(s.calls for s in self.stats if s.provider.keyed)
+
+    def restore(self, state):
+        for stats, (latency_ms, error_rate, last_attempt) in zip(self.stats, state):
+            stats.latency_ms = latency_ms
+            stats.error_rate = error_rate
+            stats.last_attempt = last_attempt
+
+    def plan(self, now, timeout):
+        """[(stats, timeout)] in the order the providers should be tried"""
+        healthy = [s for s in self.stats if s.healthy(now)]
+        healthy.sort(key=lambda s: LATENCY_BUDGET_MS if s.latency_ms is None else s.latency_ms)
+        order = healthy + [s for s in self.stats if s not in healthy]
+        plan = []
+        for i, stats in enumerate(order):
+            last = i == len(order) - 1
+            plan.append((stats, timeout if last else min(timeout, LATENCY_BUDGET_MS // 1000)))
+        return plan
+
+
+router = ProviderRouter()
@@ -0,0 +1,81 @@
+import utime
+from metrics import metrics
+from tracing import tracer, WIFI
+
+CONNECT_TIMEOUT = 15  # Seconds to wait for the fast reconnect before the full connect
+
+
+class RadioManager():
+    """Powers the CYW43 radio only for network windows.
+
+        radio.schedule(time_service.ensure_synced)
+        if radio.open():
+            ...fetch...
+        radio.close()
+
+    open() powers the chip up with the background connect path and runs
+    the work queued with schedule(), so everything due is batched into one
+    window; close() powers it down again. With always_on (the metrics
+    server needs a listening socket) the radio stays associated and only
+    dropped connections are repaired. Radio-on time is accumulated into
+    metrics.radio_on_ms and, as seconds per hour, into
+    metrics.radio_on_last_hour.
+    """
+    def __init__(self, wifi, always_on=False):
+        self.wifi = wifi
+        self.always_on = always_on
+        self.pending = []  # Callables run in the next window
+        self.on_since = None  # ticks_ms the radio was powered up, None while off
+        self.hour_start = utime.ticks_ms()
+        self.hour_ms = 0  # Radio-on time in the current hour
+
+    def schedule(self, job):
+        if job not in self.pending:
+            self.pending.append(job)
+
+    def open(self):
+        """Power up and connect, then run the queued jobs. Returns True when connected."""
+        if self.on_since is None:
+            self.on_since = utime.ticks_ms()
+        wifi = self.wifi
+        if wifi.connected:
+            connected = True
+        else:
+            t = tracer.begin()
+            wifi.begin_connect()
+            connected = wifi.wait_connected(CONNECT_TIMEOUT)
+            if not connected:
+                metrics.wifi_reconnects += 1
+                connected = wifi.connect()
+            tracer.end(WIFI, t)
+        if connected:
+            jobs = self.pending
+            self.pending = []
+            for job in jobs:
+                try:
+                    job()
+                except Exception as e:
+                    print(f"Network job failed: {e}")
+        return connected
+
+    def close(self):
+        """End the window, the radio is powered down unless it has to stay on"""
+        self._account()
+        if not self.always_on:
+            self.wifi.disconnect()
+            self.on_since = None
+
+    def _account(self):
+        now = utime.ticks_ms()
+        if self.on_since is not None:
+            on = utime.ticks_diff(now, self.on_since)
+            self.on_since = now
+            metrics.radio_on_ms += on
+            self.hour_ms += on
+        elapsed = utime.ticks_diff(now, self.hour_start) // 1000
+        if elapsed >= 3600:
+            # Windows can be more than an hour apart, scale to seconds per hour
+            metrics.radio_on_last_hour = self.hour_ms // 1000 * 3600 // elapsed
+            print(f"Radio on {metrics.radio_on_last_hour} s per hour")
+            self.hour_ms = 0
+            self.hour_start = now
@@ -0,0 +1,53 @@
+import gc
+import framebuf
+from weather_forecast import Weather
+
+# Steady state render allocation check, run on the device:
+#     >>> import render_alloc; render_alloc.run()
+# The page is drawn into a scratch framebuffer, the panel is not touched.
+
+WARMUP = 2  # Renders that may load weather_icons/font_large and fill the glyph cache
+RENDERS = 5
+
+SAMPLE_WEATHER = {"temp": -3.46, "feels_like": -7.0, "humidity": 87, "description": "light snow",
+                  "weather_id": 600, "wind_speed": 4.1, "city": "Thessaloniki", "country": "GR"}
+SAMPLE_FORECAST = [{"day": day, "temp": temp, "description": "", "weather_id": weather_id,
+                    "humidity": 60, "wind_speed": 3.0, "date": ""}
+                   for day, temp, weather_id in (("Mon", 1.2, 800), ("Tue", -0.5, 601), ("Wed", 12.75, 500),
+                                                 ("Thu", 8.0, 211), ("Fri", 9.9, 803))]
+
+
+class ScratchEPD(framebuf.FrameBuffer):
+    """Landscape framebuffer with the attributes the layout code reads"""
+    def __init__(self):
+        self.width = 128
+        self.height = 250
+        self.buffer = bytearray(self.height * self.width // 8)
+        super().__init__(self.buffer, self.height, self.width, framebuf.MONO_VLSB)
+
+
+def measure(weather, renders=RENDERS):
+    """Heap bytes allocated by `renders` renders of an already prepared Weather"""
+    for _ in range(WARMUP):
+        weather.render_weather_horizontal(weather.weather, weather.forecast)
+    gc.collect()
+    gc.disable()  # A collection during the renders would hide allocations
+    try:
+        before = gc.mem_alloc()
+        for _ in range(renders):
+            weather.render_weather_horizontal(weather.weather, weather.forecast)
+        return gc.mem_alloc() - before
+    finally:
+        gc.enable()
+
+
+def run():
+    weather = Weather("", 0, 0, ScratchEPD())
+    weather.set_weather(SAMPLE_WEATHER)
+    weather.set_forecast(SAMPLE_FORECAST)
+    weather.day_range = (-512, 149)
+    for temp, pop in ((-40, 10), (0, 60), (113, 100), (25, 0)):
+        weather.sparkline.add(temp, pop)
+    allocated = measure(weather)
+    print(f"Render allocations: {allocated} B over {RENDERS} renders")
+    assert allocated == 0, "the render path allocates"
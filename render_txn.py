@@ -0,0 +1,122 @@
+AUTO = 0
+FULL = 1
+PARTIAL = 2
+KIND_NAMES = ("auto", "full", "partial")
+
+FULL_REFRESH_AREA = 50  # AUTO commits changing more than this % of the frame do a full refresh
+
+
+class RefreshMonitor():
+    """Counts panel refreshes per cycle and reports cycles with more than one"""
+    def __init__(self):
+        self.count = 0
+        self.sources = []  # (source, kind) of this cycle's refreshes
+        self.source = None  # Name of the committing transaction, None for direct calls
+        self.violations = 0
+
+    def next_cycle(self):
+        self.count = 0
+        self.sources = []
+
+    def refreshed(self, kind):
+        self.count += 1
+        self.sources.append((self.source or "direct", KIND_NAMES[kind]))
+        if self.count > 1:
+            self.violations += 1
+            print(f"Warning: {self.count} refreshes this cycle: {self.sources}")
+
+
+monitor = RefreshMonitor()
+
+
+def dirty_rect(front, back, width, bands):
+    """Bounding box (x0, x1, j0, j1) of the bytes that differ, None if identical.
+
+    x is the landscape column, j the 8 pixel band.
+    """
+    j0 = -1
+    j1 = -1
+    x0 = width
+    x1 = -1
+    for j in range(bands):
+        start = j * width
+        end = start + width
+        if front[start:end] == back[start:end]:
+            continue
+        if j0 < 0:
+            j0 = j
+        j1 = j
+        lo = start
+        while front[lo] == back[lo]:
+            lo += 1
+        hi = end - 1
+        while front[hi] == back[hi]:
+            hi -= 1
+        x0 = min(x0, lo - start)
+        x1 = max(x1, hi - start)
+    if j0 < 0:
+        return None
+    return x0, x1, j0, j1
+
+
+class Transaction():
+    """Batch drawing into the back buffer and refresh the panel once.
+
+        with Transaction(epd, "countdown"):
+            epd.fill_rect(...)
+            epd.text(...)
+
+    The commit compares the back buffer with what the panel shows: nothing
+    is sent when they match, AUTO picks a windowed partial update for small
+    changes and a full refresh for large ones, FULL and PARTIAL force the
+    type. An exception or abort() leaves the panel untouched.
+    """
+    def __init__(self, epd, name, kind=AUTO):
+        self.epd = epd
+        self.name = name
+        self.kind = kind
+        self.aborted = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and not self.aborted:
+            self.commit()
+        return False
+
+    def abort(self):
+        self.aborted = True
+
+    def commit(self):
+        """Issue the single panel update, returns the kind used or None"""
+        epd = self.epd
+        # No wait_idle() here: the driver waits for a running refresh in
+        # present()/update_region(), the display worker client queues
+        width = epd.height  # Landscape columns
+        bands = epd.width // 8
+        rect = dirty_rect(epd.front, epd.buffer, width, bands)
+        if rect is None:
+            return None
+        x0, x1, j0, j1 = rect
+        kind = self.kind
+        if kind == AUTO:
+            area = (x1 - x0 + 1) * (j1 - j0 + 1)
+            kind = FULL if area * 100 > width * bands * FULL_REFRESH_AREA else PARTIAL
+        monitor.source = self.name
+        try:
+            if kind == FULL:
+                epd.present()
+            else:
+                epd.update_region(x0, j0 * 8, x1 - x0 + 1, (j1 - j0 + 1) * 8)
+        finally:
+            monitor.source = None
+        return kind
+
+
+def status_screen(epd, lines, name="status"):
+    """Full screen text message with one refresh"""
+    with Transaction(epd, name, FULL):
+        epd.fill(0xff)
+        for i, line in enumerate(lines):
+            epd.text(line, 5, 10 + i * 20, 0x00)
@@ -0,0 +1,156 @@
+import utime
+from providers import router
+
+SCHEDULE_FILE = "schedule.json"
+DAILY_CALL_BUDGET = 200  # API requests per day, OpenWeatherMap's free tier allows 1000
+
+BASE_INTERVAL = 3600  # Seconds between updates of all locations in normal conditions
+MIN_INTERVAL = 900
+MAX_INTERVAL = 3 * 3600
+FORECAST_INTERVAL = 10800
+NIGHT_START = 23  # Local hours with longer intervals
+NIGHT_END = 6
+
+TEMP_JUMP = 150  # 1/100 degree change between updates counted as volatile
+TEMP_STABLE = 50
+POP_TRANSITION = 50  # Precipitation probability (%) that counts as a coming change
+
+
+def is_severe(weather_id):
+    """Thunderstorm, heavy rain or snow, squalls and tornadoes"""
+    return (weather_id < 300 or 502 <= weather_id <= 531 or weather_id in (602, 622)
+            or weather_id in (771, 781))
+
+
+def is_wet(weather_id):
+    return weather_id < 700
+
+
+class AdaptiveScheduler():
+    """Picks the update interval from how fast the weather is changing.
+
+    Volatile conditions (severe weather, a temperature jump, rain starting
+    or stopping within the next 6 h) shorten the interval, stable readings
+    and night hours lengthen it. The interval is then stretched so the
+    projected API calls for the rest of the day fit the daily budget; the
+    call count is persisted so reboots do not reset it.
+    """
+    def __init__(self, budget=DAILY_CALL_BUDGET, path=SCHEDULE_FILE):
+        self.budget = budget
+        self.path = path
+        self.day = None  # Local (year, yday) the count belongs to
+        self.calls = 0
+        self.cycle_calls = 1  # API calls of the last update cycle
+        self.sent = router.keyed_calls()  # Only calls on the API key count against the budget
+        self.seen = {}  # Location index -> (weather_time, temperature) of its last reading
+        self.deltas = {}  # Location index -> temperature change between its last two readings
+        self.reason = "base"
+        self.load()
+
+    def load(self):
+        try:
+            import json
+            with open(self.path) as f:
+                data = json.load(f)
+            self.day = tuple(data['day'])
+            self.calls = data['calls']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        try:
+            import json
+            with open(self.path, 'w') as f:
+                f.write(json.dumps({'day': self.day, 'calls': self.calls}))
+        except OSError as e:
+            print(f"Could not save schedule: {e}")
+
+    def account(self, now):
+        """Add the requests made since the last call to today's count"""
+        t = utime.localtime(now)
+        day = (t[0], t[7])
+        if day != self.day:
+            self.day = day
+            self.calls = 0
+        sent = router.keyed_calls()
+        used = sent - self.sent
+        self.sent = sent
+        # 0 when the keyless providers answered, the budget does not slow them down
+        self.cycle_calls = used
+        if used:
+            self.calls += used
+            self.save()
+
+    def remaining(self):
+        return max(0, self.budget - self.calls)
+
+    def volatility(self, locations):
+        """-1 stable, 0 normal, 1 changing, with the reason in self.reason"""
+        level = -1
+        self.reason = "stable"
+        for i, location in enumerate(locations):
+            weather = location.weather
+            if weather is None:
+                continue
+            temp = int(weather['temp'] * 100)
+            seen = self.seen.get(i)
+            if seen is None or seen[0] != location.weather_time:
+                if seen is not None:
+                    self.deltas[i] = abs(temp - seen[1])
+                self.seen[i] = (location.weather_time, temp)
+            delta = self.deltas.get(i)
+            weather_id = weather['weather_id']
+            if is_severe(weather_id):
+                self.reason = "severe weather"
+                return 1
+            if delta is not None and delta >= TEMP_JUMP:
+                self.reason = "temperature jump"
+                level = 1
+                continue
+            spark = location.sparkline
+            if spark.count >= 2:
+                coming_wet = spark.pops[0] >= POP_TRANSITION or spark.pops[1] >= POP_TRANSITION
+                if coming_wet != is_wet(weather_id):
+                    self.reason = "forecast transition"
+                    level = 1
+                    continue
+            if delta is None or delta > TEMP_STABLE:
+                if level < 0:
+                    level = 0
+                    self.reason = "base"
+        return level
+
+    def next_interval(self, locations, now):
+        """Seconds until all locations should be updated again"""
+        level = self.volatility(locations)
+        if level > 0:
+            interval = MIN_INTERVAL
+        elif level < 0:
+            interval = BASE_INTERVAL * 3 // 2
+        else:
+            interval = BASE_INTERVAL
+        hour = utime.localtime(now)[3]
+        if level <= 0 and (hour >= NIGHT_START or hour < NIGHT_END):
+            interval *= 2
+            self.reason += ", night"
+        interval = min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+
+        # Spread the remaining budget over the rest of the day, every
+        # location has its own slot (and calls) within the interval
+        left = 86400 - now % 86400
+        remaining = self.remaining()
+        per_interval = self.cycle_calls * len(locations)
+        if remaining <= 0:
+            interval = max(interval, left + 60)
+            self.reason += ", budget used up"
+        elif left * per_interval // interval > remaining:
+            interval = left * per_interval // remaining
+            self.reason += ", budget"
+        print(f"Next update in {interval // 60} min ({self.reason}, {self.calls}/{self.budget} calls today)")
+        return interval
+
+    def forecast_interval(self, now):
+        hour = utime.localtime(now)[3]
+        if hour >= NIGHT_START or hour < NIGHT_END:
+            return FORECAST_INTERVAL * 2
+        return FORECAST_INTERVAL
@@ -0,0 +1,221 @@
+from array import array
+
+SAMPLE_PERIOD_MS = 2000  # Timer period between samples of every sensor
+RING_SIZE = 30  # Samples kept per channel (one minute at the default period)
+OVERSAMPLE_SHIFT = 4  # ADC reads averaged per sample, 2**N
+CALIBRATION_FILE = "sensor_cal.json"  # {"<board id>": {"<channel>": offset}}
+
+# RP2040 temperature sensor: T = 27 - (V - 0.706) / 0.001721 with V = raw * 3.3 / 65535.
+# In hundredths of a degree around a reference count, so the oversampled sum
+# times the slope stays a small int: T = PICO_TEMP_AT_REF - (raw - PICO_TEMP_REF) * slope
+PICO_TEMP_REF = 14021  # Raw count at 27 degrees
+PICO_TEMP_AT_REF = 2699
+PICO_TEMP_SLOPE = 11984  # 2.92588 centi-degrees per count, 12 fractional bits
+
+
+class PicoTemperature():
+    """RP2040 internal temperature sensor on ADC 4, oversampled.
+
+    Readings are hundredths of a degree Celsius. The ADC object is created
+    once and the sum of 2**shift reads stays a small int.
+    """
+    channels = ("pico_temp",)
+
+    def __init__(self, shift=OVERSAMPLE_SHIFT):
+        from machine import ADC
+        self.adc = ADC(4)
+        self.shift = shift
+
+    def read(self, out):
+        adc = self.adc
+        total = 0
+        for _ in range(1 << self.shift):
+            total += adc.read_u16()
+        delta = total - (PICO_TEMP_REF << self.shift)
+        out[0] = PICO_TEMP_AT_REF - ((delta * PICO_TEMP_SLOPE) >> (12 + self.shift))
+
+
+class BME280():
+    """Bosch BME280 over I2C using the datasheet's 32-bit integer compensation.
+
+    Channels are hundredths of a degree, Pa and hundredths of a percent.
+    The eight measurement registers are read in one burst into a
+    preallocated buffer; the sensor runs in normal mode with 16x
+    oversampling of temperature and pressure and its own IIR filter.
+    """
+    channels = ("temperature", "pressure", "humidity")
+
+    def __init__(self, i2c, address=0x76):
+        self.i2c = i2c
+        self.address = address
+        self.raw = bytearray(8)
+        if i2c.readfrom_mem(address, 0xD0, 1)[0] != 0x60:
+            raise OSError("BME280 not found")
+        c = i2c.readfrom_mem(address, 0x88, 26)
+        h = i2c.readfrom_mem(address, 0xE1, 7)
+
+        def u16(b, i):
+            return b[i] | (b[i + 1] << 8)
+
+        def s16(b, i):
+            v = u16(b, i)
+            return v - 65536 if v > 32767 else v
+
+        def s8(v):
+            return v - 256 if v > 127 else v
+
+        self.t1, self.t2, self.t3 = u16(c, 0), s16(c, 2), s16(c, 4)
+        self.p = [u16(c, 6)] + [s16(c, 8 + 2 * i) for i in range(8)]
+        self.h1 = c[25]
+        self.h2 = s16(h, 0)
+        self.h3 = h[2]
+        self.h4 = (s8(h[3]) << 4) | (h[4] & 0x0F)
+        self.h5 = (s8(h[5]) << 4) | (h[4] >> 4)
+        self.h6 = s8(h[6])
+        i2c.writeto_mem(address, 0xF2, b"\x01")  # Humidity x1
+        i2c.writeto_mem(address, 0xF5, b"\x90")  # 500 ms standby, IIR filter x16
+        i2c.writeto_mem(address, 0xF4, b"\xB7")  # Temperature x16, pressure x16, normal mode
+
+    def read(self, out):
+        b = self.raw
+        self.i2c.readfrom_mem_into(self.address, 0xF7, b)
+        adc_p = (b[0] << 12) | (b[1] << 4) | (b[2] >> 4)
+        adc_t = (b[3] << 12) | (b[4] << 4) | (b[5] >> 4)
+        adc_h = (b[6] << 8) | b[7]
+
+        var1 = (((adc_t >> 3) - (self.t1 << 1)) * self.t2) >> 11
+        var2 = (((((adc_t >> 4) - self.t1) * ((adc_t >> 4) - self.t1)) >> 12) * self.t3) >> 14
+        t_fine = var1 + var2
+        out[0] = (t_fine * 5 + 128) >> 8
+
+        p1, p2, p3, p4, p5, p6, p7, p8, p9 = self.p
+        var1 = (t_fine >> 1) - 64000
+        var2 = (((var1 >> 2) * (var1 >> 2)) >> 11) * p6
+        var2 = var2 + ((var1 * p5) << 1)
+        var2 = (var2 >> 2) + (p4 << 16)
+        var1 = (((p3 * (((var1 >> 2) * (var1 >> 2)) >> 13)) >> 3) + ((p2 * var1) >> 1)) >> 18
+        var1 = ((32768 + var1) * p1) >> 15
+        if var1 == 0:
+            out[1] = 0
+        else:
+            p = ((1048576 - adc_p) - (var2 >> 12)) * 3125
+            if p < 0x80000000:
+                p = (p << 1) // var1
+            else:
+                p = (p // var1) * 2
+            var1 = (p9 * (((p >> 3) * (p >> 3)) >> 13)) >> 12
+            var2 = ((p >> 2) * p8) >> 13
+            out[1] = p + ((var1 + var2 + p7) >> 4)
+
+        v = t_fine - 76800
+        v = (((((adc_h << 14) - (self.h4 << 20) - (self.h5 * v)) + 16384) >> 15) *
+             (((((((v * self.h6) >> 10) * (((v * self.h3) >> 11) + 32768)) >> 10) + 2097152) *
+               self.h2 + 8192) >> 14))
+        v = v - (((((v >> 15) * (v >> 15)) >> 7) * self.h1) >> 4)
+        v = min(max(v, 0), 419430400)
+        out[2] = ((v >> 12) * 100) >> 10  # Q22.10 %RH to hundredths
+
+
+def board_id():
+    try:
+        import machine
+        import ubinascii
+        return ubinascii.hexlify(machine.unique_id()).decode()
+    except Exception:
+        return "default"
+
+
+class SensorService():
+    """Samples every registered sensor on a timer into per-channel ring buffers.
+
+    Sensors provide `channels` and `read(out)`, writing one integer per
+    channel into a preallocated array. Per-board calibration offsets from
+    CALIBRATION_FILE are added to the raw readings.
+    """
+    def __init__(self, period_ms=SAMPLE_PERIOD_MS, size=RING_SIZE):
+        self.period_ms = period_ms
+        self.size = size
+        self.sensors = []  # (sensor, out array, first channel index)
+        self.names = []
+        self.rings = []  # array('i') per channel
+        self.offsets = []
+        self.head = 0
+        self.count = 0
+        self.errors = 0
+        self.timer = None
+        self.calibration = self.load_calibration()
+        self._sample = self.sample  # Bound once, the timer callback must not allocate it
+
+    def load_calibration(self, path=CALIBRATION_FILE):
+        try:
+            import json
+            with open(path) as f:
+                return json.load(f).get(board_id(), {})
+        except (OSError, ValueError):
+            return {}
+
+    def add(self, sensor):
+        first = len(self.names)
+        for name in sensor.channels:
+            self.names.append(name)
+            self.rings.append(array('i', bytes(4 * self.size)))
+            self.offsets.append(self.calibration.get(name, 0))
+        self.sensors.append((sensor, array('i', bytes(4 * len(sensor.channels))), first))
+        return sensor
+
+    def sample(self, _timer=None):
+        head = self.head
+        for sensor, out, first in self.sensors:
+            try:
+                sensor.read(out)
+            except OSError:
+                self.errors += 1
+                continue
+            for i in range(len(out)):
+                self.rings[first + i][head] = out[i] + self.offsets[first + i]
+        self.head = (head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def start(self):
+        """Sample every period_ms from a machine.Timer (soft callback on the RP2040)"""
+        from machine import Timer
+        self.sample()
+        self.timer = Timer(period=self.period_ms, mode=Timer.PERIODIC, callback=self._sample)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.deinit()
+            self.timer = None
+
+    def latest(self, name):
+        """Most recent value of a channel, None before the first sample"""
+        if not self.count or name not in self.names:
+            return None
+        return self.rings[self.names.index(name)][(self.head - 1) % self.size]
+
+    def average(self, name, n=None):
+        """Mean of the last n samples (all by default), rounded to an integer"""
+        if not self.count or name not in self.names:
+            return None
+        ring = self.rings[self.names.index(name)]
+        n = min(n or self.count, self.count)
+        total = 0
+        i = self.head
+        for _ in range(n):
+            i = (i - 1) % self.size
+            total += ring[i]
+        return (total + n // 2) // n
+
+
+sensor_service = SensorService()
+
+
+def pico_temperature():
+    """RP2040 temperature in degrees, averaged over the ring when sampling runs"""
+    value = sensor_service.average("pico_temp")
+    if value is None:
+        out = array('i', [0])
+        PicoTemperature().read(out)
+        value = out[0] + sensor_service.calibration.get("pico_temp", 0)
+    return value / 100
@@ -0,0 +1,85 @@
+import framebuf
+from array import array
+
+SPARK_SAMPLES = 16  # 3-hour forecast steps, 48 h
+SPARK_WIDTH = 240
+SPARK_HEIGHT = 14
+
+
+class Sparkline():
+    """Temperature line over precipitation probability bars, in integer fixed point.
+
+    Samples are added while the forecast is parsed, rendering draws vline
+    spans into a preallocated strip framebuffer that is then blitted.
+    """
+    def __init__(self, width=SPARK_WIDTH, height=SPARK_HEIGHT, samples=SPARK_SAMPLES):
+        self.width = width
+        self.height = height
+        self.samples = samples
+        self.temps = array('h', bytes(2 * samples))  # Tenths of a degree
+        self.pops = bytearray(samples)  # Precipitation probability, percent
+        self.count = 0
+        self.strip = bytearray(width * ((height + 7) // 8))
+        self.fb = framebuf.FrameBuffer(self.strip, width, height, framebuf.MONO_VLSB)
+
+    def reset(self):
+        self.count = 0
+
+    @property
+    def full(self):
+        return self.count >= self.samples
+
+    def add(self, temp_tenths, pop_percent):
+        if self.count < self.samples:
+            self.temps[self.count] = temp_tenths
+            self.pops[self.count] = pop_percent
+            self.count += 1
+
+    def render(self):
+        """Draw the chart into the strip buffer, returns False without enough samples"""
+        fb = self.fb
+        fb.fill(0xff)
+        n = self.count
+        if n < 2:
+            return False
+        w = self.width
+        h = self.height
+        temps = self.temps
+        pops = self.pops
+
+        lo = hi = temps[0]
+        for i in range(1, n):
+            t = temps[i]
+            if t < lo:
+                lo = t
+            elif t > hi:
+                hi = t
+        span = (hi - lo) or 1
+
+        prev_y = -1
+        for x in range(w):
+            # Position between samples in 8.8 fixed point
+            pos = (x << 8) * (n - 1) // (w - 1)
+            i = pos >> 8
+            frac = pos & 0xFF
+            if i >= n - 1:
+                i = n - 2
+                frac = 256
+
+            # Precipitation probability as hatched bars (every other column)
+            if not x & 1:
+                bar = pops[i if frac < 128 else i + 1] * h // 100
+                if bar:
+                    fb.vline(x, h - bar, bar, 0x00)
+
+            # Temperature, linearly interpolated and scaled to the strip height
+            t = temps[i] * (256 - frac) + temps[i + 1] * frac - (lo << 8)
+            y = (h - 1) - t * (h - 1) // (span << 8)
+            if prev_y < 0:
+                prev_y = y
+            if y < prev_y:
+                fb.vline(x, y, prev_y - y + 1, 0x00)
+            else:
+                fb.vline(x, prev_y, y - prev_y + 1, 0x00)
+            prev_y = y
+        return True
@@ -0,0 +1,91 @@
+import utime
+
+# Integer to ASCII formatting into preallocated bytearrays. The render path
+# builds its lines with these instead of f-strings and slices, so drawing a
+# frame from already parsed data does not allocate.
+
+# One-character strings for FrameBuffer.text, which draws non-ASCII bytes as glyph 127
+CHARS = tuple(chr(i if i < 128 else 127) for i in range(256))
+DEGREE = 0xB0  # Latin-1 degree sign, in the large font
+EPOCH_DAYS = 10957 if utime.gmtime(0)[0] == 2000 else 0  # Days from 1970 to the utime epoch
+
+
+def put_bytes(buf, pos, src, limit=255):
+    """Copy up to `limit` bytes of src, returns the new end"""
+    n = len(src)
+    if n > limit:
+        n = limit
+    for i in range(n):
+        buf[pos + i] = src[i]
+    return pos + n
+
+
+def put_fit(buf, pos, src, max_chars):
+    """Copy src, shortened with a trailing '.' when longer than max_chars (like fonts.fit_text)"""
+    if len(src) <= max_chars:
+        return put_bytes(buf, pos, src)
+    pos = put_bytes(buf, pos, src, max(0, max_chars - 1))
+    buf[pos] = 0x2E
+    return pos + 1
+
+
+def put_int(buf, pos, value, digits=1):
+    """Decimal value, zero padded to at least `digits` digits"""
+    if value < 0:
+        buf[pos] = 0x2D
+        pos += 1
+        value = -value
+    n = 1
+    v = value
+    while v >= 10:
+        v //= 10
+        n += 1
+    if n < digits:
+        n = digits
+    end = pos + n
+    for i in range(end - 1, pos - 1, -1):
+        buf[i] = 0x30 + value % 10
+        value //= 10
+    return end
+
+
+def put_tenths(buf, pos, tenths):
+    """A value in tenths as '-1.5'"""
+    if tenths < 0:
+        buf[pos] = 0x2D
+        pos += 1
+        tenths = -tenths
+    pos = put_int(buf, pos, tenths // 10)
+    buf[pos] = 0x2E
+    return put_int(buf, pos + 1, tenths % 10)
+
+
+def put_time(buf, pos, t):
+    """HH:MM of a utime.time() value"""
+    secs = t % 86400
+    pos = put_int(buf, pos, secs // 3600, 2)
+    buf[pos] = 0x3A
+    return put_int(buf, pos + 1, secs % 3600 // 60, 2)
+
+
+def put_date(buf, pos, t):
+    """DD/MM of a utime.time() value, from the day count without a localtime() tuple"""
+    # Civil date from days since 1970-03-01 eras (H. Hinnant's algorithm)
+    z = t // 86400 + EPOCH_DAYS + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = mp + 3 if mp < 10 else mp - 9
+    pos = put_int(buf, pos, day, 2)
+    buf[pos] = 0x2F
+    return put_int(buf, pos + 1, month, 2)
+
+
+def draw(fb, buf, n, x, y, color=0x00):
+    """Draw the first n bytes with the 8x8 FrameBuffer font"""
+    for i in range(n):
+        fb.text(CHARS[buf[i]], x + (i << 3), y, color)
+    return x + (n << 3)
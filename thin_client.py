@@ -0,0 +1,57 @@
+import utime
+import frame_delta
+from http_client import Connection, HTTP_TIMEOUT
+from metrics import metrics
+
+COMPANION_PORT = 8080
+UNRESERVED = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~"
+
+
+def _quote(text):
+    """Percent-encode `text` for a query value, MicroPython has no urllib"""
+    out = []
+    for b in text.encode():
+        out.append(chr(b) if b in UNRESERVED else f"%{b:02X}")
+    return "".join(out)
+
+
+class ThinClient():
+    """Shows pages rendered by tools/companion_server.py.
+
+    The companion renders the page with the station's layout code and
+    answers with the byte ranges that changed since the frame this
+    station acknowledged, the id it sends with each request. Fonts,
+    icons and JSON are not used on the device in this mode.
+    """
+    def __init__(self, host, lat, lon, name=None, port=COMPANION_PORT):
+        self.host = host
+        self.port = port
+        self.path = f"frame?lat={lat}&lon={lon}"
+        if name:
+            self.path += "&name=" + _quote(name)
+        self.ack = 0  # Id of the frame in the back buffer, 0 when unknown
+
+    def fetch(self, epd, timeout=HTTP_TIMEOUT):
+        """Apply the companion's delta to the back buffer, returns True on success.
+
+        On a failure the back buffer is restored from the front buffer,
+        which holds the acknowledged frame and the ETA counter.
+        """
+        conn = Connection(self.host, self.port, False, timeout)
+        start = utime.ticks_ms()
+        try:
+            conn.open()
+            conn.send(f"{self.path}&ack={self.ack}")
+            body = conn.response()
+            frame = frame_delta.apply(body, epd, epd.buffer, self.ack)
+            body.drain()
+            self.ack = frame
+            metrics.fetch_done(start, True)
+            return True
+        except Exception as e:
+            print(f"Frame fetch failed: {e}")
+            metrics.fetch_done(start, False)
+            epd.buffer[:] = epd.front
+            return False
+        finally:
+            conn.close()
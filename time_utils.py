@@ -1,37 +1,256 @@
-import ntptime
 import utime
+import json
 from machine import RTC
 
+# NTP servers raced against each other, the first valid reply wins
+NTP_SERVERS = ("pool.ntp.org", "time.google.com", "time.cloudflare.com")
+NTP_TIMEOUT_MS = 2000
+NTP_PORT = 123
+# Seconds between the NTP epoch (1900) and the MicroPython epoch (1970 or 2000)
+NTP_DELTA = 3155673600 if utime.gmtime(0)[0] == 2000 else 2208988800
+
+TIME_SYNC_FILE = "time_sync.json"
+SYNC_HISTORY = 8  # Number of syncs kept in flash for the drift estimate
+MAX_TIME_ERROR = 2  # Skip NTP while the predicted RTC error stays under this (seconds)
+MAX_SYNC_AGE = 7 * 86400  # Never trust the RTC longer than this without NTP
+MIN_VALID_YEAR = 2024  # An RTC before this year has not been set since power up
+
+# Greece is GMT+2 in winter and GMT+3 during DST
+TIMEZONE_OFFSET = 3600 * 2
+DST_RULE = "EU"
+
+# DST transition rules: (start, end), each (month, week, weekday, hour, hour_is_utc)
+# week is 1..4 for the nth weekday of the month or -1 for the last one,
+# weekday uses utime numbering (0 = Monday, 6 = Sunday)
+DST_RULES = {
+    "EU": ((3, -1, 6, 1, True), (10, -1, 6, 1, True)),
+    "US": ((3, 2, 6, 2, False), (11, 1, 6, 2, False)),
+    "AU": ((10, 1, 6, 2, False), (4, 1, 6, 3, False)),
+    "NONE": None,
+}
+
+
+def _nth_weekday(year, month, week, weekday):
+    """Return the day of month of the nth (or last, week=-1) weekday"""
+    if week > 0:
+        first = utime.gmtime(utime.mktime((year, month, 1, 0, 0, 0, 0, 0)))[6]
+        return 1 + (weekday - first) % 7 + (week - 1) * 7
+    # Walk back from the first day of the next month
+    if month == 12:
+        nxt = utime.mktime((year + 1, 1, 1, 0, 0, 0, 0, 0))
+    else:
+        nxt = utime.mktime((year, month + 1, 1, 0, 0, 0, 0, 0))
+    last = utime.gmtime(nxt - 86400)
+    return last[2] - (last[6] - weekday) % 7
+
+
+def _transition_utc(year, rule, std_offset, dst):
+    """UTC timestamp of a DST transition rule in the given year"""
+    month, week, weekday, hour, is_utc = rule
+    day = _nth_weekday(year, month, week, weekday)
+    ts = utime.mktime((year, month, day, hour, 0, 0, 0, 0))
+    if not is_utc:
+        # Rule hours are given in local standard time (or DST time while it is active)
+        ts -= std_offset + (3600 if dst else 0)
+    return ts
+
+
+def local_offset(utc, std_offset=TIMEZONE_OFFSET, dst_rule=DST_RULE):
+    """Return the local UTC offset in seconds for a UTC timestamp"""
+    rule = DST_RULES.get(dst_rule)
+    if rule is None:
+        return std_offset
+    year = utime.gmtime(utc)[0]
+    start = _transition_utc(year, rule[0], std_offset, False)
+    end = _transition_utc(year, rule[1], std_offset, True)
+    if start < end:
+        in_dst = start <= utc < end
+    else:
+        # Southern hemisphere, DST spans the new year
+        in_dst = utc >= start or utc < end
+    return std_offset + (3600 if in_dst else 0)
+
+
+class TimeService():
+    def __init__(self, servers=NTP_SERVERS, std_offset=TIMEZONE_OFFSET, dst_rule=DST_RULE,
+                 max_error=MAX_TIME_ERROR, sync_file=TIME_SYNC_FILE):
+        self.servers = servers
+        self.std_offset = std_offset
+        self.dst_rule = dst_rule
+        self.max_error = max_error
+        self.sync_file = sync_file
+        self.rtc = RTC()
+        self.offset = std_offset  # Offset currently applied to the RTC
+        self.syncs = []  # [utc, rtc_error_s or None, rtt_ms]
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.sync_file, 'r') as f:
+                data = json.loads(f.read())
+            self.offset = data.get('offset', self.std_offset)
+            self.syncs = data.get('syncs', [])
+        except (OSError, ValueError):
+            self.syncs = []
+
+    def save(self):
+        try:
+            with open(self.sync_file, 'w') as f:
+                f.write(json.dumps({'offset': self.offset, 'syncs': self.syncs[-SYNC_HISTORY:]}))
+        except OSError as e:
+            print(f"Error saving time sync history: {e}")
+
+    @property
+    def rtc_valid(self):
+        return utime.localtime()[0] >= MIN_VALID_YEAR
+
+    def utc_now(self):
+        """Current UTC time derived from the RTC (which holds local time)"""
+        return utime.time() - self.offset
+
+    def drift_ppm(self):
+        """Estimated RTC drift in ppm (positive = RTC runs fast), None if unknown"""
+        error = 0
+        elapsed = 0
+        for prev, cur in zip(self.syncs, self.syncs[1:]):
+            if cur[1] is None:
+                continue
+            error += cur[1]
+            elapsed += cur[0] - prev[0]
+        if elapsed <= 0:
+            return None
+        return error * 1000000 / elapsed
+
+    def predicted_error(self):
+        """Predicted RTC error in seconds since the last sync, None if unknown"""
+        drift = self.drift_ppm()
+        if drift is None or not self.syncs or not self.rtc_valid:
+            return None
+        last = self.syncs[-1]
+        elapsed = self.utc_now() - last[0]
+        if elapsed < 0 or elapsed > MAX_SYNC_AGE:
+            return None
+        # 1 s for the RTC resolution plus half the round trip of the last sync
+        return abs(drift) * elapsed / 1000000 + 1 + last[2] / 2000
+
+    def needs_sync(self):
+        error = self.predicted_error()
+        return error is None or error > self.max_error
+
+    def query(self, timeout_ms=NTP_TIMEOUT_MS):
+        """Race all NTP servers and return (utc, rtt_ms) of the first valid reply"""
+        import socket
+        import select
+        import struct
+        from tracing import tracer, NTP
+
+        t = tracer.begin()
+        poller = select.poll()
+        socks = []
+        sent = {}
+        for i, host in enumerate(self.servers):
+            try:
+                addr = socket.getaddrinfo(host, NTP_PORT)[0][-1]
+                s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                s.setblocking(False)
+                query = bytearray(48)
+                query[0] = 0x1B  # LI=0, VN=3, Mode=3 (client)
+                # Tag the transmit timestamp so the reply can be matched to this query
+                struct.pack_into("!II", query, 40, i + 1, utime.ticks_ms() & 0xFFFFFFFF)
+                s.sendto(query, addr)
+                sent[id(s)] = (host, bytes(query[40:48]), utime.ticks_ms())
+                poller.register(s, select.POLLIN)
+                socks.append(s)
+            except OSError as e:
+                print(f"NTP query to {host} failed: {e}")
+
+        result = None
+        start = utime.ticks_ms()
+        try:
+            while socks and result is None:
+                remaining = timeout_ms - utime.ticks_diff(utime.ticks_ms(), start)
+                if remaining <= 0:
+                    break
+                # MicroPython's poll() tuples may carry more than two fields
+                for entry in poller.poll(remaining):
+                    s = entry[0]
+                    try:
+                        msg = s.recv(48)
+                    except OSError:
+                        continue
+                    host, tag, t_sent = sent[id(s)]
+                    rtt = utime.ticks_diff(utime.ticks_ms(), t_sent)
+                    # Reply must be a server packet (mode 4) from a synchronized
+                    # stratum and echo our transmit timestamp as its origin
+                    if len(msg) < 48 or msg[0] & 0x07 != 4 or not 0 < msg[1] < 16 or msg[24:32] != tag:
+                        continue
+                    secs, frac = struct.unpack("!II", msg[40:48])
+                    if secs == 0:
+                        continue
+                    utc = secs - NTP_DELTA + ((frac * 1000 >> 32) + rtt // 2 + 500) // 1000
+                    print(f"NTP reply from {host} in {rtt} ms")
+                    result = (utc, rtt)
+                    break
+        finally:
+            for s in socks:
+                s.close()
+        tracer.end(NTP, t)
+        return result
+
+    def set_rtc(self, utc):
+        """Set the RTC to local time for the given UTC timestamp"""
+        self.offset = local_offset(utc, self.std_offset, self.dst_rule)
+        t = utime.gmtime(utc + self.offset)
+        # (year, month, day, weekday, hour, minute, second, subseconds)
+        self.rtc.datetime((t[0], t[1], t[2], t[6], t[3], t[4], t[5], 0))
+
+    def sync(self, retries=2):
+        """Synchronize the RTC from NTP and record the sync in flash"""
+        print("Synchronizing time with NTP servers...")
+        for attempt in range(retries + 1):
+            reply = self.query()
+            if reply:
+                break
+            print(f"NTP attempt {attempt + 1} failed")
+        else:
+            return False
+
+        utc, rtt = reply
+        error = self.utc_now() - utc if self.rtc_valid else None
+        self.set_rtc(utc)
+        self.syncs.append([utc, error, rtt])
+        self.syncs = self.syncs[-SYNC_HISTORY:]
+        self.save()
+
+        drift = self.drift_ppm()
+        if drift is not None:
+            print(f"RTC error {error} s, drift estimate {drift:.1f} ppm")
+        t = utime.localtime()
+        print(f"Time synchronized: {t[2]:02d}/{t[1]:02d}/{t[0]} {t[3]:02d}:{t[4]:02d}:{t[5]:02d}")
+        return True
+
+    def refresh_offset(self):
+        """Re-apply the local offset when a DST transition has passed"""
+        if not self.rtc_valid:
+            return False
+        utc = self.utc_now()
+        offset = local_offset(utc, self.std_offset, self.dst_rule)
+        if offset == self.offset:
+            return False
+        print(f"Local offset changed from {self.offset} to {offset}")
+        self.set_rtc(utc)
+        self.save()
+        return True
+
+    def ensure_synced(self):
+        """Sync from NTP only when the predicted RTC error exceeds the bound"""
+        if not self.needs_sync():
+            print(f"Skipping NTP, predicted RTC error {self.predicted_error():.2f} s")
+            self.refresh_offset()
+            return True
+        return self.sync()
+
+
 def sync_time():
     """Synchronize the Pico's time with an NTP server with fallback"""
-    # Set timezone offset in seconds (Greece is GMT+2 or GMT+3 during DST)
-    timezone_offset = 3600 * 3  # GMT+3 for summer time
-    
-    # Try to synchronize with an NTP server
-    print("Synchronizing time with NTP server...")
-    ntptime.settime()  # This sets to UTC
-    
-    # Get current time (UTC)
-    utc_time = utime.time()
-    
-    # Apply timezone offset
-    local_time = utc_time + timezone_offset
-    
-    # Convert to tuple
-    local_tuple = utime.gmtime(local_time)
-    
-    # Get the RTC instance
-    rtc = RTC()
-    
-    # Set the RTC time (year, month, day, weekday, hour, minute, second, microsecond)
-    # Note: we use 0 for weekday as it's not important and 0 for microseconds
-    rtc.datetime((local_tuple[0], local_tuple[1], local_tuple[2], 0,
-                  local_tuple[3], local_tuple[4], local_tuple[5], 0))
-    
-    # Get the updated time
-    t = utime.localtime()
-    time_str = f"{t[3]:02d}:{t[4]:02d}:{t[5]:02d}"
-    date_str = f"{t[2]:02d}/{t[1]:02d}/{t[0]}"
-    
-    print(f"Time synchronized: {date_str} {time_str}")
-    return True
\ No newline at end of file
+    return TimeService().sync()
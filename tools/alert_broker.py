@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Local stand-in for the alert broker the stations subscribe to (alerts.py).
+
+    python tools/alert_broker.py [--port 5005]
+
+Stations with ALERT_BROKER set in main.py send "SUB" from their alert
+port. The broker pushes to every subscriber whose lease has not run out,
+and answers a subscription with the retained alert (or clear). Commands
+on stdin:
+    alert <text>    show <text> in the stations' alert banner
+    clear           remove the banner
+    refresh         make the stations fetch now
+    list            print the subscribers
+The Broker class does the same from Python for checks.
+"""
+import argparse
+import socket
+import sys
+import threading
+import time
+
+ALERT_PORT = 5005
+LEASE = 3600  # Must match alerts.LEASE
+
+
+class Broker():
+    def __init__(self, host="", port=ALERT_PORT):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.port = self.sock.getsockname()[1]
+        self.subscribers = {}  # Station IP -> ((ip, port), lease end)
+        # Sequence numbers continue across restarts, stations skip a
+        # message whose number they already applied
+        self.seq = int(time.time())
+        self.retained = None  # Last ALERT or CLEAR datagram
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(128)
+            except OSError:
+                return  # Closed
+            if data.strip() != b"SUB":
+                continue
+            with self.lock:
+                self.subscribers[addr[0]] = (addr, time.time() + LEASE)
+                retained = self.retained
+            if retained is not None:
+                self.sock.sendto(retained, addr)
+
+    def _push(self, data, retain=False):
+        now = time.time()
+        with self.lock:
+            if retain:
+                self.retained = data
+            self.subscribers = {ip: s for ip, s in self.subscribers.items() if s[1] > now}
+            targets = [addr for addr, _ in self.subscribers.values()]
+        for addr in targets:
+            self.sock.sendto(data, addr)
+        return len(targets)
+
+    def alert(self, text):
+        self.seq += 1
+        return self._push(f"ALERT {self.seq} {text}".encode(), retain=True)
+
+    def clear(self):
+        self.seq += 1
+        return self._push(f"CLEAR {self.seq}".encode(), retain=True)
+
+    def refresh(self):
+        return self._push(b"REFRESH")
+
+    def close(self):
+        self.sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="", help="address to listen on")
+    parser.add_argument("--port", type=int, default=ALERT_PORT, help="UDP port")
+    args = parser.parse_args(argv)
+
+    broker = Broker(args.host, args.port)
+    print(f"Alert broker on UDP port {broker.port}")
+    for line in sys.stdin:
+        command, _, text = line.strip().partition(" ")
+        if command == "alert" and text:
+            print(f"sent to {broker.alert(text)} stations")
+        elif command == "clear":
+            print(f"sent to {broker.clear()} stations")
+        elif command == "refresh":
+            print(f"sent to {broker.refresh()} stations")
+        elif command == "list":
+            for ip, (addr, end) in sorted(broker.subscribers.items()):
+                print(f"{addr[0]}:{addr[1]} lease {int(end - time.time())} s")
+        elif command:
+            print("commands: alert <text>, clear, refresh, list")
+    broker.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
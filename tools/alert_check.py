@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Push alerts from alert_broker.py to the station's AlertListener on localhost.
+
+    python tools/alert_check.py
+
+A rendered fixture page is on the panel. The station subscribes to a
+broker on a free port, the broker pushes an alert and the banner must
+reach the panel as one partial update confined to the banner bands. A
+re-subscription gets the retained alert without repainting, a new page
+under the banner gets it painted again, a clear restores the page bytes
+exactly, a REFRESH sets the flag and a datagram from another address is
+ignored. Exits with status 1 on any failure.
+"""
+import os
+import socket
+import sys
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "host"), os.path.dirname(TOOLS_DIR), TOOLS_DIR]
+
+import alert_broker  # noqa: E402
+import alerts  # noqa: E402
+import render_check  # noqa: E402
+import weather_forecast  # noqa: E402
+from render_txn import Transaction, PARTIAL  # noqa: E402
+
+TEXT = "Severe thunderstorm warning until 18:00"
+WAIT = 2  # Seconds to wait for a datagram on localhost
+
+
+class PanelEPD(render_check.HostEPD):
+    """HostEPD recording the refreshes it is asked for"""
+    def __init__(self):
+        super().__init__()
+        self.refreshes = []
+
+    def present(self, partial=False):
+        self.refreshes.append(("full", None))
+        super().present(partial)
+
+    def update_region(self, x, y, w, h):
+        self.refreshes.append(("region", (x, y, w, h)))
+        self.front[:] = self.buffer
+
+
+def check(label, ok, detail=""):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}{': ' + detail if detail else ''}")
+    return ok
+
+
+def wait_for(listener, epd, received):
+    """Poll like the station's idle loop until a datagram arrived, returns the banner change"""
+    changed = False
+    end = time.time() + WAIT
+    while listener.received < received and time.time() < end:
+        changed |= listener.poll(epd)
+        time.sleep(0.01)
+    return changed
+
+
+def commit(epd):
+    epd.refreshes = []
+    kind = Transaction(epd, "alert").commit()
+    return kind, epd.refreshes
+
+
+def main():
+    weather_forecast.profiler = render_check._NoProfiler()
+    fixture = render_check.load_fixture(os.path.join(render_check.FIXTURES_DIR, "clear_sky.json"))
+    epd = PanelEPD()
+    weather = render_check.setup(fixture, epd)
+    render_check.render(weather)
+    epd.present()
+    page = bytes(epd.front)
+
+    broker = alert_broker.Broker("127.0.0.1", 0)
+    listener = alerts.AlertListener("127.0.0.1", epd, port=0, broker_port=broker.port)
+    banner = listener.banner
+    j0, j1 = banner.j0, banner.j1
+    start, end = j0 * epd.height, (j1 + 1) * epd.height
+    ok = True
+    try:
+        listener.subscribe()
+        deadline = time.time() + WAIT
+        while not broker.subscribers and time.time() < deadline:
+            time.sleep(0.01)
+        ok &= check("subscribed", len(broker.subscribers) == 1)
+
+        ok &= check("alert pushed", broker.alert(TEXT) == 1)
+        changed = wait_for(listener, epd, 1)
+        kind, refreshes = commit(epd)
+        ok &= check("banner shown", changed and banner.text == TEXT)
+        ok &= check("one partial update", kind == PARTIAL and len(refreshes) == 1 and refreshes[0][0] == "region",
+                    str(refreshes))
+        if refreshes and refreshes[0][1]:
+            x, y, w, h = refreshes[0][1]
+            ok &= check("update confined to the banner", y >= j0 * 8 and y + h <= (j1 + 1) * 8, f"rows {y}-{y + h - 1}")
+        ok &= check("page outside the banner untouched",
+                    epd.front[:start] == page[:start] and epd.front[end:] == page[end:])
+
+        listener.subscribe()
+        changed = wait_for(listener, epd, 2)
+        ok &= check("retained alert on resubscribe", listener.received == 2 and not changed)
+        ok &= check("no refresh for the retained alert", commit(epd)[0] is None)
+
+        render_check.render(weather)
+        banner.overlay(epd)
+        ok &= check("banner painted over a new page", epd.buffer[start:end] == banner.bar)
+        ok &= check("no refresh for the same frame", commit(epd)[0] is None)
+
+        broker.clear()
+        changed = wait_for(listener, epd, 3)
+        kind, refreshes = commit(epd)
+        ok &= check("clear restores the page", changed and banner.text is None and bytes(epd.front) == page)
+        ok &= check("clear is a partial update", kind == PARTIAL and len(refreshes) == 1)
+
+        broker.refresh()
+        wait_for(listener, epd, 4)
+        ok &= check("refresh requested", listener.refresh)
+
+        spoof = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        spoof.bind(("127.0.0.2", 0))
+        spoof.sendto(b"ALERT 1 spoofed", ("127.0.0.1", listener.sock.getsockname()[1]))
+        spoof.close()
+        time.sleep(0.1)
+        changed = listener.poll(epd)
+        ok &= check("foreign sender ignored", not changed and banner.text is None and listener.received == 4)
+    finally:
+        listener.close()
+        broker.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Serve the render_check fixtures through companion_server.py and render the records.
+
+    python tools/companion_check.py
+
+For every fixture a companion is started on free ports with the fixture
+as its upstream. Two stations fetch the location over HTTP on one
+keep-alive connection and a third one over UDP. The check passes if the
+upstream was called once and the record path renders the golden image
+pixel for pixel. In thin client mode a station fetches the page as
+frame deltas: the first one builds the frame on a white buffer, a repeat
+changes nothing, a minute later only the clock digits change and an
+unknown id gets a whole frame again. Location names reach the companion
+unchanged however they are spelled. Exits with status 1 on any failure.
+"""
+import http.client
+import os
+import socket
+import sys
+import urllib.parse
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "host"), os.path.dirname(TOOLS_DIR), TOOLS_DIR]
+
+import companion_server  # noqa: E402
+import frame_delta  # noqa: E402
+import render_check  # noqa: E402
+import thin_client  # noqa: E402
+import utime  # noqa: E402
+import weather_forecast  # noqa: E402
+import weather_record  # noqa: E402
+
+LAT, LON = "40.64", "22.94"
+
+
+def check(label, ok, detail=""):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}{': ' + detail if detail else ''}")
+    return ok
+
+
+def run(name):
+    path = os.path.join(render_check.FIXTURES_DIR, name + ".json")
+    fixture = render_check.load_fixture(path)
+    utime.set_time(fixture["now"])
+    companion = companion_server.Companion(companion_server.FixtureUpstream(path))
+    servers = companion_server.serve(companion, "127.0.0.1", 0)
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", servers[0].server_address[1], timeout=5)
+        records = []
+        for _ in range(2):
+            conn.request("GET", f"/record?lat={LAT}&lon={LON}")
+            response = conn.getresponse()
+            records.append(response.read() if response.status == 200 else None)
+        conn.close()
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp.settimeout(5)
+        udp.sendto(f"{LAT},{LON}".encode(), servers[1].server_address)
+        records.append(udp.recvfrom(1024)[0])
+        udp.close()
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    ok = check(f"{name}: served", all(r is not None and len(r) == weather_record.RECORD_SIZE for r in records),
+               f"{weather_record.RECORD_SIZE} B records")
+    ok &= check(f"{name}: one upstream fetch", companion.upstream_calls == 1, f"{companion.upstream_calls} calls")
+    if not ok:
+        return False
+
+    epd = render_check.HostEPD()
+    weather = weather_forecast.Weather("", LAT, LON, epd, fixture.get("name"))
+    weather_record.apply(weather, records[-1])
+    if fixture.get("day_range"):
+        weather.day_range = tuple(fixture["day_range"])
+    render_check.render(weather)
+    diff = render_check.diff_count(render_check.read_pbm(os.path.join(render_check.GOLDEN_DIR, name + ".pbm")),
+                                   render_check.visible_pixels(epd.buffer))
+    ok = check(f"{name}: renders like the golden", diff == 0, f"{diff} px differ" if diff else "")
+    return ok & run_thin(name, path, fixture)
+
+
+def run_thin(name, path, fixture):
+    clock = [fixture["now"]]
+    companion = companion_server.Companion(companion_server.FixtureUpstream(path), clock=lambda: clock[0])
+    servers = companion_server.serve(companion, "127.0.0.1", 0)
+    epd = render_check.HostEPD()
+    epd.fill(0x00)  # Whatever the station showed before
+    ack = 0
+    deltas = []
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", servers[0].server_address[1], timeout=5)
+        for step, ack_sent in (("first", None), ("repeat", None), ("next minute", None), ("unknown id", 12345)):
+            if step == "next minute":
+                clock[0] += 60
+            conn.request("GET", f"/frame?lat={LAT}&lon={LON}&name=Home%20Town&ack={ack if ack_sent is None else ack_sent}")
+            response = conn.getresponse()
+            if response.status != 200:
+                return check(f"{name}: frame {step}", False, f"HTTP {response.status}")
+            size = int(response.getheader("Content-Length"))
+            ack = frame_delta.apply(response, epd, epd.buffer, ack if ack_sent is None else ack_sent)
+            deltas.append((step, size, epd.buffer == companion.frames.get(ack)))
+        conn.close()
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+    ok = True
+    for step, size, same in deltas:
+        ok &= check(f"{name}: thin {step}", same, f"{size} B delta")
+    sizes = [size for _, size, _ in deltas]
+    ok &= check(f"{name}: deltas shrink", sizes[1] == frame_delta.HEADER_SIZE and sizes[2] < sizes[0] // 4
+                and sizes[3] > sizes[0] // 2, str(sizes))
+    return ok
+
+
+def check_names():
+    ok = True
+    for name in ("Home Town", "Rock & Roll", "a=b+c#1?", "50% Off", "Zürich/Ölüdeniz"):
+        client = thin_client.ThinClient("127.0.0.1", LAT, LON, name)
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit("/" + client.path).query)
+        ok &= check(f"name {name!r} sent", query.get("name") == [name], str(query.get("name")))
+    return ok
+
+
+def main():
+    weather_forecast.profiler = render_check._NoProfiler()
+    names = sorted(os.path.splitext(n)[0] for n in os.listdir(render_check.FIXTURES_DIR) if n.endswith(".json"))
+    ok = check_names()
+    for name in names:
+        ok &= run(name)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
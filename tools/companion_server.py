@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""LAN companion service: fetch each location once, serve every station.
+
+    python tools/companion_server.py --key OWM_API_KEY                 # HTTP and UDP on port 8080
+    python tools/companion_server.py --fixture tools/fixtures/clear_sky.json   # offline, canned data
+
+Stations with COMPANION_HOST set in main.py request
+GET /record?lat=..&lon=.. and get a fixed layout weather_record. A
+location is fetched from OpenWeatherMap at most once per --interval,
+however many stations ask for it. The responses are parsed by the same
+Weather code the device runs (through the tools/host stand-ins), so a
+record renders exactly like a direct fetch. The UDP port answers a
+datagram "lat,lon" with the same record. GET /status lists the cached
+locations and the upstream call count. When an upstream fetch fails, the
+last record is served until it is --max-age seconds old.
+
+Thin client stations (THIN_CLIENT in main.py) request
+GET /frame?lat=..&lon=..&name=..&ack=<frame id>. The page is rendered
+here with the station's layout code at this machine's local time, and
+the answer is a frame_delta against the acknowledged frame. An unknown
+id gets a delta against a white frame. Today's low/high comes from the
+readings fetched since local midnight.
+"""
+import argparse
+import io
+import json
+import os
+import socketserver
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "host"), os.path.dirname(TOOLS_DIR)]
+
+import frame_delta  # noqa: E402
+import utime  # noqa: E402
+import weather_forecast  # noqa: E402
+import weather_record  # noqa: E402
+from http_client import iter_json_array  # noqa: E402
+from render_check import HostEPD  # noqa: E402
+
+DEFAULT_PORT = 8080
+DEFAULT_INTERVAL = 600  # Seconds a fetched location is served from the cache
+DEFAULT_MAX_AGE = 3 * 3600  # Oldest record served while the upstream fails
+UPSTREAM_TIMEOUT = 15
+FRAMES_KEPT = 64  # Rendered frames stations can acknowledge, oldest dropped first
+
+
+def local_time():
+    """Wall clock in the stations' local time, their RTC is not UTC"""
+    now = time.time()
+    return int(now + time.localtime(now).tm_gmtoff)
+
+
+class _NoProfiler():
+    def record(self, stage):
+        pass
+
+
+class OpenWeatherMapUpstream():
+    """Current weather and forecast JSON from the API, with the station's URLs"""
+    def fetch(self, weather):
+        with urllib.request.urlopen(weather.weather_url, timeout=UPSTREAM_TIMEOUT) as r:
+            current = json.load(r)
+        with urllib.request.urlopen(weather.forecast_url, timeout=UPSTREAM_TIMEOUT) as r:
+            forecast = r.read()
+        return current, forecast
+
+
+class FixtureUpstream():
+    """A render_check fixture for every location, for offline use and checks"""
+    def __init__(self, path):
+        with open(path) as f:
+            self.fixture = json.load(f)
+
+    def fetch(self, weather):
+        forecast = self.fixture.get("forecast")
+        return self.fixture["weather"], None if forecast is None else json.dumps(forecast).encode()
+
+
+class Companion():
+    """Per-location record cache in front of an upstream"""
+    def __init__(self, upstream, api_key="", interval=DEFAULT_INTERVAL, max_age=DEFAULT_MAX_AGE, clock=local_time):
+        self.upstream = upstream
+        self.clock = clock  # Station time the frames are rendered at
+        self.api_key = api_key
+        self.interval = interval
+        self.max_age = max_age
+        self.cache = {}  # (lat, lon) -> (record, fetched time.time())
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.served = 0
+        self.ranges = {}  # (lat, lon) -> [day, low, high], 1/100 degree
+        self.frames = {}  # Frame id -> framebuffer, in insertion order
+        self.render_lock = threading.Lock()  # utime's pinned clock is global
+
+    def _fetch(self, lat, lon):
+        self.upstream_calls += 1
+        weather = weather_forecast.Weather(self.api_key, lat, lon, None)
+        current, forecast = self.upstream.fetch(weather)
+        weather.parse_weather(current)
+        if forecast is not None:
+            weather.parse_forecast(iter_json_array(io.BytesIO(forecast), "list"))
+        temp = round(weather.weather["temp"] * 100)
+        day = self.clock() // 86400
+        low_high = self.ranges.get((lat, lon))
+        if low_high is None or low_high[0] != day:
+            self.ranges[(lat, lon)] = [day, temp, temp]
+        else:
+            low_high[1] = min(low_high[1], temp)
+            low_high[2] = max(low_high[2], temp)
+        return weather_record.pack(weather)
+
+    def record(self, lat, lon):
+        """The location's record with its age filled in, None without data"""
+        key = (lat, lon)
+        with self.lock:
+            lock = self.locks.setdefault(key, threading.Lock())
+        # Stations asking for the same location at once share one fetch
+        with lock:
+            cached = self.cache.get(key)
+            now = time.time()
+            if cached is None or now - cached[1] >= self.interval:
+                try:
+                    cached = (self._fetch(lat, lon), now)
+                    self.cache[key] = cached
+                except Exception as e:
+                    self.upstream_errors += 1
+                    print(f"{lat},{lon}: upstream failed: {e}")
+                    if cached is None or now - cached[1] >= self.max_age:
+                        return None
+        record = bytearray(cached[0])
+        struct.pack_into("<H", record, len(weather_record.MAGIC), min(int(now - cached[1]), 0xFFFF))
+        self.served += 1
+        return bytes(record)
+
+    def frame(self, lat, lon, name, ack):
+        """Delta from frame `ack` to the location's page, None without data"""
+        record = self.record(lat, lon)
+        if record is None:
+            return None
+        epd = HostEPD()
+        weather = weather_forecast.Weather("", lat, lon, epd, name)
+        with self.render_lock:
+            utime.set_time(self.clock())
+            try:
+                weather_record.apply(weather, record)
+                low_high = self.ranges.get((lat, lon))
+                weather.day_range = tuple(low_high[1:]) if low_high else None
+                if not weather.render_weather_horizontal(weather.weather, weather.forecast):
+                    return None
+            finally:
+                utime.set_time(None)
+            frame = bytes(epd.buffer)
+            frame_id = zlib.crc32(frame) or 1
+            self.frames.pop(frame_id, None)
+            self.frames[frame_id] = frame
+            while len(self.frames) > FRAMES_KEPT:
+                del self.frames[next(iter(self.frames))]
+            base = self.frames.get(ack)
+        if base is None:
+            ack = 0
+            base = b"\xff" * len(frame)
+        return frame_delta.encode(base, frame, ack, frame_id)
+
+    def status(self):
+        now = time.time()
+        lines = [f"upstream calls {self.upstream_calls}, errors {self.upstream_errors}, records served {self.served}"]
+        for (lat, lon), (_, fetched) in sorted(self.cache.items()):
+            lines.append(f"{lat},{lon} age {int(now - fetched)} s")
+        return "\n".join(lines) + "\n"
+
+
+def http_handler(companion):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, stations pipeline their requests on one connection
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            if url.path == "/status":
+                self._send(200, "text/plain", companion.status().encode())
+                return
+            if url.path not in ("/record", "/frame"):
+                self._send(404, "text/plain", b"not found\n")
+                return
+            query = urllib.parse.parse_qs(url.query)
+            if "lat" not in query or "lon" not in query:
+                self._send(400, "text/plain", b"lat and lon are required\n")
+                return
+            lat, lon = query["lat"][0], query["lon"][0]
+            if url.path == "/record":
+                body = companion.record(lat, lon)
+            else:
+                try:
+                    ack = int(query.get("ack", ["0"])[0])
+                except ValueError:
+                    ack = 0
+                body = companion.frame(lat, lon, query.get("name", [None])[0], ack)
+            if body is None:
+                self._send(503, "text/plain", b"no data\n")
+            else:
+                self._send(200, "application/octet-stream", body)
+
+        def _send(self, status, kind, body):
+            self.send_response(status)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+    return Handler
+
+
+def udp_handler(companion):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            data, sock = self.request
+            try:
+                lat, lon = data.decode().strip().split(",")
+            except ValueError:
+                return
+            record = companion.record(lat, lon)
+            if record is not None:
+                sock.sendto(record, self.client_address)
+    return Handler
+
+
+def serve(companion, host="", port=DEFAULT_PORT):
+    """Start the HTTP and UDP servers in threads, returns them"""
+    servers = [ThreadingHTTPServer((host, port), http_handler(companion)),
+               socketserver.ThreadingUDPServer((host, port), udp_handler(companion))]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--key", default=os.environ.get("OWM_API_KEY"), help="OpenWeatherMap API key")
+    parser.add_argument("--fixture", help="serve a render_check fixture instead of fetching")
+    parser.add_argument("--host", default="", help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="HTTP and UDP port")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="seconds between fetches of a location")
+    parser.add_argument("--max-age", type=int, default=DEFAULT_MAX_AGE, help="oldest record served while the upstream fails")
+    args = parser.parse_args(argv)
+
+    if args.fixture:
+        upstream = FixtureUpstream(args.fixture)
+    elif args.key:
+        upstream = OpenWeatherMapUpstream()
+    else:
+        parser.error("an API key (--key or OWM_API_KEY) or --fixture is needed")
+    weather_forecast.profiler = _NoProfiler()
+    companion = Companion(upstream, args.key or "", args.interval, args.max_age)
+    serve(companion, args.host, args.port)
+    print(f"Serving weather records on port {args.port} (HTTP and UDP)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Run display_worker.py on CPython threads against the fake driver.
+
+    python tools/display_worker_check.py
+
+Core 0 is the main thread drawing through render transactions faster than
+the fake panel refreshes, core 1 is the worker thread. Checks that only
+the worker drives the panel, no frame is changed while it is uploaded,
+overlapping updates are merged, the driver's counts reach metrics and
+the refresh monitor on the main thread only and the panel ends up showing
+the last frame drawn. Exits with status 1 on any failure.
+"""
+import os
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "host"), os.path.dirname(TOOLS_DIR), TOOLS_DIR]
+
+import threading  # noqa: E402
+
+import display_worker  # noqa: E402
+from metrics import metrics  # noqa: E402
+from render_txn import Transaction, FULL, monitor  # noqa: E402
+from fake_epd import FakeEPD  # noqa: E402
+
+
+def check(label, ok, detail=""):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}{': ' + detail if detail else ''}")
+    return ok
+
+
+class MainThreadOnly():
+    """Flags any write to the shared objects from a thread but the main one"""
+    def __init__(self):
+        self.foreign = 0
+
+    def __call__(self, cls):
+        check = self
+        main_thread = threading.main_thread()
+        setattr_ = cls.__setattr__
+
+        def guarded(obj, name, value):
+            if threading.current_thread() is not main_thread:
+                check.foreign += 1
+            setattr_(obj, name, value)
+        cls.__setattr__ = guarded
+        return setattr_
+
+
+def main():
+    ok = True
+    guard = MainThreadOnly()
+    metrics_setattr = guard(type(metrics))
+    monitor_setattr = guard(type(monitor))
+    refreshes = metrics.full_refreshes + metrics.partial_refreshes
+    counted = []
+    monitor_refreshed = monitor.refreshed
+    monitor.refreshed = lambda kind: (counted.append(monitor.source), monitor_refreshed(kind))
+    epd = FakeEPD(upload_ms=5, refresh_ms=40)
+    epd.buffer[:] = b"\xff" * len(epd.buffer)
+    epd.front[:] = epd.buffer
+    client = display_worker.start_worker(epd)
+    worker = client.worker
+
+    with Transaction(client, "page", FULL):
+        client.fill(0xff)
+        client.text("Weather Station", 5, 10, 0x00)
+    for i in range(40):
+        # A countdown tick every 5 ms, the panel needs 45 ms per update
+        with Transaction(client, "tick"):
+            client.fill_rect(190, 8, 60, 8, 0xff)
+            client.text(str(i), 220, 8, 0x00)
+        if i % 10 == 9:
+            with Transaction(client, "region"):
+                client.fill_rect(5, 40 + i, 40, 8, 0x00)
+        display_worker.utime.sleep_ms(5)
+    client.wait_idle()
+    worker.stop()
+    type(metrics).__setattr__ = metrics_setattr
+    type(monitor).__setattr__ = monitor_setattr
+    refreshes = metrics.full_refreshes + metrics.partial_refreshes - refreshes
+
+    mailbox = worker.mailbox
+    ok &= check("only the worker drove the panel", epd.foreign_calls == 0, f"{epd.foreign_calls} foreign calls")
+    ok &= check("no frame changed during its upload", epd.torn == 0, f"{epd.torn} torn")
+    ok &= check("panel shows the last frame", epd.front == client.front == client.buffer)
+    ok &= check("updates were merged", mailbox.merged > 0 and len(epd.log) < mailbox.posted,
+                f"{mailbox.posted} posted, {mailbox.merged} merged, {len(epd.log)} refreshes")
+    ok &= check("stats written on the main thread only", guard.foreign == 0, f"{guard.foreign} foreign writes")
+    ok &= check("every refresh counted", refreshes == len(counted) == len(epd.log),
+                f"{refreshes} in metrics, {len(counted)} in the monitor, {len(epd.log)} refreshes")
+    ok &= check("refreshes attributed", None not in counted and "direct" not in counted, str(set(counted)))
+    ok &= check("worker errors", worker.errors == 0, str(worker.errors))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
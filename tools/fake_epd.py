@@ -0,0 +1,88 @@
+"""Display driver double for running display_worker.py with CPython threads.
+
+    epd = FakeEPD(upload_ms=5, refresh_ms=50)
+    client = display_worker.start_worker(epd)
+
+Implements the driver calls the worker makes with the landscape buffer
+layout. Uploads and refreshes sleep instead of driving SPI and BUSY, and
+every frame is checksummed before and after the upload so a buffer
+written by the other thread while it is being sent is reported as torn.
+Counts go to self.metrics and self.monitor like in the real driver.
+"""
+import threading
+import time
+import zlib
+
+from metrics import metrics
+from render_txn import monitor, FULL, PARTIAL
+
+BUFFER_ROWS = 128
+PANEL_WIDTH = 250
+
+
+class FakeEPD():
+    def __init__(self, upload_ms=5, refresh_ms=50):
+        self.width = BUFFER_ROWS
+        self.height = PANEL_WIDTH
+        self.buffer = bytearray(self.height * self.width // 8)
+        self.front = bytearray(len(self.buffer))
+        self.upload_ms = upload_ms
+        self.refresh_ms = refresh_ms
+        self.partial_session = False
+        self.log = []  # ("full" | "partial" | "region", rect) per refresh
+        self.torn = 0
+        self.thread = None  # The only thread allowed to drive the panel
+        self.foreign_calls = 0
+        self.metrics = metrics
+        self.monitor = monitor
+        self.tracer = None
+
+    def _owner(self):
+        current = threading.get_ident()
+        if self.thread is None:
+            self.thread = current
+        elif self.thread != current:
+            self.foreign_calls += 1
+
+    def _upload(self, data):
+        before = zlib.crc32(data)
+        time.sleep(self.upload_ms / 1000)
+        if zlib.crc32(data) != before:
+            self.torn += 1
+        self.metrics.spi_bytes += len(data)
+
+    def _refresh(self, kind, rect, wait):
+        self.log.append((kind, rect))
+        if kind == "full":
+            self.metrics.full_refreshes += 1
+            self.monitor.refreshed(FULL)
+        else:
+            self.metrics.partial_refreshes += 1
+            self.monitor.refreshed(PARTIAL)
+        if wait:
+            time.sleep(self.refresh_ms / 1000)
+
+    def end_partial(self):
+        self._owner()
+        self.partial_session = False
+
+    def present(self, partial=False, source=None, wait=False):
+        self._owner()
+        self.front[:] = self.buffer if source is None else source
+        self._upload(self.front)
+        self._refresh("partial" if partial else "full", None, wait)
+
+    def update_region(self, x, y, w, h, source=None, wait=False):
+        self._owner()
+        if source is None:
+            source = self.buffer
+        self.partial_session = True
+        x0, x1 = x, x + w - 1
+        for j in range(y >> 3, (y + h - 1 >> 3) + 1):
+            start = j * self.height
+            self.front[start + x0:start + x1 + 1] = source[start + x0:start + x1 + 1]
+        self._upload(source)
+        self._refresh("region", (x, y, w, h), wait)
+
+    def wait_idle(self):
+        pass
@@ -0,0 +1,81 @@
+"""In-memory I2C bus with register-mapped devices, for running sensor drivers on Linux.
+
+    bus = FakeI2C()
+    bus.attach(FakeBME280())
+    sensor = BME280(bus)
+
+The bus implements the machine.I2C memory methods used by sensors.py and
+logs every transfer, so tests can also check how many bus transactions a
+driver makes.
+"""
+
+
+class FakeDevice():
+    """Device with a 256 byte register file"""
+    def __init__(self, address):
+        self.address = address
+        self.registers = bytearray(256)
+
+    def load(self, reg, data):
+        self.registers[reg:reg + len(data)] = data
+
+    def read(self, reg, n):
+        return bytes(self.registers[reg:reg + n])
+
+    def write(self, reg, data):
+        self.registers[reg:reg + len(data)] = data
+
+
+class FakeBME280(FakeDevice):
+    """BME280 loaded with the compensation example from the Bosch BMP280 datasheet.
+
+    Raw temperature 519888 and pressure 415148 compensate to 25.08 degrees
+    and 100653 Pa. The humidity trimming values are typical values, they
+    have no published example.
+    """
+    TRIM_TP = bytes.fromhex("706b4367" "18fc" "7d8e" "43d6" "d00b" "270b" "8c00" "f9ff" "8c3c" "f8c6" "7017")
+    TRIM_H = bytes.fromhex("6a01" "00" "14" "2e" "03" "1e")
+
+    def __init__(self, address=0x76, adc_t=519888, adc_p=415148, adc_h=30000):
+        super().__init__(address)
+        self.load(0xD0, b"\x60")
+        self.load(0x88, self.TRIM_TP)
+        self.load(0xA1, b"\x4b")
+        self.load(0xE1, self.TRIM_H)
+        self.set_raw(adc_t, adc_p, adc_h)
+
+    def set_raw(self, adc_t, adc_p, adc_h):
+        self.load(0xF7, bytes((adc_p >> 12, (adc_p >> 4) & 0xFF, (adc_p & 0x0F) << 4,
+                               adc_t >> 12, (adc_t >> 4) & 0xFF, (adc_t & 0x0F) << 4,
+                               adc_h >> 8, adc_h & 0xFF)))
+
+
+class FakeI2C():
+    def __init__(self):
+        self.devices = {}
+        self.log = []  # (op, address, register, length)
+
+    def attach(self, device):
+        self.devices[device.address] = device
+        return device
+
+    def _device(self, address):
+        try:
+            return self.devices[address]
+        except KeyError:
+            raise OSError(19, "ENODEV") from None
+
+    def scan(self):
+        return sorted(self.devices)
+
+    def readfrom_mem(self, address, reg, n):
+        self.log.append(("read", address, reg, n))
+        return self._device(address).read(reg, n)
+
+    def readfrom_mem_into(self, address, reg, buf):
+        self.log.append(("read", address, reg, len(buf)))
+        buf[:] = self._device(address).read(reg, len(buf))
+
+    def writeto_mem(self, address, reg, data):
+        self.log.append(("write", address, reg, len(data)))
+        self._device(address).write(reg, data)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Convert a BDF or TTF font into a packed glyph atlas module for fonts.py.
+
+    python tools/font_convert.py /usr/share/fonts/truetype/dejavu/DejaVuSansMono-Bold.ttf \\
+        --size 24 --chars "0123456789.-° " -o font_large.py
+
+The output module defines CHARS, WIDTH, HEIGHT, ADVANCE and DATA. Glyphs are
+fixed-size MONO_HLSB cells stored one after the other, with 0 bits for ink
+and 1 bits for background so they blit straight onto the white e-paper
+buffer with key=1. TTF input needs Pillow, BDF input has no dependencies.
+"""
+import argparse
+import sys
+
+
+def cell_bytes(width, height):
+    return (width + 7) // 8 * height
+
+
+def pack_glyph(pixels, width, height):
+    """pixels[y][x] truthy for ink -> inverted MONO_HLSB bytes"""
+    stride = (width + 7) // 8
+    out = bytearray(b"\xff" * stride * height)
+    for y in range(height):
+        for x in range(width):
+            if pixels[y][x]:
+                out[y * stride + (x >> 3)] &= ~(0x80 >> (x & 7)) & 0xFF
+    return bytes(out)
+
+
+def render_ttf(path, size, chars, threshold=128):
+    """Rasterize chars with Pillow, cropped to the union of their ink boxes"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.truetype(path, size)
+    ascent, descent = font.getmetrics()
+    advance = max(int(round(font.getlength(c))) for c in chars)
+    canvas_h = ascent + descent
+    images = {}
+    top, bottom = canvas_h, 0
+    for c in chars:
+        img = Image.new("L", (advance, canvas_h), 0)
+        ImageDraw.Draw(img).text((0, 0), c, font=font, fill=255)
+        images[c] = img
+        box = img.getbbox()
+        if box:
+            top = min(top, box[1])
+            bottom = max(bottom, box[3])
+    height = bottom - top
+    glyphs = {}
+    for c, img in images.items():
+        glyphs[c] = [[img.getpixel((x, y)) >= threshold for x in range(advance)]
+                     for y in range(top, bottom)]
+    return advance, height, glyphs
+
+
+def parse_bdf(path, chars):
+    """Read glyphs from a BDF font into fixed cells based on FONTBOUNDINGBOX"""
+    with open(path, "r", encoding="latin-1") as f:
+        lines = f.read().splitlines()
+    fbb_w = fbb_h = fbb_x = fbb_y = 0
+    wanted = {ord(c): c for c in chars}
+    raw = {}
+    i = 0
+    while i < len(lines):
+        parts = lines[i].split()
+        if not parts:
+            i += 1
+            continue
+        if parts[0] == "FONTBOUNDINGBOX":
+            fbb_w, fbb_h, fbb_x, fbb_y = map(int, parts[1:5])
+        elif parts[0] == "STARTCHAR":
+            enc = dwidth = None
+            bbx = None
+            rows = []
+            i += 1
+            while lines[i].split()[0] != "ENDCHAR":
+                p = lines[i].split()
+                if p[0] == "ENCODING":
+                    enc = int(p[1])
+                elif p[0] == "DWIDTH":
+                    dwidth = int(p[1])
+                elif p[0] == "BBX":
+                    bbx = tuple(map(int, p[1:5]))
+                elif p[0] == "BITMAP":
+                    i += 1
+                    while lines[i].split()[0] != "ENDCHAR":
+                        rows.append(int(lines[i], 16))
+                        i += 1
+                    continue
+                i += 1
+            if enc in wanted:
+                raw[wanted[enc]] = (dwidth, bbx, rows)
+        i += 1
+
+    advance = max([fbb_w] + [r[0] or 0 for r in raw.values()])
+    glyphs = {}
+    for c in chars:
+        cell = [[False] * advance for _ in range(fbb_h)]
+        if c in raw:
+            _, (w, h, xoff, yoff), rows = raw[c]
+            row_bits = (w + 7) // 8 * 8
+            # Cell row 0 is the top of the font bounding box
+            top = fbb_h + fbb_y - (h + yoff)
+            for r, value in enumerate(rows):
+                for x in range(w):
+                    if value & (1 << (row_bits - 1 - x)):
+                        cx, cy = x + xoff - fbb_x, top + r
+                        if 0 <= cx < advance and 0 <= cy < fbb_h:
+                            cell[cy][cx] = True
+        glyphs[c] = cell
+    return advance, fbb_h, glyphs
+
+
+def write_module(out, source, chars, width, height, spacing, glyphs):
+    data = b"".join(pack_glyph(glyphs[c], width, height) for c in chars)
+    out.write(f"# Generated by tools/font_convert.py from {source}, do not edit\n")
+    out.write(f"CHARS = {chars!r}\n")
+    out.write(f"WIDTH = {width}\n")
+    out.write(f"HEIGHT = {height}\n")
+    out.write(f"ADVANCE = {width + spacing}\n")
+    out.write("DATA = (\n")
+    size = cell_bytes(width, height)
+    for i, c in enumerate(chars):
+        chunk = data[i * size:(i + 1) * size]
+        out.write(f"    # {c!r}\n")
+        for j in range(0, len(chunk), 24):
+            out.write(f"    {chunk[j:j + 24]!r}\n")
+    out.write(")\n")
+
+
+def preview(chars, width, height, glyphs):
+    for c in chars:
+        print(f"{c!r}:")
+        for row in glyphs[c]:
+            print("".join("#" if p else "." for p in row[:width]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("font", help=".bdf or .ttf/.otf file")
+    parser.add_argument("--size", type=int, default=24, help="pixel size for TTF fonts")
+    parser.add_argument("--chars", default="0123456789.-% ", help="characters to include")
+    parser.add_argument("--spacing", type=int, default=1, help="extra pixels between glyphs")
+    parser.add_argument("-o", "--output", help="output module (default: stdout)")
+    parser.add_argument("--preview", action="store_true", help="print the glyphs as ASCII art")
+    args = parser.parse_args(argv)
+
+    if args.font.lower().endswith(".bdf"):
+        width, height, glyphs = parse_bdf(args.font, args.chars)
+    else:
+        width, height, glyphs = render_ttf(args.font, args.size, args.chars)
+    if args.preview:
+        preview(args.chars, width, height, glyphs)
+    source = args.font.replace("\\", "/").rsplit("/", 1)[-1]
+    if args.output:
+        with open(args.output, "w") as out:
+            write_module(out, source, args.chars, width, height, args.spacing, glyphs)
+    else:
+        write_module(sys.stdout, source, args.chars, width, height, args.spacing, glyphs)
+    print(f"{len(args.chars)} glyphs, {width}x{height}, {cell_bytes(width, height) * len(args.chars)} bytes",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
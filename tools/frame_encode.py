@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Encode frames into the frame_codec run-length snapshot format.
+
+    python tools/frame_encode.py frame.pbm -o splash.bin   # 250x122 PBM or a raw 4000 byte buffer
+    python tools/frame_encode.py --stats                   # ratios and decode speed on typical screens
+
+A PBM is placed at the top left of the landscape framebuffer, rows below
+the visible 122 stay white. --stats renders the render_check fixtures and
+the status screens, checks that every snapshot decodes back to the same
+buffer, both in one piece and streamed in bands, and reports the size
+and host decode times. Host timings are only useful relative to each
+other, frame_codec.benchmark() gives the device numbers.
+"""
+import argparse
+import os
+import sys
+import time
+import zlib
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "host"), os.path.dirname(TOOLS_DIR), TOOLS_DIR]
+
+import frame_codec  # noqa: E402
+import render_check  # noqa: E402
+from render_check import HostEPD, PANEL_WIDTH  # noqa: E402
+
+
+def from_pbm(path):
+    """Landscape framebuffer holding a PBM image"""
+    epd = HostEPD()
+    epd.fill(0xff)
+    for y, row in enumerate(render_check.read_pbm(path)[:epd.width]):
+        for x, white in enumerate(row[:PANEL_WIDTH]):
+            if not white:
+                epd.pixel(x, y, 0)
+    return epd.buffer
+
+
+def from_file(path):
+    if path.endswith(".pbm"):
+        return from_pbm(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) != len(HostEPD().buffer):
+        raise ValueError(f"{path}: expected a PBM or a raw {len(HostEPD().buffer)} byte framebuffer")
+    return bytearray(data)
+
+
+def screens():
+    """(name, framebuffer) of the pages and status screens the station shows"""
+    from render_txn import status_screen
+    render_check.weather_forecast.profiler = render_check._NoProfiler()
+    fixtures = sorted(os.path.splitext(name)[0] for name in os.listdir(render_check.FIXTURES_DIR)
+                      if name.endswith(".json"))
+    for name in fixtures:
+        epd = HostEPD()
+        weather = render_check.setup(render_check.load_fixture(
+            os.path.join(render_check.FIXTURES_DIR, name + ".json")), epd)
+        render_check.render(weather)
+        yield name, epd.buffer
+    for name, lines in (("splash", ("Weather Station", "Starting...")),
+                        ("wifi_failed", ("WiFi Connection", "Failed!", "Check credentials", "and restart."))):
+        epd = HostEPD()
+        status_screen(epd, lines, name)
+        yield name, epd.buffer
+    epd = HostEPD()
+    epd.fill(0xff)
+    yield "blank", epd.buffer
+
+
+def best_us(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def stats(repeat):
+    failures = 0
+    total_raw = total_rle = 0
+    print(f"{'screen':<16} {'raw':>6} {'rle':>6} {'ratio':>6} {'zlib':>6} {'into us':>8} {'stream us':>9}  result")
+    for name, buf in screens():
+        band = HostEPD().height
+        data = frame_codec.encode(buf, band)
+        out = bytearray(len(buf))
+        ok = frame_codec.decode_into(data, out) and out == buf
+        # Streamed chunks arrive in panel order: last band first
+        panel = b"".join(bytes(buf[j * band:(j + 1) * band]) for j in range(len(buf) // band - 1, -1, -1))
+        chunks = []
+        ok &= frame_codec.stream(data, lambda c: chunks.append(bytes(c))) == len(buf)
+        ok &= b"".join(chunks) == panel and all(len(c) == band for c in chunks)
+        into = best_us(lambda: frame_codec.decode_into(data, out), repeat)
+        streamed = best_us(lambda: frame_codec.stream(data, lambda c: None), repeat)
+        failures += not ok
+        total_raw += len(buf)
+        total_rle += len(data)
+        print(f"{name:<16} {len(buf):6d} {len(data):6d} {len(buf) / len(data):5.1f}x "
+              f"{len(zlib.compress(bytes(buf), 9)):6d} {into:8.0f} {streamed:9.0f}  {'ok' if ok else 'FAIL'}")
+    print(f"{'total':<16} {total_raw:6d} {total_rle:6d} {total_raw / total_rle:5.1f}x")
+    return 1 if failures else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", help="PBM image or raw framebuffer")
+    parser.add_argument("-o", "--output", help="snapshot file to write")
+    parser.add_argument("--stats", action="store_true", help="report ratios and decode times on typical screens")
+    parser.add_argument("--repeat", type=int, default=20, help="decodes per screen for the timing")
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        return stats(max(1, args.repeat))
+    if not args.input or not args.output:
+        parser.error("an input and -o are needed unless --stats is given")
+    buf = from_file(args.input)
+    data = frame_codec.encode(buf, HostEPD().height)
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print(f"{args.output}: {len(buf)} -> {len(data)} bytes ({len(buf) / len(data):.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
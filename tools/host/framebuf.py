@@ -0,0 +1,278 @@
+"""CPython implementation of the MicroPython framebuf module for host rendering.
+
+Drawing follows modframebuf.c (clipping, line stepping, text and blit), so
+frames rendered on the host match the device bit for bit, except for the
+8x8 text glyphs below which come from the CP437 font of luma.core
+(Copyright (c) 2017-2021 Richard Hull and contributors, MIT License)
+instead of MicroPython's petme128 font. Only the 1-bit formats are
+implemented.
+"""
+
+MONO_VLSB = 0
+MONO_HLSB = 3
+MONO_HMSB = 4
+MVLSB = MONO_VLSB
+
+# Characters 32..127, 8 column bytes each with the least significant bit at the top
+FONT_8X8 = (
+    b"\x00\x00\x00\x00\x00\x00\x00\x00",  # ' '
+    b"\x00\x06\x5f\x5f\x06\x00\x00\x00",  # '!'
+    b"\x00\x07\x07\x00\x07\x07\x00\x00",  # '"'
+    b"\x14\x7f\x7f\x14\x7f\x7f\x14\x00",  # '#'
+    b"\x24\x2e\x6b\x6b\x3a\x12\x00\x00",  # '$'
+    b"\x46\x66\x30\x18\x0c\x66\x62\x00",  # '%'
+    b"\x30\x7a\x4f\x5d\x37\x7a\x48\x00",  # '&'
+    b"\x04\x07\x03\x00\x00\x00\x00\x00",  # "'"
+    b"\x00\x1c\x3e\x63\x41\x00\x00\x00",  # '('
+    b"\x00\x41\x63\x3e\x1c\x00\x00\x00",  # ')'
+    b"\x08\x2a\x3e\x1c\x1c\x3e\x2a\x08",  # '*'
+    b"\x08\x08\x3e\x3e\x08\x08\x00\x00",  # '+'
+    b"\x00\x80\xe0\x60\x00\x00\x00\x00",  # ','
+    b"\x08\x08\x08\x08\x08\x08\x00\x00",  # '-'
+    b"\x00\x00\x60\x60\x00\x00\x00\x00",  # '.'
+    b"\x60\x30\x18\x0c\x06\x03\x01\x00",  # '/'
+    b"\x3e\x7f\x71\x59\x4d\x7f\x3e\x00",  # '0'
+    b"\x40\x42\x7f\x7f\x40\x40\x00\x00",  # '1'
+    b"\x62\x73\x59\x49\x6f\x66\x00\x00",  # '2'
+    b"\x22\x63\x49\x49\x7f\x36\x00\x00",  # '3'
+    b"\x18\x1c\x16\x53\x7f\x7f\x50\x00",  # '4'
+    b"\x27\x67\x45\x45\x7d\x39\x00\x00",  # '5'
+    b"\x3c\x7e\x4b\x49\x79\x30\x00\x00",  # '6'
+    b"\x03\x03\x71\x79\x0f\x07\x00\x00",  # '7'
+    b"\x36\x7f\x49\x49\x7f\x36\x00\x00",  # '8'
+    b"\x06\x4f\x49\x69\x3f\x1e\x00\x00",  # '9'
+    b"\x00\x00\x66\x66\x00\x00\x00\x00",  # ':'
+    b"\x00\x80\xe6\x66\x00\x00\x00\x00",  # ';'
+    b"\x08\x1c\x36\x63\x41\x00\x00\x00",  # '<'
+    b"\x24\x24\x24\x24\x24\x24\x00\x00",  # '='
+    b"\x00\x41\x63\x36\x1c\x08\x00\x00",  # '>'
+    b"\x02\x03\x51\x59\x0f\x06\x00\x00",  # '?'
+    b"\x3e\x7f\x41\x5d\x5d\x1f\x1e\x00",  # '@'
+    b"\x7c\x7e\x13\x13\x7e\x7c\x00\x00",  # 'A'
+    b"\x41\x7f\x7f\x49\x49\x7f\x36\x00",  # 'B'
+    b"\x1c\x3e\x63\x41\x41\x63\x22\x00",  # 'C'
+    b"\x41\x7f\x7f\x41\x63\x3e\x1c\x00",  # 'D'
+    b"\x41\x7f\x7f\x49\x5d\x41\x63\x00",  # 'E'
+    b"\x41\x7f\x7f\x49\x1d\x01\x03\x00",  # 'F'
+    b"\x1c\x3e\x63\x41\x51\x73\x72\x00",  # 'G'
+    b"\x7f\x7f\x08\x08\x7f\x7f\x00\x00",  # 'H'
+    b"\x00\x41\x7f\x7f\x41\x00\x00\x00",  # 'I'
+    b"\x30\x70\x40\x41\x7f\x3f\x01\x00",  # 'J'
+    b"\x41\x7f\x7f\x08\x1c\x77\x63\x00",  # 'K'
+    b"\x41\x7f\x7f\x41\x40\x60\x70\x00",  # 'L'
+    b"\x7f\x7f\x0e\x1c\x0e\x7f\x7f\x00",  # 'M'
+    b"\x7f\x7f\x06\x0c\x18\x7f\x7f\x00",  # 'N'
+    b"\x1c\x3e\x63\x41\x63\x3e\x1c\x00",  # 'O'
+    b"\x41\x7f\x7f\x49\x09\x0f\x06\x00",  # 'P'
+    b"\x1e\x3f\x21\x71\x7f\x5e\x00\x00",  # 'Q'
+    b"\x41\x7f\x7f\x09\x19\x7f\x66\x00",  # 'R'
+    b"\x26\x6f\x4d\x59\x73\x32\x00\x00",  # 'S'
+    b"\x03\x41\x7f\x7f\x41\x03\x00\x00",  # 'T'
+    b"\x7f\x7f\x40\x40\x7f\x7f\x00\x00",  # 'U'
+    b"\x1f\x3f\x60\x60\x3f\x1f\x00\x00",  # 'V'
+    b"\x7f\x7f\x30\x18\x30\x7f\x7f\x00",  # 'W'
+    b"\x43\x67\x3c\x18\x3c\x67\x43\x00",  # 'X'
+    b"\x07\x4f\x78\x78\x4f\x07\x00\x00",  # 'Y'
+    b"\x47\x63\x71\x59\x4d\x67\x73\x00",  # 'Z'
+    b"\x00\x7f\x7f\x41\x41\x00\x00\x00",  # '['
+    b"\x01\x03\x06\x0c\x18\x30\x60\x00",  # '\\'
+    b"\x00\x41\x41\x7f\x7f\x00\x00\x00",  # ']'
+    b"\x08\x0c\x06\x03\x06\x0c\x08\x00",  # '^'
+    b"\x80\x80\x80\x80\x80\x80\x80\x80",  # '_'
+    b"\x00\x00\x03\x07\x04\x00\x00\x00",  # '`'
+    b"\x20\x74\x54\x54\x3c\x78\x40\x00",  # 'a'
+    b"\x41\x7f\x3f\x48\x48\x78\x30\x00",  # 'b'
+    b"\x38\x7c\x44\x44\x6c\x28\x00\x00",  # 'c'
+    b"\x30\x78\x48\x49\x3f\x7f\x40\x00",  # 'd'
+    b"\x38\x7c\x54\x54\x5c\x18\x00\x00",  # 'e'
+    b"\x48\x7e\x7f\x49\x03\x02\x00\x00",  # 'f'
+    b"\x98\xbc\xa4\xa4\xf8\x7c\x04\x00",  # 'g'
+    b"\x41\x7f\x7f\x08\x04\x7c\x78\x00",  # 'h'
+    b"\x00\x44\x7d\x7d\x40\x00\x00\x00",  # 'i'
+    b"\x60\xe0\x80\x80\xfd\x7d\x00\x00",  # 'j'
+    b"\x41\x7f\x7f\x10\x38\x6c\x44\x00",  # 'k'
+    b"\x00\x41\x7f\x7f\x40\x00\x00\x00",  # 'l'
+    b"\x7c\x7c\x18\x38\x1c\x7c\x78\x00",  # 'm'
+    b"\x7c\x7c\x04\x04\x7c\x78\x00\x00",  # 'n'
+    b"\x38\x7c\x44\x44\x7c\x38\x00\x00",  # 'o'
+    b"\x84\xfc\xf8\xa4\x24\x3c\x18\x00",  # 'p'
+    b"\x18\x3c\x24\xa4\xf8\xfc\x84\x00",  # 'q'
+    b"\x44\x7c\x78\x4c\x04\x1c\x18\x00",  # 'r'
+    b"\x48\x5c\x54\x54\x74\x24\x00\x00",  # 's'
+    b"\x00\x04\x3e\x7f\x44\x24\x00\x00",  # 't'
+    b"\x3c\x7c\x40\x40\x3c\x7c\x40\x00",  # 'u'
+    b"\x1c\x3c\x60\x60\x3c\x1c\x00\x00",  # 'v'
+    b"\x3c\x7c\x70\x38\x70\x7c\x3c\x00",  # 'w'
+    b"\x44\x6c\x38\x10\x38\x6c\x44\x00",  # 'x'
+    b"\x9c\xbc\xa0\xa0\xfc\x7c\x00\x00",  # 'y'
+    b"\x4c\x64\x74\x5c\x4c\x64\x00\x00",  # 'z'
+    b"\x08\x08\x3e\x77\x41\x41\x00\x00",  # '{'
+    b"\x00\x00\x00\x77\x77\x00\x00\x00",  # '|'
+    b"\x41\x41\x77\x3e\x08\x08\x00\x00",  # '}'
+    b"\x02\x03\x01\x03\x02\x03\x01\x00",  # '~'
+    b"\x70\x78\x4c\x46\x4c\x78\x70\x00",  # '\x7f'
+
+)
+
+
+class FrameBuffer():
+    # State is kept in underscore attributes: subclasses such as the display
+    # drivers use width/height/buffer for their own meaning, like on the device
+    def __init__(self, buffer, width, height, format, stride=None):
+        if format not in (MONO_VLSB, MONO_HLSB, MONO_HMSB):
+            raise ValueError("invalid format")
+        if stride is None:
+            stride = width
+        if format != MONO_VLSB:
+            stride = (stride + 7) & ~7
+        self._buf = buffer
+        self._width = width
+        self._height = height
+        self._format = format
+        self._stride = stride
+        rows = (height + 7) // 8 if format == MONO_VLSB else height
+        if len(buffer) < (stride * rows if format == MONO_VLSB else stride * rows // 8):
+            raise ValueError("buffer too small")
+
+    def _set(self, x, y, c):
+        if self._format == MONO_VLSB:
+            index = (y >> 3) * self._stride + x
+            bit = 1 << (y & 7)
+        else:
+            index = (x + y * self._stride) >> 3
+            bit = 0x80 >> (x & 7) if self._format == MONO_HLSB else 1 << (x & 7)
+        if c & 1:
+            self._buf[index] |= bit
+        else:
+            self._buf[index] &= ~bit & 0xFF
+
+    def _get(self, x, y):
+        if self._format == MONO_VLSB:
+            return (self._buf[(y >> 3) * self._stride + x] >> (y & 7)) & 1
+        byte = self._buf[(x + y * self._stride) >> 3]
+        if self._format == MONO_HLSB:
+            return (byte >> (7 - (x & 7))) & 1
+        return (byte >> (x & 7)) & 1
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self._width, self._height, c)
+
+    def pixel(self, x, y, c=None):
+        if 0 <= x < self._width and 0 <= y < self._height:
+            if c is None:
+                return self._get(x, y)
+            self._set(x, y, c)
+        return None
+
+    def fill_rect(self, x, y, w, h, c):
+        if h < 1 or w < 1 or x + w <= 0 or y + h <= 0 or y >= self._height or x >= self._width:
+            return
+        xend = min(self._width, x + w)
+        yend = min(self._height, y + h)
+        x = max(x, 0)
+        y = max(y, 0)
+        for yy in range(y, yend):
+            for xx in range(x, xend):
+                self._set(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+        else:
+            self.fill_rect(x, y, w, 1, c)
+            self.fill_rect(x, y + h - 1, w, 1, c)
+            self.fill_rect(x, y, 1, h, c)
+            self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = x2 - x1
+        if dx > 0:
+            sx = 1
+        else:
+            dx = -dx
+            sx = -1
+        dy = y2 - y1
+        if dy > 0:
+            sy = 1
+        else:
+            dy = -dy
+            sy = -1
+        steep = dy > dx
+        if steep:
+            x1, y1 = y1, x1
+            dx, dy = dy, dx
+            sx, sy = sy, sx
+        e = 2 * dy - dx
+        for _ in range(dx):
+            if steep:
+                if 0 <= y1 < self._width and 0 <= x1 < self._height:
+                    self._set(y1, x1, c)
+            elif 0 <= x1 < self._width and 0 <= y1 < self._height:
+                self._set(x1, y1, c)
+            while e >= 0:
+                y1 += sy
+                e -= 2 * dx
+            x1 += sx
+            e += 2 * dy
+        if 0 <= x2 < self._width and 0 <= y2 < self._height:
+            self._set(x2, y2, c)
+
+    def text(self, s, x, y, c=1):
+        for ch in s:
+            code = ord(ch)
+            if code < 32 or code > 127:
+                code = 127
+            glyph = FONT_8X8[code - 32]
+            for j in range(8):
+                x0 = x + j
+                if 0 <= x0 < self._width:
+                    column = glyph[j]
+                    y0 = y
+                    while column:
+                        if column & 1 and 0 <= y0 < self._height:
+                            self._set(x0, y0, c)
+                        column >>= 1
+                        y0 += 1
+            x += 8
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        if x >= self._width or y >= self._height or -x >= fbuf._width or -y >= fbuf._height:
+            return
+        x0 = max(0, x)
+        y0 = max(0, y)
+        x1 = max(0, -x)
+        y1 = max(0, -y)
+        x0end = min(self._width, x + fbuf._width)
+        y0end = min(self._height, y + fbuf._height)
+        for yy in range(y0, y0end):
+            cx1 = x1
+            for xx in range(x0, x0end):
+                col = fbuf._get(cx1, y1)
+                if palette is not None:
+                    col = palette._get(col, 0)
+                if col != key:
+                    self._set(xx, yy, col)
+                cx1 += 1
+            y1 += 1
+
+    def scroll(self, xstep, ystep):
+        if xstep < 0:
+            sx, xend, dx = 0, self._width + xstep, 1
+        else:
+            sx, xend, dx = self._width - 1, xstep - 1, -1
+        if ystep < 0:
+            y, yend, dy = 0, self._height + ystep, 1
+        else:
+            y, yend, dy = self._height - 1, ystep - 1, -1
+        while y != yend:
+            x = sx
+            while x != xend:
+                self._set(x, y, self._get(x - xstep, y - ystep))
+                x += dx
+            y += dy
@@ -0,0 +1,58 @@
+"""CPython stand-in for the parts of the MicroPython machine module used by host tools.
+
+ADC channels return the value set with ADC.set_value(), Timer callbacks
+only run when a tool calls Timer.fire().
+"""
+
+
+class ADC():
+    values = {}  # channel -> raw read_u16 value
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    @classmethod
+    def set_value(cls, channel, raw):
+        cls.values[channel] = raw
+
+    def read_u16(self):
+        return self.values.get(self.channel, 0)
+
+
+class Pin():
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+
+    def __init__(self, id, mode=None, pull=None):
+        self.id = id
+        self._value = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+
+class Timer():
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, period=1000, mode=PERIODIC, callback=None):
+        self.period = period
+        self.callback = callback
+
+    def fire(self):
+        if self.callback is not None:
+            self.callback(self)
+
+    def deinit(self):
+        self.callback = None
+
+
+def unique_id():
+    return b"\xe6\x61\x41\x04\x03\x5e\x2a\x2b"
+
+
+def reset():
+    raise SystemExit("machine.reset()")
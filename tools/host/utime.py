@@ -0,0 +1,65 @@
+"""CPython stand-in for the MicroPython utime module used by host tools.
+
+The wall clock can be pinned with set_time() so rendered frames that show
+the time and date are reproducible.
+"""
+import time as _time
+
+TICKS_PERIOD = 1 << 30  # ticks_* wrap like on the RP2040 port
+
+_fixed_time = None
+
+
+def set_time(secs):
+    """Pin time()/localtime() to `secs` (UTC epoch seconds), None for the real clock"""
+    global _fixed_time
+    _fixed_time = secs
+
+
+def time():
+    if _fixed_time is not None:
+        return int(_fixed_time)
+    return int(_time.time())
+
+
+def localtime(secs=None):
+    if secs is None:
+        secs = time()
+    t = _time.gmtime(secs)
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, t.tm_wday, t.tm_yday)
+
+
+gmtime = localtime
+
+
+def mktime(t):
+    import calendar
+    return calendar.timegm(tuple(t[:6]) + (0, 0, 0))
+
+
+def ticks_ms():
+    return int(_time.monotonic() * 1000) % TICKS_PERIOD
+
+
+def ticks_us():
+    return int(_time.monotonic() * 1000000) % TICKS_PERIOD
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(end, start):
+    return ((end - start + TICKS_PERIOD // 2) % TICKS_PERIOD) - TICKS_PERIOD // 2
+
+
+def sleep(secs):
+    _time.sleep(secs)
+
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    _time.sleep(us / 1000000)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Render recorded weather through the real layout code and compare to golden images.
+
+Each fixture in tools/fixtures is a JSON file with the OpenWeatherMap
+current weather response ("weather"), the 5 day forecast response
+("forecast", may be null), an optional location name ("name"), the
+optional history low/high ("day_range", 1/100 degree) and the wall clock
+to render at ("now", UTC epoch seconds). The forecast is fed
+through the streaming parser like on the device.
+
+    python tools/render_check.py                  # compare against tools/golden
+    python tools/render_check.py --update         # rewrite the golden images
+    python tools/render_check.py --out /tmp/frames --repeat 20 clear_sky
+
+Rendering uses the CPython framebuf and utime modules from tools/host.
+Per frame it reports the render time and the allocations seen by
+tracemalloc during a warmed-up render (blocks still allocated afterwards
+and the peak heap growth). Host timings are only useful relative to each
+other. A warmed-up render that keeps blocks allocated, or whose peak goes
+over RENDER_PEAK_LIMIT, fails the check like a pixel difference. CPython
+allocates range iterators and large ints that MicroPython does not, so the
+limit leaves room for those. The exact zero allocation check is
+render_alloc.py on the device.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import struct
+import sys
+import time
+import tracemalloc
+import zlib
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "host"), os.path.dirname(TOOLS_DIR)]
+
+import framebuf  # noqa: E402
+import utime  # noqa: E402
+import weather_forecast  # noqa: E402
+from http_client import iter_json_array  # noqa: E402
+
+FIXTURES_DIR = os.path.join(TOOLS_DIR, "fixtures")
+GOLDEN_DIR = os.path.join(TOOLS_DIR, "golden")
+PANEL_WIDTH = 250  # Landscape framebuffer
+PANEL_HEIGHT = 122  # Visible rows, the buffer is padded to 128
+BUFFER_ROWS = 128
+RENDER_PEAK_LIMIT = 400  # Bytes, CPython's own transients. Pages formatted as strings peaked at 460-690
+
+
+class HostEPD(framebuf.FrameBuffer):
+    """Landscape display with the driver's buffer layout and no hardware"""
+    def __init__(self):
+        self.width = BUFFER_ROWS
+        self.height = PANEL_WIDTH
+        self.buffer = bytearray(self.height * self.width // 8)
+        self.front = bytearray(len(self.buffer))
+        super().__init__(self.buffer, self.height, self.width, framebuf.MONO_VLSB)
+
+    def display(self, image, wait=True):
+        self.front[:] = image
+
+    def present(self, partial=False):
+        self.front[:] = self.buffer
+
+
+class _NoProfiler():
+    # gc.mem_free() does not exist on CPython
+    def record(self, stage):
+        pass
+
+    def before_fetch(self):
+        pass
+
+
+def load_fixture(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def setup(fixture, epd):
+    """Parse a fixture into a Weather object, like the device does after a fetch"""
+    utime.set_time(fixture["now"])
+    weather = weather_forecast.Weather("", 0, 0, epd, fixture.get("name"))
+    weather.parse_weather(fixture["weather"])
+    if fixture.get("day_range"):
+        weather.day_range = tuple(fixture["day_range"])
+    if fixture.get("forecast") is not None:
+        raw = json.dumps(fixture["forecast"]).encode()
+        weather.parse_forecast(iter_json_array(io.BytesIO(raw), "list"))
+    return weather
+
+
+def render(weather):
+    if not weather.render_weather_horizontal(weather.weather, weather.forecast):
+        raise RuntimeError("render_weather_horizontal failed")
+
+
+def visible_pixels(buf):
+    """Visible area as rows of 0 (black) / 1 (white)"""
+    rows = []
+    for y in range(PANEL_HEIGHT):
+        base = (y >> 3) * PANEL_WIDTH
+        bit = y & 7
+        rows.append(bytes((buf[base + x] >> bit) & 1 for x in range(PANEL_WIDTH)))
+    return rows
+
+
+def pack_rows(rows, ink):
+    """Pack 1-bit rows MSB first, `ink` is the bit value written for black"""
+    out = []
+    for row in rows:
+        packed = bytearray((PANEL_WIDTH + 7) // 8)
+        for x, p in enumerate(row):
+            if (not p) == bool(ink):
+                packed[x >> 3] |= 0x80 >> (x & 7)
+        out.append(bytes(packed))
+    return out
+
+
+def write_pbm(path, rows):
+    with open(path, "wb") as f:
+        f.write(b"P4\n%d %d\n" % (PANEL_WIDTH, PANEL_HEIGHT))
+        f.write(b"".join(pack_rows(rows, 1)))
+
+
+def read_pbm(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    fields = data.split(None, 3)
+    if fields[0] != b"P4":
+        raise ValueError(f"{path}: not a binary PBM")
+    width, height = int(fields[1]), int(fields[2])
+    stride = (width + 7) // 8
+    bits = fields[3]
+    return [bytes(0 if bits[y * stride + (x >> 3)] & (0x80 >> (x & 7)) else 1 for x in range(width))
+            for y in range(height)]
+
+
+def write_png(path, rows):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    # 1-bit greyscale, 1 is white
+    raw = b"".join(b"\x00" + row for row in pack_rows(rows, 0))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", PANEL_WIDTH, PANEL_HEIGHT, 1, 0, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 9)))
+        f.write(chunk(b"IEND", b""))
+
+
+def diff_count(a, b):
+    if len(a) != len(b) or any(len(ra) != len(rb) for ra, rb in zip(a, b)):
+        return -1
+    return sum(pa != pb for ra, rb in zip(a, b) for pa, pb in zip(ra, rb))
+
+
+def bench(weather, repeat):
+    """(best render time in ms, live blocks, peak heap growth in bytes) over `repeat` renders"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render(weather)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        render(weather)
+        peak = tracemalloc.get_traced_memory()[1] - base
+        # A second render between snapshots, only the snapshots themselves
+        # are allocated by tracemalloc
+        before = tracemalloc.take_snapshot()
+        render(weather)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    blocks = sum(stat.count_diff for stat in after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+                 if stat.count_diff > 0)
+    return best, blocks, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="*", help="fixture names (default: all)")
+    parser.add_argument("--update", action="store_true", help="write the golden images instead of comparing")
+    parser.add_argument("--out", help="directory for the rendered PNG and PBM frames")
+    parser.add_argument("--repeat", type=int, default=5, help="renders per fixture for the timing")
+    args = parser.parse_args(argv)
+
+    names = args.fixtures or sorted(os.path.splitext(os.path.basename(p))[0]
+                                    for p in glob.glob(os.path.join(FIXTURES_DIR, "*.json")))
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    weather_forecast.profiler = _NoProfiler()
+
+    failures = 0
+    print(f"{'fixture':<20} {'result':<10} {'ms':>8} {'blocks':>7} {'peak B':>8}  alloc")
+    for name in names:
+        epd = HostEPD()
+        weather = setup(load_fixture(os.path.join(FIXTURES_DIR, name + ".json")), epd)
+        render(weather)
+        rows = visible_pixels(epd.buffer)
+        golden = os.path.join(GOLDEN_DIR, name + ".pbm")
+        if args.update:
+            write_pbm(golden, rows)
+            result = "updated"
+        elif not os.path.exists(golden):
+            result = "no golden"
+            failures += 1
+        else:
+            diff = diff_count(read_pbm(golden), rows)
+            if diff == 0:
+                result = "ok"
+            else:
+                result = "size" if diff < 0 else f"{diff} px"
+                failures += 1
+        if args.out:
+            write_pbm(os.path.join(args.out, name + ".pbm"), rows)
+            write_png(os.path.join(args.out, name + ".png"), rows)
+        ms, blocks, peak = bench(weather, max(1, args.repeat))
+        allocates = blocks > 0 or peak > RENDER_PEAK_LIMIT
+        if allocates:
+            failures += 1
+        print(f"{name:<20} {result:<10} {ms:8.2f} {blocks:7d} {peak:8d}  {'FAIL' if allocates else 'ok'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Run sensors.py on Linux against the fake ADC and I2C bus.
+
+    python tools/sensor_check.py
+
+Checks the fixed-point conversions against the floating point formulas and
+the Bosch datasheet example, and that a BME280 sample is one burst read.
+Exits with status 1 on any mismatch.
+"""
+import os
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "host"), os.path.dirname(TOOLS_DIR), TOOLS_DIR]
+
+import machine  # noqa: E402
+import sensors  # noqa: E402
+from fake_i2c import FakeI2C, FakeBME280  # noqa: E402
+
+
+def check(label, value, expected, tolerance):
+    ok = abs(value - expected) <= tolerance
+    print(f"{'ok  ' if ok else 'FAIL'} {label}: {value} (expected {expected} +/- {tolerance})")
+    return ok
+
+
+def main():
+    ok = True
+
+    # Internal sensor against the float formula it replaces, over the useful range
+    pico = sensors.PicoTemperature()
+    out = [0]
+    for raw in (12000, 13500, 14020, 14600, 15500):
+        machine.ADC.set_value(4, raw)
+        pico.read(out)
+        expected = (27 - (raw * 3.3 / 65535 - 0.706) / 0.001721) * 100
+        ok &= check(f"pico_temp raw={raw}", out[0], round(expected), 2)
+
+    bus = FakeI2C()
+    device = bus.attach(FakeBME280())
+    bme = sensors.BME280(bus)
+    out = [0, 0, 0]
+    bus.log.clear()
+    bme.read(out)
+    ok &= check("bme280 temperature", out[0], 2508, 0)
+    # The 32-bit compensation is a few Pa off the 64-bit/floating point result
+    ok &= check("bme280 pressure", out[1], 100653, 4)
+    ok &= 0 <= out[2] <= 10000
+    print(f"     bme280 humidity: {out[2]}")
+    ok &= check("bme280 bus transfers per sample", len(bus.log), 1, 0)
+
+    # Service: ring buffer, averaging and calibration offsets
+    service = sensors.SensorService(size=4)
+    service.calibration = {"pico_temp": -150}
+    service.add(sensors.PicoTemperature())
+    service.add(bme)
+    machine.ADC.set_value(4, 14020)
+    for adc_t in (519888, 519888, 521000, 523000, 525000, 525000):
+        device.set_raw(adc_t, 415148, 30000)
+        service.sample()
+    ok &= check("ring count", service.count, 4, 0)
+    ok &= check("pico_temp calibrated", service.latest("pico_temp"), 2702 - 150, 2)
+    window = [521000, 523000, 525000, 525000]
+    values = []
+    for adc_t in window:
+        device.set_raw(adc_t, 415148, 30000)
+        bme.read(out)
+        values.append(out[0])
+    ok &= check("temperature average", service.average("temperature"), round(sum(values) / 4), 1)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
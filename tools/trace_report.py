@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Per-phase latency report from weather station trace dumps.
+
+Accepts either the binary `trace.bin` copied from the board, e.g.
+
+    mpremote cp :trace.bin . && python tools/trace_report.py trace.bin
+
+or a serial log captured while running `tracer.dump_serial()` (the hex
+lines between TRACE-BEGIN and TRACE-END are decoded).
+"""
+import argparse
+import binascii
+import os
+import struct
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(TOOLS_DIR, "host"), os.path.dirname(TOOLS_DIR)]
+
+from tracing import PHASE_NAMES, RECORD_FMT, TRACE_MAGIC  # noqa: E402
+
+
+def parse_dump(data):
+    """Return a list of (phase, cycle, start_us, duration_us) records"""
+    if data[:4] != TRACE_MAGIC:
+        raise ValueError("not a trace dump")
+    size, count = struct.unpack_from("<HH", data, 4)
+    records = []
+    offset = 8
+    for _ in range(count):
+        records.append(struct.unpack_from(RECORD_FMT, data, offset))
+        offset += size
+    return records
+
+
+def read_serial_log(text):
+    """Extract the binary dumps from a serial log"""
+    dumps = []
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line == "TRACE-BEGIN":
+            current = []
+        elif line == "TRACE-END" and current is not None:
+            dumps.append(b"".join(current))
+            current = None
+        elif current is not None and line:
+            current.append(binascii.unhexlify(line))
+    return dumps
+
+
+def load(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == TRACE_MAGIC:
+        return parse_dump(data)
+    records = []
+    for dump in read_serial_log(data.decode("utf-8", "replace")):
+        records.extend(parse_dump(dump))
+    return records
+
+
+def percentile(values, pct):
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def report(records, out=sys.stdout):
+    by_phase = {}
+    for phase, _cycle, _start, duration in records:
+        by_phase.setdefault(phase, []).append(duration)
+    cycles = len({cycle for _, cycle, _, _ in records})
+
+    out.write(f"{len(records)} spans over {cycles} cycles\n")
+    out.write(f"{'phase':8s} {'count':>6s} {'min':>9s} {'p50':>9s} {'p95':>9s} {'max':>9s} {'mean':>9s} {'total':>10s}  (ms)\n")
+    for phase in sorted(by_phase):
+        values = sorted(by_phase[phase])
+        name = PHASE_NAMES[phase] if phase < len(PHASE_NAMES) else str(phase)
+        ms = [v / 1000 for v in values]
+        out.write(f"{name:8s} {len(ms):6d} {ms[0]:9.1f} {percentile(ms, 50):9.1f} {percentile(ms, 95):9.1f} "
+                  f"{ms[-1]:9.1f} {sum(ms) / len(ms):9.1f} {sum(ms):10.1f}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dumps", nargs="+", help="trace.bin files or serial logs")
+    args = parser.parse_args(argv)
+    records = []
+    for path in args.dumps:
+        records.extend(load(path))
+    if not records:
+        print("No trace records found")
+        return 1
+    report(records)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import utime
+import struct
+
+# Phase ids recorded in the trace
+WIFI = 1
+NTP = 2
+DNS = 3
+TLS = 4
+HTTP = 5
+JSON = 6
+RENDER = 7
+SPI = 8
+BUSY = 9
+TICK = 10  # A countdown tick's transaction, drawing plus issuing the partial update
+PHASE_NAMES = ("", "wifi", "ntp", "dns", "tls", "http", "json", "render", "spi", "busy", "tick")
+
+# Record: phase, pad, cycle, start ticks_us, duration us
+RECORD_FMT = "<BxHII"
+RECORD_SIZE = 12
+TRACE_CAPACITY = 256
+TRACE_MAGIC = b"TRC1"
+TRACE_FILE = "trace.bin"
+
+
+class Tracer():
+    """Fixed-size ring buffer of timing spans, recording a span does not allocate"""
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.capacity = capacity
+        self.buf = bytearray(RECORD_SIZE * capacity)
+        self.head = 0  # Next slot to write
+        self.count = 0
+        self.cycle = 0
+        self.enabled = True
+
+    def begin(self):
+        return utime.ticks_us()
+
+    def end(self, phase, start):
+        """Record a span that started at `start` (from begin())"""
+        if not self.enabled:
+            return
+        struct.pack_into(RECORD_FMT, self.buf, self.head * RECORD_SIZE, phase,
+                         self.cycle, start, utime.ticks_diff(utime.ticks_us(), start))
+        self.head += 1
+        if self.head == self.capacity:
+            self.head = 0
+        if self.count < self.capacity:
+            self.count += 1
+
+    def next_cycle(self):
+        self.cycle = (self.cycle + 1) & 0xFFFF
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    def _write(self, write):
+        # Header then the records from oldest to newest
+        write(TRACE_MAGIC)
+        write(struct.pack("<HH", RECORD_SIZE, self.count))
+        first = (self.head - self.count) % self.capacity
+        mv = memoryview(self.buf)
+        if first + self.count <= self.capacity:
+            write(mv[first * RECORD_SIZE:(first + self.count) * RECORD_SIZE])
+        else:
+            write(mv[first * RECORD_SIZE:])
+            write(mv[:self.head * RECORD_SIZE])
+
+    def dump_file(self, path=TRACE_FILE):
+        """Write the trace to flash as compact binary"""
+        try:
+            with open(path, 'wb') as f:
+                self._write(f.write)
+        except OSError as e:
+            print(f"Error writing trace: {e}")
+
+    def dump_serial(self):
+        """Print the trace as hex lines between markers, for tools/trace_report.py"""
+        import ubinascii
+        print("TRACE-BEGIN")
+        self._write(lambda data: print(ubinascii.hexlify(data).decode()))
+        print("TRACE-END")
+
+
+tracer = Tracer()
@@ -0,0 +1,115 @@
+import json
+import utime
+
+WDT_TIMEOUT_MS = 8000  # Hardware watchdog period, the RP2040 allows at most 8388 ms
+WARM_STATE_FILE = "warm_state.json"
+
+# Main loop stages, the current one is kept in a watchdog scratch register
+# which survives a watchdog reset, so the next boot knows where it hung
+BOOT = 1
+NETWORK = 2
+RENDER = 3
+IDLE = 4
+STAGE_NAMES = ("", "boot", "network", "render", "idle")
+
+# Reasons for a reset
+POWER_ON = 0
+HANG = 1  # The hardware watchdog fired
+ERRORS = 2  # Too many consecutive errors
+WIFI_FAILED = 3
+CONFIG = 4  # Restart after the WiFi setup portal saved credentials
+REASON_NAMES = ("power on", "watchdog", "errors", "wifi failed", "config")
+
+SCRATCH0 = 0x4005800C  # WATCHDOG_SCRATCH0, scratch 4-7 are used by the boot ROM
+SCRATCH_MAGIC = 0x5A << 16
+
+
+class Watchdog():
+    """Hardware watchdog fed only while the main loop makes progress.
+
+    The WDT period is at most 8.4 s, shorter than a TLS handshake or a
+    refresh, so a timer feeds it on the loop's behalf. Each progress()
+    call grants the current stage a budget in seconds; once that runs
+    out the timer stops feeding and the WDT resets the device, also when
+    the loop is stuck in a blocking call such as ReadBusy().
+    """
+    def __init__(self):
+        self.wdt = None
+        self.timer = None
+        self.stage = BOOT
+        self.deadline = utime.ticks_ms()
+        self.reason = POWER_ON  # Reason of the previous reset
+        self.hung_stage = None  # Stage the previous boot hung in
+        self.reason_text = REASON_NAMES[POWER_ON]
+        self._feed_cb = self._feed  # Bound once, the timer callback must not allocate it
+
+    def check_reset(self):
+        """Read why the device restarted, returns a printable reason"""
+        try:
+            import machine
+            scratch = machine.mem32[SCRATCH0]
+            machine.mem32[SCRATCH0] = 0
+            wdt_reset = machine.reset_cause() == machine.WDT_RESET
+        except (ImportError, AttributeError):
+            return self.reason_text
+        # machine.reset() is a watchdog reboot on the RP2040 as well, a
+        # deliberate reset writes its reason next to the stage
+        if wdt_reset and scratch & 0xFF0000 == SCRATCH_MAGIC:
+            self.reason = (scratch >> 8) & 0xFF or HANG
+            self.reason_text = REASON_NAMES[self.reason]
+            if self.reason == HANG:
+                self.hung_stage = scratch & 0xFF
+                if self.hung_stage < len(STAGE_NAMES):
+                    self.reason_text = f"watchdog in {STAGE_NAMES[self.hung_stage]}"
+        return self.reason_text
+
+    def start(self, timeout_ms=WDT_TIMEOUT_MS):
+        """Start the WDT, it cannot be stopped again until the next reset"""
+        from machine import WDT, Timer
+        self.wdt = WDT(timeout=timeout_ms)
+        self.timer = Timer(period=timeout_ms // 4, mode=Timer.PERIODIC, callback=self._feed_cb)
+
+    def progress(self, stage, budget):
+        """Record healthy progress, `stage` may take up to `budget` seconds"""
+        self.stage = stage
+        self.deadline = utime.ticks_add(utime.ticks_ms(), budget * 1000)
+        self._mark(0)
+        if self.wdt is not None:
+            self.wdt.feed()
+
+    def _feed(self, _timer):
+        if utime.ticks_diff(self.deadline, utime.ticks_ms()) > 0:
+            self.wdt.feed()
+
+    def _mark(self, reason):
+        try:
+            from machine import mem32
+            mem32[SCRATCH0] = SCRATCH_MAGIC | (reason << 8) | self.stage
+        except ImportError:
+            pass
+
+    def reset(self, reason):
+        """Deliberate reset, the next boot reports `reason` instead of a hang"""
+        from machine import reset
+        self._mark(reason)
+        reset()
+
+
+watchdog = Watchdog()
+
+
+def save_state(state, path=WARM_STATE_FILE):
+    """Persist the warm restart state (a JSON-able dict)"""
+    try:
+        with open(path, 'w') as f:
+            json.dump(state, f)
+    except OSError as e:
+        print(f"Error saving warm state: {e}")
+
+
+def load_state(path=WARM_STATE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -1,6 +1,14 @@
-import urequests
 import utime
-from weather_icons import draw_weather_icon
+from array import array
+from http_client import get_json, get_json_items
+from tracing import tracer, RENDER
+from mem_profile import profiler
+from metrics import metrics
+from fonts import TEXT, large_font, fit_text
+from text_buffer import (put_bytes, put_fit, put_int, put_tenths, put_time, put_date, draw,
+                         DEGREE)
+from sparkline import Sparkline
+from render_txn import Transaction, FULL
 
 next_days_dict = {
     "Mon": "Tue",
@@ -12,14 +20,50 @@ next_days_dict = {
     "Sun": "Mon"
     }
 days_dict = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+DAY_NAMES = (b"Mon", b"Tue", b"Wed", b"Thu", b"Fri", b"Sat", b"Sun")
+FORECAST_DAYS = 5
+LINE_CHARS = 32  # Text line buffer, the panel fits 31 builtin font characters
+HEADER_WIDTH = 185  # Header text stops before the ETA counter at x=190
+FORECAST_Y = 60  # Top of the daily forecast row
+SPARK_X = 5
+SPARK_Y = 107  # Temperature/precipitation strip under the daily forecast
+
+API_HOST = "api.openweathermap.org"
+
+
+def tenths(value):
+    """Degrees to tenths, rounded exactly like the '%.1f' the page used to print"""
+    return int(("%.1f" % value).replace(".", ""))
 
 class Weather():
-    def __init__(self, api_key, lat, lon, epd):
+    def __init__(self, api_key, lat, lon, epd, name=None):
         self.api_key = api_key
         self.lat = lat
         self.lon = lon
         self.epd = epd
-        self.url_template = f"https://api.openweathermap.org/data/2.5/%s?lat={self.lat}&lon={self.lon}&appid={self.api_key}&units=metric"
+        self.name = name
+        self.sparkline = Sparkline()  # Filled while the forecast is parsed
+        self.path_template = f"data/2.5/%s?lat={self.lat}&lon={self.lon}&appid={self.api_key}&units=metric"
+        self.url_template = f"https://{API_HOST}/" + self.path_template
+        # Per-location cache, timestamps are utime.time() of the last successful fetch
+        self.weather = None
+        self.forecast = None
+        self.weather_time = None
+        self.forecast_time = None
+        self.page = None  # Pre-rendered page buffer when rotating between locations
+        self.day_range = None  # (low, high) since midnight in 1/100 degree, from the history log
+        # Render inputs prepared when data arrives, drawing a page then
+        # formats only integers into the line buffer
+        self.line = bytearray(LINE_CHARS)
+        self.city_text = b""  # Already shortened to fit next to the time
+        self.desc_text = bytearray()  # Capitalized
+        self.temp10 = 0  # Tenths of a degree, rounded like the "%.1f" it replaces
+        self.feels10 = 0
+        self.humidity = 0
+        self.days = 0  # Forecast days prepared
+        self.day_names = [b""] * FORECAST_DAYS
+        self.day_temps = array('h', bytes(2 * FORECAST_DAYS))
+        self.day_ids = array('H', bytes(2 * FORECAST_DAYS))
     
     @property
     def weather_url(self):
@@ -28,112 +72,188 @@ class Weather():
     @property
     def forecast_url(self):
         return self.url_template % 'forecast'
-        return 
+
+    def path(self, kind):
+        """Request path on API_HOST for 'weather' or 'forecast'"""
+        return self.path_template % kind
     
+    def parse_weather(self, data):
+        # Extract the data we need including the weather ID
+        weather = {
+            "temp": data["main"]["temp"],
+            "feels_like": data["main"]["feels_like"],
+            "humidity": data["main"]["humidity"],
+            "description": data["weather"][0]["description"],
+            "weather_id": data["weather"][0]["id"],  # Added weather ID for icon selection
+            "wind_speed": data["wind"]["speed"],
+            "city": self.name or data["name"],
+            "country": data["sys"]["country"]
+        }
+        return self.set_weather(weather)
+
+    def set_weather(self, weather):
+        """Store a current weather record, every provider produces this shape"""
+        self.weather = weather
+        self.weather_time = utime.time()
+        self._prepare_weather()
+        return weather
+
+    def set_forecast(self, forecast_days):
+        self.forecast = forecast_days
+        self.forecast_time = utime.time()
+        self._prepare_forecast()
+        return forecast_days
+
+    def _prepare_weather(self):
+        weather = self.weather
+        city = fit_text(TEXT, weather['city'], HEADER_WIDTH - TEXT.measure("00:00") - 16)
+        self.city_text = city.encode()
+        self.desc_text = bytearray(weather['description'].encode())
+        if self.desc_text and 0x61 <= self.desc_text[0] <= 0x7A:
+            self.desc_text[0] -= 0x20
+        self.temp10 = tenths(weather['temp'])
+        self.feels10 = tenths(weather['feels_like'])
+        self.humidity = int(weather['humidity'])
+
+    def _prepare_forecast(self):
+        self.days = min(len(self.forecast), FORECAST_DAYS)
+        for i in range(self.days):
+            day = self.forecast[i]
+            self.day_names[i] = DAY_NAMES[days_dict.index(day['day'])]
+            self.day_temps[i] = tenths(day['temp'])
+            self.day_ids[i] = day['weather_id']
+
+    def cache(self):
+        """The fetched data as a JSON-able dict, for the warm restart state"""
+        spark = self.sparkline
+        return {"weather": self.weather, "forecast": self.forecast,
+                "weather_time": self.weather_time, "forecast_time": self.forecast_time,
+                "spark": [list(spark.temps[:spark.count]), list(spark.pops[:spark.count])]}
+
+    def restore(self, cached):
+        self.weather = cached["weather"]
+        self.forecast = cached["forecast"]
+        self.weather_time = cached["weather_time"]
+        self.forecast_time = cached["forecast_time"]
+        if self.weather is not None:
+            self._prepare_weather()
+        if self.forecast is not None:
+            self._prepare_forecast()
+        self.sparkline.reset()
+        for temp, pop in zip(*cached["spark"]):
+            self.sparkline.add(temp, pop)
+
+    def parse_forecast(self, items):
+        """Build the daily forecast from an iterator over the forecast list.
+
+        OpenWeatherMap returns forecast in 3-hour increments, the first entries
+        feed the sparkline and we get one forecast per day at noon
+        """
+        self.sparkline.reset()
+        forecast_days = []
+        days_processed = set()
+        t = utime.localtime()
+        today = f"{t[0]}-{t[1]:02d}-{t[2]:02d}"
+        cur_day = days_dict[t[6]]
+        next_day = next_days_dict[cur_day]
+        for item in items:
+            # Temperature in tenths and precipitation probability in percent
+            if not self.sparkline.full:
+                self.sparkline.add(int(item["main"]["temp"] * 10), int(item.get("pop", 0) * 100))
+            
+            # Extract date from timestamp (format: "2023-04-01 12:00:00")
+            date_str, time_str = item["dt_txt"].split(" ")
+            
+            # Only process each day once and try to get forecast around noon
+            if len(forecast_days) < 5 and date_str not in days_processed and time_str == "12:00:00" and date_str != today:
+                days_processed.add(date_str)                
+                
+                forecast = {
+                    "date": date_str,
+                    "day": next_day,
+                    "temp": item["main"]["temp"],
+                    "description": item["weather"][0]["description"],
+                    "weather_id": item["weather"][0]["id"],
+                    "humidity": item["main"]["humidity"],
+                    "wind_speed": item["wind"]["speed"]
+                }
+                
+                forecast_days.append(forecast)
+                next_day = next_days_dict[next_day]
+                
+            # Stop after we get 5 days and the sparkline is complete
+            if len(forecast_days) >= 5 and self.sparkline.full:
+                break
+        return self.set_forecast(forecast_days)
+
     # Updated fetch_weather function to include weather_id
     def fetch_weather(self):
+        start = utime.ticks_ms()
         try:
-            response = urequests.get(self.weather_url)
-            data = response.json()
-            response.close()
-            
-            # Extract the data we need including the weather ID
-            weather = {
-                "temp": data["main"]["temp"],
-                "feels_like": data["main"]["feels_like"],
-                "humidity": data["main"]["humidity"],
-                "description": data["weather"][0]["description"],
-                "weather_id": data["weather"][0]["id"],  # Added weather ID for icon selection
-                "wind_speed": data["wind"]["speed"],
-                "city": data["name"],
-                "country": data["sys"]["country"]
-            }
-            
+            weather = self.parse_weather(get_json(self.weather_url))
+            metrics.fetch_done(start, True)
             return weather
         except Exception as e:
             print("Error fetching weather data:", e)
+            metrics.fetch_done(start, False)
             return None
     
 
     # Function to fetch 3-day weather forecast
     def fetch_forecast(self):
+        start = utime.ticks_ms()
+        items = None
         try:
-            # Use the 5-day/3-hour forecast endpoint
-            response = urequests.get(self.forecast_url)
-            data = response.json()
-            response.close()
-            
-            # Process the forecast data to get daily forecasts
-            # OpenWeatherMap returns forecast in 3-hour increments
-            # We'll get one forecast per day at noon
-            
-            forecast_days = []
-            days_processed = set()
-            t = utime.localtime()
-            today = f"{t[0]}-{t[1]:02d}-{t[2]:02d}"
-            cur_day = days_dict[t[6]]
-            next_day = next_days_dict[cur_day]
-            for item in data["list"]:
-                # Extract date from timestamp (format: "2023-04-01 12:00:00")
-                date_str = item["dt_txt"].split(" ")[0]
-                time_str = item["dt_txt"].split(" ")[1]
-                
-                # Only process each day once and try to get forecast around noon
-                if date_str not in days_processed and "12:00:00" in time_str and date_str != today:
-                    days_processed.add(date_str)                
-                    
-                    forecast = {
-                        "date": date_str,
-                        "day": next_day,
-                        "temp": item["main"]["temp"],
-                        "description": item["weather"][0]["description"],
-                        "weather_id": item["weather"][0]["id"],
-                        "humidity": item["main"]["humidity"],
-                        "wind_speed": item["wind"]["speed"]
-                    }
-                    
-                    forecast_days.append(forecast)
-                    next_day = next_days_dict[next_day]
-                    
-                    # Stop after we get 5 days
-                    if len(forecast_days) >= 5:
-                        break
-            
+            # Use the 5-day/3-hour forecast endpoint, the list is parsed one
+            # entry at a time so the whole response is never in memory
+            items = get_json_items(self.forecast_url, "list")
+            forecast_days = self.parse_forecast(items)
+            profiler.record("forecast_parsed")
+            metrics.fetch_done(start, True)
             return forecast_days
         
         except Exception as e:
             print("Error fetching forecast:", e)
+            metrics.fetch_done(start, False)
             return None
+        finally:
+            if items is not None:
+                items.close()
 
     # Function to display the weather forecast
     def display_forecast(self, forecast_data):
+        """Draw the prepared forecast days, `forecast_data` is the record they came from"""
         try:
-            if not forecast_data or len(forecast_data) == 0:
+            n = self.days
+            if not forecast_data or n == 0:
                 print("No forecast data to display")
                 return
             
             # Display area variables
             display_width = self.epd.height  # We are in horizonatl layout so he disth is the height
-            forecast_width = display_width // len(forecast_data)
+            forecast_width = display_width // n
+            from weather_icons import draw_weather_icon
+            line = self.line
             
             # Draw each forecast day
-            for i, forecast in enumerate(forecast_data):
+            for i in range(n):
                 x_pos = i * forecast_width + forecast_width // 2
-                y_pos = 70  # Position in the lower part of the screen
+                y_pos = FORECAST_Y  # Position in the lower part of the screen
                 
                 # Draw day of week
-                self.epd.text(forecast["day"], x_pos - 10, y_pos, 0x00)
+                draw(self.epd, self.day_names[i], 3, x_pos - 10, y_pos)
                 
                 # Draw weather icon
-                draw_weather_icon(self.epd, forecast["weather_id"], x_pos, y_pos + 35, 25)
+                draw_weather_icon(self.epd, self.day_ids[i], x_pos, y_pos + 28, 18)
                 
                 # Draw temperature
-                temp_str = f"{forecast['temp']:.1f}C"
-                self.epd.text(temp_str, x_pos - 20, y_pos + 45, 0x00)
+                end = put_tenths(line, 0, self.day_temps[i])
+                line[end] = 0x43  # C
+                draw(self.epd, line, end + 1, x_pos - 20, y_pos + 37)
                 
                 # Draw vertical separator if not the last forecast
-                if i < len(forecast_data) - 1:
-                    self.epd.vline(x_pos + forecast_width // 2, y_pos - 5, 70, 0x00)
+                if i < n - 1:
+                    self.epd.vline(x_pos + forecast_width // 2, y_pos - 2, SPARK_Y - y_pos, 0x00)
             
         except Exception as e:
             print("Error displaying forecast:", e)
@@ -142,41 +262,64 @@ class Weather():
 
     # Updated display function for horizontal layout with icons
     def display_weather_horizontal(self, weather, forecast):
+        with Transaction(self.epd, "weather", FULL) as txn:
+            if not self.render_weather_horizontal(weather, forecast):
+                txn.abort()
+                return
+        print("Display updated with horizontal layout")
+
+    def render_weather_horizontal(self, weather, forecast):
+        """Draw the horizontal layout into the framebuffer without refreshing"""
         try:
+            span = tracer.begin()
             self.epd.fill(0xff)  # Clear to white
             
             # Current weather section
             # ======================
             # Display header     
-            # Display location and time
-            t = utime.localtime()
-            time_str = f"{t[3]:02d}:{t[4]:02d}"
-            self.epd.text(f"Weather: {weather['city']}, {time_str}", 5, 8, 0x00)
+            # Display location and time, the city was shortened to keep clear of the ETA counter
+            now = utime.time()
+            line = self.line
+            n = put_bytes(line, 0, self.city_text)
+            line[n] = 0x2C  # ,
+            line[n + 1] = 0x20
+            n = put_time(line, n + 2, now)
+            draw(self.epd, line, n, 5, 8)
             
             # Draw a line separator
             self.epd.hline(5, 17, 240, 0x00)
             
-            # Draw current weather icon
-            weather_id = weather['weather_id']
-            draw_weather_icon(self.epd, weather_id, 20, 47, 30)
+            # Draw current weather icon, the icon code is loaded on first use
+            from weather_icons import draw_weather_icon
+            draw_weather_icon(self.epd, weather['weather_id'], 20, 44, 24)
             
-            # Display current temperature (large)
-            temp_str = f"Curr: {weather['temp']:.1f} C"
-            self.epd.text(temp_str, 60, 25, 0x00)
-            temp_str = f"Feel: {weather['feels_like']:.1f} C"
-            self.epd.text(temp_str, 60, 35, 0x00)
-            temp_str = f"Humm: {weather['humidity']}%"
-            self.epd.text(temp_str, 60, 45, 0x00)
-                    
-            # Display feels like and humidity
-            #epd.text(f"Feels: {weather['feels_like']:.1f}°C", 80, 65, 0x00)
-            #epd.text(f"Humidity: {weather['humidity']}%", 80, 80, 0x00)
+            # Display current temperature (large, right aligned)
+            n = put_tenths(line, 0, self.temp10)
+            line[n] = DEGREE
+            large_font().draw_buf_right(self.epd, line, n + 1, 248, 20)
+            n = put_bytes(line, 0, b"Feel: ")
+            n = put_tenths(line, n, self.feels10)
+            n = put_bytes(line, n, b" C")
+            draw(self.epd, line, n, 60, 22)
+            n = put_bytes(line, 0, b"Humm: ")
+            n = put_int(line, n, self.humidity)
+            line[n] = 0x25  # %
+            draw(self.epd, line, n + 1, 60, 32)
             
-            # Format description nicely
-            desc = weather['description']
-            desc = desc[0].upper() + desc[1:]
-            self.epd.text(f"{desc}", 60, 55, 0x00)
-            self.epd.hline(5, 65, 240, 0x00)
+            # Today's range right aligned, the capitalized description before it
+            desc_right = 245
+            if self.day_range:
+                low, high = self.day_range
+                line[0] = 0x4C  # L
+                n = put_int(line, 1, (low + 50) // 100)
+                line[n] = 0x20
+                line[n + 1] = 0x48  # H
+                n = put_int(line, n + 2, (high + 50) // 100)
+                draw(self.epd, line, n, 248 - n * 8, 44)
+                desc_right = 244 - n * 8
+            n = put_fit(line, 0, self.desc_text, (desc_right - 60) // 8)
+            draw(self.epd, line, n, 60, 44)
+            self.epd.hline(5, FORECAST_Y - 4, 240, 0x00)
             
             # Draw another separator before forecast
             #epd.hline(5, 115, 240, 0x00)
@@ -184,20 +327,22 @@ class Weather():
             # Display the forecast
             if forecast and len(forecast) > 0:
                 self.display_forecast(forecast)
+                # 48 h temperature/precipitation strip under the daily forecast
+                if self.sparkline.render():
+                    self.epd.blit(self.sparkline.fb, SPARK_X, SPARK_Y)
             else:
-                self.epd.text("Forecast unavailable", 5, 70, 0x00)
+                self.epd.text("Forecast unavailable", 5, FORECAST_Y + 2, 0x00)
             
             # Draw final separator
             self.epd.hline(5, 128, 130, 0x00)
                     
             # Display the date in the corner
-            t = utime.localtime()
-            date_str = f"{t[2]:02d}/{t[1]:02d}"
-            self.epd.text(date_str, 180, 225, 0x00)
+            n = put_date(line, 0, now)
+            draw(self.epd, line, n, 180, 225)
             
-            # Update the display
-            self.epd.display(self.epd.buffer)
-            print("Display updated with horizontal layout")
+            tracer.end(RENDER, span)
+            return True
             
         except Exception as e:
             print("Error updating display:", e)
+            return False
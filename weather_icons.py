@@ -1,5 +1,27 @@
 import math
 
+_rays = {}  # Icon size -> sun ray end points relative to the center
+
+def sun_rays(size):
+    """Integer ray offsets, computed once per size so drawing does no float math.
+
+    x + floor(d) equals the int(x + d) the rays were drawn with for the
+    positive screen coordinates icons are placed at.
+    """
+    rays = _rays.get(size)
+    if rays is None:
+        radius = size // 2
+        ray_length = radius // 2
+        rays = []
+        for i in range(8):
+            angle = i * 3.14159 / 4  # 45 degrees apart
+            cos = math.cos(angle)
+            sin = math.sin(angle)
+            rays.append((math.floor(radius * cos), math.floor(radius * sin),
+                         math.floor((radius + ray_length) * cos), math.floor((radius + ray_length) * sin)))
+        rays = _rays[size] = tuple(rays)
+    return rays
+
 # Weather icon drawing functions
 def draw_sun(epd, x, y, size=20):
     """Draw a sun icon"""
@@ -9,14 +31,8 @@ def draw_sun(epd, x, y, size=20):
     epd.fill_circle(x, y, radius-2, 0xff)
     
     # Draw rays
-    ray_length = radius // 2
-    for i in range(8):
-        angle = i * 3.14159 / 4  # 45 degrees apart
-        x_end = int(x + (radius + ray_length) * math.cos(angle))
-        y_end = int(y + (radius + ray_length) * math.sin(angle))
-        x_start = int(x + radius * math.cos(angle))
-        y_start = int(y + radius * math.sin(angle))
-        epd.line(x_start, y_start, x_end, y_end, 0x00)
+    for x_start, y_start, x_end, y_end in sun_rays(size):
+        epd.line(x + x_start, y + y_start, x + x_end, y + y_end, 0x00)
 
 def draw_cloud(epd, x, y, size=20):
     """Draw a cloud icon"""
@@ -0,0 +1,98 @@
+import struct
+import utime
+
+# Fixed layout binary weather record served by tools/companion_server.py.
+# One record carries a location's current weather, the daily forecast and
+# the sparkline samples, decoding it needs no JSON parser and no TLS.
+# Temperatures and wind speeds are hundredths, so the floats rebuilt from
+# them are the ones OpenWeatherMap's two decimals parse to.
+MAGIC = b"WRC1"
+# magic, age (s since the companion fetched), temp, feels like, humidity,
+# weather id, wind (cm/s), city, country, description, forecast days, sparkline samples
+HEAD = "<4sHhhBHH20s2s24sBB"
+# weekday (0 = Monday), temp, weather id, humidity, wind, date, description
+DAY = "<BhHBH10s24s"
+DAYS = 5
+SAMPLES = 16
+SPARK = "<%dh%dB" % (SAMPLES, SAMPLES)
+HEAD_SIZE = struct.calcsize(HEAD)
+DAY_SIZE = struct.calcsize(DAY)
+RECORD_SIZE = HEAD_SIZE + DAYS * DAY_SIZE + struct.calcsize(SPARK)
+
+
+def _text(field):
+    end = field.find(b"\0")
+    return (field if end < 0 else field[:end]).decode()
+
+
+def apply(location, data):
+    """Store a record in a Weather object like a provider's parse() would"""
+    if len(data) != RECORD_SIZE or data[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a weather record")
+    (_, age, temp, feels, humidity, weather_id, wind, city, country, description,
+     days, samples) = struct.unpack_from(HEAD, data)
+    from weather_forecast import days_dict
+    fetched = utime.time() - age
+    location.set_weather({
+        "temp": temp / 100,
+        "feels_like": feels / 100,
+        "humidity": humidity,
+        "description": _text(description),
+        "weather_id": weather_id,
+        "wind_speed": wind / 100,
+        "city": location.name or _text(city),
+        "country": _text(country),
+    })
+    # The companion's fetch time, a record served twice is the same reading
+    location.weather_time = fetched
+    forecast = []
+    for i in range(min(days, DAYS)):
+        day, temp, weather_id, humidity, wind, date, description = struct.unpack_from(
+            DAY, data, HEAD_SIZE + i * DAY_SIZE)
+        forecast.append({
+            "date": _text(date),
+            "day": days_dict[day],
+            "temp": temp / 100,
+            "description": _text(description),
+            "weather_id": weather_id,
+            "humidity": humidity,
+            "wind_speed": wind / 100,
+        })
+    location.set_forecast(forecast)
+    location.forecast_time = fetched
+    spark = struct.unpack_from(SPARK, data, HEAD_SIZE + DAYS * DAY_SIZE)
+    sparkline = location.sparkline
+    sparkline.reset()
+    for i in range(min(samples, SAMPLES)):
+        sparkline.add(spark[i], spark[SAMPLES + i])
+
+
+def _field(text, size):
+    # Cut on a character boundary so the device can decode the field
+    return text.encode()[:size].decode("utf-8", "ignore").encode()
+
+
+def pack(location, age=0):
+    """The record of a Weather object holding parsed data (host side)"""
+    from weather_forecast import days_dict
+    weather = location.weather
+    forecast = location.forecast or []
+    sparkline = location.sparkline
+    samples = min(sparkline.count, SAMPLES)
+    out = bytearray(struct.pack(
+        HEAD, MAGIC, min(age, 0xFFFF), round(weather["temp"] * 100), round(weather["feels_like"] * 100),
+        round(weather["humidity"]), weather["weather_id"], round(weather["wind_speed"] * 100),
+        _field(weather["city"], 20), _field(weather["country"], 2), _field(weather["description"], 24),
+        min(len(forecast), DAYS), samples))
+    for i in range(DAYS):
+        if i < len(forecast):
+            day = forecast[i]
+            out += struct.pack(DAY, days_dict.index(day["day"]), round(day["temp"] * 100), day["weather_id"],
+                               round(day["humidity"]), round(day["wind_speed"] * 100),
+                               _field(day["date"], 10), _field(day["description"], 24))
+        else:
+            out += bytes(DAY_SIZE)
+    temps = [sparkline.temps[i] if i < samples else 0 for i in range(SAMPLES)]
+    pops = [sparkline.pops[i] if i < samples else 0 for i in range(SAMPLES)]
+    out += struct.pack(SPARK, *(temps + pops))
+    return bytes(out)
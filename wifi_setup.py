@@ -0,0 +1,165 @@
+import network
+import utime
+import time
+import json
+from machine import reset
+
+AP_SSID = "WeatherStation"  # Access Point name when in setup mode
+AP_PASSWORD = "setupmode"  # Password for setup mode (at least 8 characters)
+CONFIG_MODE_TIMEOUT = 300
+
+class WiFiSetup():
+    def __init__(self, epd, wifi_file):
+        self.epd = epd
+        self.wifi_file = wifi_file
+        
+    def setup_web_server(self):
+        """Setup a web server for configuration"""
+        import socket
+        
+        # Create a socket and bind to address
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            s.bind(('0.0.0.0', 80))
+            s.listen(5)
+            s.settimeout(2)  # 2 second timeout for accepting connections
+        except OSError as ex:
+            print(f"Error starting AP: {ex}")
+            reset()
+        
+        print("Web server started")
+        
+        # Portal pages are only loaded in setup mode
+        from portal_assets import PORTAL_HTML, SUCCESS_HTML
+        
+        # Display setup mode on e-paper
+        self.epd.fill(0xff)
+        self.epd.text("Wi-Fi Setup Mode", 5, 10, 0x00)
+        self.epd.text("Connect to Wi-Fi:", 5, 35, 0x00)
+        self.epd.text(f"SSID: {AP_SSID}", 5, 50, 0x00)
+        self.epd.text(f"Password: {AP_PASSWORD}", 5, 65, 0x00)
+        self.epd.text("Then visit in browser:", 5, 90, 0x00)
+        self.epd.text("http://192.168.4.1", 5, 105, 0x00)
+        self.epd.text("Press button to exit", 5, 130, 0x00)
+        self.epd.display(self.epd.buffer)
+        
+        # Record the start time
+        start_time = time.time()
+        
+        while True:           
+            # Check for timeout
+            if time.time() - start_time > CONFIG_MODE_TIMEOUT:
+                print("Setup mode timeout")
+                self.epd.fill(0xff)
+                self.epd.text("Setup mode timeout", 5, 10, 0x00)
+                self.epd.text("Exiting...", 5, 30, 0x00)
+                self.epd.display(self.epd.buffer)
+                return False
+            
+            try:
+                # Wait for a connection
+                conn, addr = s.accept()
+                print(f"Connection from ** {addr}")
+                
+                # Get the request
+                request = conn.recv(1024).decode('utf-8')
+                print('Request', request) 
+                
+                # Parse the request
+                if request.startswith('POST /save'):
+                    # Find the form data in the request
+                    print("Received a save request")
+                    
+                    content_length = 0
+                    for line in request.split('\r\n'):
+                        if line.startswith('Content-Length:'):
+                            content_length = int(line.split(':')[1].strip())
+                            print(f"Content length: {content_length}")
+                    
+                    # If we found a content length, look for form data
+                    if content_length > 0:
+                        # Find the form data after the headers
+                        headers_end = request.find('\r\n\r\n')
+                        
+                        if headers_end > -1:
+                            body_start = headers_end + 4  # Skip the \r\n\r\n
+                            
+                            # If body is incomplete, receive more data
+                            body = request[body_start:]
+                            
+                            # If we don't have enough data yet, read more
+                            while len(body) < content_length:
+                                more_data = conn.recv(1024).decode('utf-8')
+                                if not more_data:
+                                    break
+                                body += more_data
+                            
+                            print(f"Form data: {body}")
+                        
+                    # Parse the form data
+                    fields = {}
+                    for field in body.split('&'):
+                        key, value = field.split('=')
+                        fields[key] = value.replace('+', ' ')
+                    # Extract the Wi-Fi credentials
+                    ssid = fields.get('ssid', '')
+                    password = fields.get('password', '')
+                    
+                    # Save the credentials
+                    if ssid and password:
+                        if self.write_wifi_credentials(ssid, password):
+                            print("Saving WIFI credentials to file")
+                            # Send success response
+                            conn.send('HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n')
+                            conn.send(SUCCESS_HTML)
+                            conn.close()
+                            
+                            # Display success on e-paper
+                            self.epd.fill(0xff)
+                            self.epd.text("Wi-Fi Config Saved!", 5, 10, 0x00)
+                            self.epd.text("SSID: " + ssid, 5, 40, 0x00)
+                            self.epd.text("Restarting...", 5, 70, 0x00)
+                            self.epd.display(self.epd.buffer)
+                            
+                            # Wait a moment for the user to see the message
+                            utime.sleep(3)
+                            return True
+                else:
+                    # Send the configuration page
+                    conn.send('HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n')
+                    conn.send(PORTAL_HTML)
+                
+                conn.close()
+            
+            except Exception as e:
+                # Socket timeout or other error
+                pass
+            
+            # Small delay to prevent CPU overload
+            utime.sleep(0.1)
+    
+    def write_wifi_credentials(self, ssid, password):
+        data = json.dumps(
+            {
+                'ssid': ssid,
+                'password': password
+            }
+        )
+        with open(self.wifi_file, 'w') as f:
+            f.write(data)
+        return True
+    
+    def start_access_point(self):
+        """Start access point for configuration"""
+        ap = network.WLAN(network.AP_IF)
+        ap.active(True)
+        ap.config(essid=AP_SSID, password=AP_PASSWORD)
+        
+        while not ap.active():
+            pass
+        
+        print("Access point started")
+        print(f"SSID: {AP_SSID}")
+        print(f"Password: {AP_PASSWORD}")
+        print(f"IP address: {ap.ifconfig()[0]}")
+        return ap